@@ -1,12 +1,15 @@
 from app.db import schemas
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from app.db.database import engine
 from app.db.seed import seed_admin
+from app.rag.rag import rag_registry
 from contextlib import asynccontextmanager
 from app.rag.routes import router as rag_router
 from app.auth.routes import router as auth_router
 from app.users.routes import router as users_router
 from fastapi.middleware.cors import CORSMiddleware
+from app.rag.http_clients import aclose_http_clients
+from app.rag.metrics import CONTENT_TYPE, metrics_registry
 
 
 @asynccontextmanager
@@ -17,8 +20,14 @@ async def lifespan(app: FastAPI):
     # 2️⃣ Seed default admin (idempotent)
     seed_admin()
 
+    # 3️⃣ Warm shared vector store, keyword index and document chain
+    rag_registry.warm()
+
     yield
 
+    # Shutdown: close the shared OpenAI connection pool
+    await aclose_http_clients()
+
 
 app = FastAPI(
     title="Research RAG Backend",
@@ -37,7 +46,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 3️⃣ Routers
+# 4️⃣ Routers
 app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(rag_router)
@@ -46,3 +55,8 @@ app.include_router(rag_router)
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,262 @@
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.rag.injestion import vector_database_path
+from app.rag.ingestion_manifest import corpus_version
+
+load_dotenv()
+
+ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("RAG_ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Cosine similarity above which two questions share an answer (0 disables the semantic tier)
+ANSWER_CACHE_SIMILARITY = float(os.getenv("RAG_ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Normalize question-> Exact tier-> Semantic tier-> Dropped when the corpus version moves-> Hit-rate stats
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    documents: List[Document]
+    # Corpus version the answer was retrieved against
+    version: Any = None
+
+
+def normalize_question(question: str) -> str:
+    """
+    Returns: Lower-cased question with collapsed whitespace and no trailing punctuation
+    """
+    normalized = re.sub(r"\s+", " ", question.strip().lower())
+    return normalized.rstrip(" ?!.")
+
+
+class TTLLRUCache:
+    """
+    Ordered key -> value store with per-entry expiry and
+    least-recently-used eviction. Not thread-safe on its own.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """
+        Returns: Unexpired (key, value) pairs without touching recency
+        """
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in self._entries.items() if expires_at >= now]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticTier:
+    """
+    Stores unit-normalized question embeddings and answers
+    the nearest stored question above a similarity threshold.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.threshold = threshold
+        self._entries = TTLLRUCache(max_entries, ttl_seconds)
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def get(self, embedding: List[float]) -> Optional[CachedAnswer]:
+        if self._matrix is None:
+            self._rebuild()
+        if not self._keys:
+            return None
+        scores = self._matrix @ self._unit(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        item = self._entries.get(self._keys[best])
+        if item is None:
+            self._matrix = None
+            return None
+        return item[1]
+
+    def put(self, key: str, embedding: List[float], cached: CachedAnswer) -> None:
+        self._entries.put(key, (self._unit(embedding), cached))
+        self._matrix = None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+
+    def _rebuild(self) -> None:
+        items = self._entries.items()
+        self._keys = [key for key, _ in items]
+        vectors = [vector for _, (vector, _) in items]
+        self._matrix = np.vstack(vectors) if vectors else np.zeros((0, 1), dtype=np.float32)
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AnswerCache:
+    """
+    Two-tier (exact, semantic) cache of final (answer, sources)
+    placed in front of AdaptiveRAGController.
+
+    With `version` (e.g. the corpus version ingestion bumps), every
+    entry is stamped with the version its answer was retrieved against;
+    once the version moves, the older entries are dropped on the next
+    lookup, so re-ingested papers are never answered from the old text.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+        version: Optional[Callable[[], Any]] = None,
+    ):
+        self.enabled = enabled
+        self._version = version
+        self._seen_version = version() if version is not None else None
+        self._lock = threading.Lock()
+        self._exact = TTLLRUCache(max_entries, ttl_seconds)
+        self._semantic = SemanticTier(max_entries, ttl_seconds, similarity_threshold)
+        self._lookups = 0
+        self._exact_hits = 0
+        self._semantic_hits = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.enabled and self._semantic.threshold > 0
+
+    def current_version(self) -> Any:
+        """
+        Returns: The corpus version now (None without a version source);
+        callers pass it back to put with the answer retrieved under it
+        """
+        return self._version() if self._version is not None else None
+
+    def _sync_version(self) -> Any:
+        """
+        Drops every entry when the version moved since the last look.
+        Caller holds the lock.
+        """
+        current = self.current_version()
+        if current != self._seen_version:
+            self._exact.clear()
+            self._semantic.clear()
+            self._seen_version = current
+        return current
+
+    def get_exact(self, question: str) -> Optional[CachedAnswer]:
+        """
+        Starts a lookup: counts it and checks the exact tier.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._lookups += 1
+            self._sync_version()
+            cached = self._exact.get(normalize_question(question))
+            if cached is not None:
+                self._exact_hits += 1
+            return cached
+
+    def get_similar(self, embedding: List[float]) -> Optional[CachedAnswer]:
+        """
+        Finishes a lookup that missed the exact tier.
+        """
+        if not self.semantic_enabled:
+            return None
+        with self._lock:
+            self._sync_version()
+            cached = self._semantic.get(embedding)
+            if cached is not None:
+                self._semantic_hits += 1
+            return cached
+
+    def put(
+        self,
+        question: str,
+        answer: str,
+        documents: List[Document],
+        embedding: Optional[List[float]] = None,
+        version: Any = None,
+    ) -> None:
+        """
+        Stores an answer retrieved under `version` (from current_version at
+        lookup); skipped when the corpus changed while it was generated.
+        """
+        if not self.enabled:
+            return
+        key = normalize_question(question)
+        cached = CachedAnswer(answer=answer, documents=list(documents), version=version)
+        with self._lock:
+            if self._sync_version() != version:
+                return
+            self._exact.put(key, cached)
+            if embedding is not None and self.semantic_enabled:
+                self._semantic.put(key, embedding, cached)
+
+    def clear(self) -> None:
+        """
+        Drops every entry. Registered as a RAG registry reload listener.
+        """
+        with self._lock:
+            self._exact.clear()
+            self._semantic.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            return {
+                "lookups": self._lookups,
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._lookups - hits,
+                "hit_rate": hits / self._lookups if self._lookups else 0.0,
+                "exact_entries": len(self._exact),
+                "semantic_entries": len(self._semantic),
+            }
+
+
+answer_cache = AnswerCache(version=lambda: corpus_version(vector_database_path))
@@ -0,0 +1,152 @@
+import os
+from typing import List, Optional, Set
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.rag import metrics
+from app.rag.tokens import count_document_tokens
+
+load_dotenv()
+
+CONTEXT_PACKING = os.getenv("RAG_CONTEXT_PACKING", "true").lower() == "true"
+# Prompt tokens allowed for retrieved chunks. Unset = no budget: top_k and the
+# reranker's top_n alone bound the context (8 chunks of 1000 chars ~ 2000 tokens)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET") or 0) or None
+# Word-shingle Jaccard similarity above which a chunk counts as a repeat
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("RAG_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# Shortest shared text treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# Longest overlap looked for; split_text_into_chunks uses chunk_overlap=200
+MAX_OVERLAP_CHARS = 400
+SHINGLE_SIZE = 3
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Ranked chunks-> Merge overlapping neighbours (same source/page)-> Drop near-duplicates-> Pack into the token budget
+
+
+def overlap_length(first: str, second: str) -> int:
+    """
+    Returns: Length of the longest suffix of first that is a prefix of second
+    (0 when shorter than MIN_OVERLAP_CHARS)
+    """
+    longest = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for length in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+def shingles(text: str) -> Set[str]:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def same_page(first: Document, second: Document) -> bool:
+    first_md, second_md = first.metadata or {}, second.metadata or {}
+    return (
+        first_md.get("source") is not None
+        and first_md.get("source") == second_md.get("source")
+        and first_md.get("page") == second_md.get("page")
+    )
+
+
+class ContextPacker:
+    """
+    Assembles the retrieved chunks that go into the stuffed prompt.
+
+    - Chunks from the same source/page whose text overlaps (the splitter's
+      chunk_overlap) are merged into one, kept at the better rank.
+    - Chunks that repeat an already kept chunk (e.g. the same page in a
+      preprint and its published version) are dropped.
+    - What remains is packed, in rank order, into token_budget (when set).
+    Merged chunks keep the metadata of their first part, so format_source
+    and the API's source list are unchanged.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = CONTEXT_PACKING,
+        token_budget: Optional[int] = CONTEXT_TOKEN_BUDGET,
+        near_duplicate_threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    ):
+        self.enabled = enabled
+        self.token_budget = token_budget
+        self.near_duplicate_threshold = near_duplicate_threshold
+
+    def pack(self, documents: List[Document]) -> List[Document]:
+        """
+        Returns: Merged, deduplicated Documents within the token budget, best first
+        """
+        if not self.enabled or not documents:
+            return documents
+        documents = self.merge_overlaps(documents)
+        documents = self.drop_near_duplicates(documents)
+        return self.fit_budget(documents)
+
+    def merge_overlaps(self, documents: List[Document]) -> List[Document]:
+        """
+        Repeatedly joins a chunk with a later-ranked chunk of the same page
+        when one's tail is the other's head.
+        """
+        merged: List[Document] = []
+        for document in documents:
+            for index, kept in enumerate(merged):
+                if not same_page(kept, document):
+                    continue
+                joined = self._join(kept, document)
+                if joined is not None:
+                    merged[index] = joined
+                    break
+            else:
+                merged.append(document)
+        return merged
+
+    @staticmethod
+    def _join(kept: Document, other: Document) -> Optional[Document]:
+        if other.page_content in kept.page_content:
+            return kept
+        overlap = overlap_length(kept.page_content, other.page_content)
+        if overlap:
+            text = kept.page_content + other.page_content[overlap:]
+            return Document(id=kept.id, page_content=text, metadata=kept.metadata)
+        overlap = overlap_length(other.page_content, kept.page_content)
+        if overlap:
+            text = other.page_content + kept.page_content[overlap:]
+            return Document(id=kept.id, page_content=text, metadata=kept.metadata)
+        return None
+
+    def drop_near_duplicates(self, documents: List[Document]) -> List[Document]:
+        kept: List[Document] = []
+        kept_shingles: List[Set[str]] = []
+        for document in documents:
+            document_shingles = shingles(document.page_content)
+            if any(jaccard(document_shingles, other) >= self.near_duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(document)
+            kept_shingles.append(document_shingles)
+        return kept
+
+    def fit_budget(self, documents: List[Document]) -> List[Document]:
+        """
+        Keeps Documents in rank order while they fit the budget; smaller
+        later ones may still fill the remainder. The best one always fits.
+        The packed token count is recorded as the context size metric.
+        """
+        packed, used = [], 0
+        for document, tokens in zip(documents, count_document_tokens(documents)):
+            if packed and self.token_budget and used + tokens > self.token_budget:
+                continue
+            packed.append(document)
+            used += tokens
+        metrics.record_tokens("context", used)
+        return packed
@@ -1,80 +1,723 @@
-from typing import Tuple, List
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from dotenv import load_dotenv
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Tuple, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.documents import Document
 
-from app.rag.rag import answer_question
-from app.rag.query_analyzer import QueryAnalyzer
+from app.rag import metrics
+from app.rag.tracing import Tracer, current_trace, tracer, use_trace, use_traces
+from app.rag.query_context import QueryContext
+from app.rag.answer_cache import AnswerCache, answer_cache
 from app.rag.query_rewriter import QueryRewriter
-from app.rag.retrieval_policy import determine_top_k
+from app.rag.query_analyzer import QueryAnalyzer
+from app.rag.retrieval_filter import RetrievalFilter
+from app.rag.retrieval_policy import (
+    MAX_TOP_K,
+    PER_PAPER_CAPS,
+    determine_min_top_k,
+    determine_per_paper_cap,
+    determine_top_k,
+)
+from app.rag.hybrid_retrieval import candidate_depth, fuse_candidates
+from app.rag.reranker import RERANKER, Reranker, build_reranker
+from app.rag.context_packer import ContextPacker
+from app.rag.tokens import count_document_tokens, count_tokens
+from app.rag.rag import (
+    rag_registry,
+    generate_answer,
+    agenerate_answer,
+    astream_answer,
+    drop_sources_if_general_knowledge,
+    prompt_template_tokens,
+    retrieve_candidates,
+    aretrieve_candidates,
+    aretrieve_candidates_batch,
+    agenerate_answers_as_completed,
+    retrieve_documents,
+    aretrieve_documents,
+)
+
+load_dotenv()
+
+# Retrieve candidates for the raw question at MAX_TOP_K while the analysis runs
+SPECULATIVE_RETRIEVAL = os.getenv("RAG_SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+SPECULATIVE_WORKERS = int(os.getenv("RAG_SPECULATIVE_WORKERS", "8"))
+# Rewrites / generations in flight at once for one batch of questions
+BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+
+
+class SpeculationStats:
+    """
+    Thread-safe counters of speculative retrieval outcomes:
+    used (trimmed to top_k), re-retrieved (rewrite changed the query), failed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {"used": 0, "re-retrieved": 0, "failed": 0}
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = sum(self._counts.values())
+            return {**self._counts, "use_rate": self._counts["used"] / total if total else 0.0}
 
 
 
 class AdaptiveRAGController:
     """
     Adaptive RAG Orchestrator
+
+    Holds only stateless, shareable components. Everything produced
+    while answering a question lives on that request's QueryContext,
+    so one instance can serve concurrent requests without locks.
     """
-    def __init__(self):
-        self.query_analyzer = QueryAnalyzer()
-        self.query_rewriter = QueryRewriter()
-        self._last_analysis = None
-        self._rewritten_query = None
+    def __init__(
+        self,
+        query_analyzer: Optional[QueryAnalyzer] = None,
+        query_rewriter: Optional[QueryRewriter] = None,
+        answer_cache: AnswerCache = answer_cache,
+        speculative_retrieval: bool = SPECULATIVE_RETRIEVAL,
+        reranker: Optional[Reranker] = None,
+        context_packer: Optional[ContextPacker] = None,
+        tracer: Tracer = tracer,
+    ):
+        self.query_analyzer = query_analyzer or QueryAnalyzer()
+        self.query_rewriter = query_rewriter or QueryRewriter()
+        self.answer_cache = answer_cache
+        self.speculative_retrieval = speculative_retrieval
+        self.reranker = reranker or build_reranker(RERANKER, embeddings=rag_registry.embeddings)
+        self.context_packer = context_packer or ContextPacker()
+        self.tracer = tracer
+        self.speculation_stats = SpeculationStats()
+        self._speculation_pool: Optional[ThreadPoolExecutor] = None
 
 
-    def run(self, question: str) -> Tuple[str, List[Document]]:
+    def run(
+        self, question: str, retrieval_filter: Optional[RetrievalFilter] = None) -> Tuple[str, List[Document]]:
         """
         Entry point for all RAG queries.
         """
-        cleaned_question = self._preprocess_question(question)
+        ctx = QueryContext(question=question, retrieval_filter=retrieval_filter or RetrievalFilter())
+        start = time.perf_counter()
+        self.tracer.start()
+
+        try:
+            if not self._lookup_cached_answer(ctx):
+                if self.speculative_retrieval:
+                    self._speculative_preprocess_question(ctx)
+                else:
+                    self._preprocess_question(ctx)
 
-        answer, documents = self._retrieve_and_generate(cleaned_question)
+                self._retrieve_and_generate(ctx)
 
-        answer, documents = self._postprocess_answer(answer, documents)
+                self._postprocess_answer(ctx)
 
-        return answer, documents
+                self._store_answer(ctx)
+        except Exception as error:
+            self._record_request(ctx, "sync", start, error)
+            raise
+
+        self._record_request(ctx, "sync", start)
+        return ctx.answer, ctx.documents
+
+    async def arun(
+        self, question: str, retrieval_filter: Optional[RetrievalFilter] = None) -> Tuple[str, List[Document]]:
+        """
+        Async entry point: same phases as run, built on ainvoke so a
+        single worker can keep many questions in flight.
+        """
+        ctx = QueryContext(question=question, retrieval_filter=retrieval_filter or RetrievalFilter())
+        start = time.perf_counter()
+        self.tracer.start()
+
+        try:
+            if not await self._alookup_cached_answer(ctx):
+                if self.speculative_retrieval:
+                    await self._aspeculative_preprocess_question(ctx)
+                else:
+                    await self._apreprocess_question(ctx)
+
+                await self._aretrieve_and_generate(ctx)
+
+                self._postprocess_answer(ctx)
+
+                self._store_answer(ctx)
+        except Exception as error:
+            self._record_request(ctx, "async", start, error)
+            raise
+
+        self._record_request(ctx, "async", start)
+        return ctx.answer, ctx.documents
+
+    async def astream(
+        self, question: str, retrieval_filter: Optional[RetrievalFilter] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming entry point. Yields events:
+        - sources: retrieved Documents, as soon as retrieval completes
+        - token: answer text deltas from the document chain
+        - done: whether the sources were actually used for the answer
+        Closing the generator (client gone) cancels the LLM stream.
+        """
+        ctx = QueryContext(question=question, retrieval_filter=retrieval_filter or RetrievalFilter())
+        start = time.perf_counter()
+        self.tracer.start()
+
+        try:
+            if await self._alookup_cached_answer(ctx):
+                metrics.first_token_latency.observe(time.perf_counter() - start)
+                yield {"event": "sources", "data": ctx.documents}
+                yield {"event": "token", "data": ctx.answer}
+                yield {"event": "done", "data": {"sources_used": bool(ctx.documents)}}
+                self._record_request(ctx, "stream", start)
+                return
+
+            if self.speculative_retrieval:
+                await self._aspeculative_preprocess_question(ctx)
+            else:
+                await self._apreprocess_question(ctx)
+
+            documents = await self._aretrieve(ctx)
+            yield {"event": "sources", "data": documents}
+
+            parts = []
+            with metrics.timed_stage("generate"):
+                async with aclosing(astream_answer(ctx.retrieval_question, documents)) as tokens:
+                    async for token in tokens:
+                        if not parts:
+                            metrics.first_token_latency.observe(time.perf_counter() - start)
+                        parts.append(token)
+                        yield {"event": "token", "data": token}
+        except Exception as error:
+            self._record_request(ctx, "stream", start, error)
+            raise
+
+        ctx.answer = "".join(parts).strip()
+        ctx.documents = drop_sources_if_general_knowledge(ctx.answer, documents)
+        self._postprocess_answer(ctx)
+        self._store_answer(ctx)
+
+        yield {"event": "done", "data": {"sources_used": bool(ctx.documents)}}
+        self._record_request(ctx, "stream", start)
+
+    async def arun_batch(
+        self,
+        questions: List[str],
+        retrieval_filter: Optional[RetrievalFilter] = None,
+        max_concurrency: int = BATCH_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        """
+        Batch entry point for evaluation jobs.
+        Returns: One result per question, in order (see astream_batch)
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        async for result in self.astream_batch(questions, retrieval_filter, max_concurrency):
+            results[result["index"]] = result
+        return results
+
+    async def astream_batch(
+        self,
+        questions: List[str],
+        retrieval_filter: Optional[RetrievalFilter] = None,
+        max_concurrency: int = BATCH_CONCURRENCY,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answers many questions, sharing every call that can be shared:
+        - Exact cache tier per question
+        - One analyzer call for all questions the heuristics cannot settle
+        - Rewrites fanned out, max_concurrency at a time
+        - One embeddings request for every question (and rewrite) left
+        - Semantic cache tier on those embeddings
+        - One vector search call per retrieval depth
+        - Generations fanned out, max_concurrency at a time
+        Yields: {"index", "question", "answer", "documents"} (or "error")
+        as each question completes, cache hits first
+        """
+        start = time.perf_counter()
+        retrieval_filter = retrieval_filter or RetrievalFilter()
+        corpus_version = self.answer_cache.current_version()
+        contexts = [
+            QueryContext(question=question, retrieval_filter=retrieval_filter, corpus_version=corpus_version, trace=trace)
+            for question, trace in zip(questions, self.tracer.start_batch(len(questions)))
+        ]
+        cacheable = retrieval_filter.is_empty()
+
+        pending = []
+        for index, ctx in enumerate(contexts):
+            cached = self.answer_cache.get_exact(ctx.question) if cacheable else None
+            if cached is None:
+                pending.append(index)
+                continue
+            metrics.cache_lookups.inc(result="exact")
+            ctx.cache_hit = "exact"
+            ctx.answer, ctx.documents = cached.answer, cached.documents
+            yield self._batch_result(index, ctx, "batch", start)
+        if not pending:
+            return
+
+        await self._apreprocess_batch([contexts[i] for i in pending], max_concurrency)
+        await self._aembed_batch([contexts[i] for i in pending], semantic=cacheable and self.answer_cache.semantic_enabled)
+
+        remaining = []
+        for index in pending:
+            ctx = contexts[index]
+            cached = self.answer_cache.get_similar(ctx.query_embedding) if cacheable else None
+            metrics.cache_lookups.inc(result="semantic" if cached else ("miss" if cacheable else "bypassed"))
+            if cached is None:
+                remaining.append(index)
+                continue
+            ctx.cache_hit = "semantic"
+            ctx.answer, ctx.documents = cached.answer, cached.documents
+            yield self._batch_result(index, ctx, "batch", start)
+        if not remaining:
+            return
+
+        documents = await self._aretrieve_batch([contexts[i] for i in remaining])
+        items = [(contexts[i].retrieval_question, docs) for i, docs in zip(remaining, documents)]
+        generate_start = time.perf_counter()
+        async for position, outcome in agenerate_answers_as_completed(items, max_concurrency):
+            index = remaining[position]
+            ctx = contexts[index]
+            if ctx.trace is not None:
+                ctx.trace.add_stage("generate", time.perf_counter() - generate_start)
+            if isinstance(outcome, Exception):
+                with use_trace(ctx.trace):
+                    self._record_request(ctx, "batch", start, outcome)
+                yield {"index": index, "question": ctx.question, "error": str(outcome)}
+                continue
+            ctx.answer, ctx.documents = outcome
+            self._postprocess_answer(ctx)
+            self._store_answer(ctx)
+            yield self._batch_result(index, ctx, "batch", start)
 
     # -----------------------
     # Internal pipeline steps
     # -----------------------
 
-    def _preprocess_question(self, question: str) -> str:
+    def _lookup_cached_answer(self, ctx: QueryContext) -> bool:
+        """
+        Phase 4:
+        - Exact cache tier on the normalized question
+        - Semantic tier on the question embedding (kept on ctx for retrieval)
+        - Skipped for filtered questions: answers are cached per question only
+        """
+        if not ctx.retrieval_filter.is_empty():
+            metrics.cache_lookups.inc(result="bypassed")
+            return False
+
+        with metrics.timed_stage("cache_lookup"):
+            ctx.corpus_version = self.answer_cache.current_version()
+            cached = self.answer_cache.get_exact(ctx.question)
+            ctx.cache_hit = "exact" if cached else None
+
+            if cached is None and self.answer_cache.semantic_enabled:
+                ctx.query_embedding = rag_registry.embeddings().embed_query(ctx.question)
+                cached = self.answer_cache.get_similar(ctx.query_embedding)
+                ctx.cache_hit = "semantic" if cached else None
+
+        metrics.cache_lookups.inc(result=ctx.cache_hit or "miss")
+        if cached is None:
+            return False
+        ctx.answer, ctx.documents = cached.answer, cached.documents
+        return True
+
+
+    async def _alookup_cached_answer(self, ctx: QueryContext) -> bool:
+        """
+        Async Phase 4
+        """
+        if not ctx.retrieval_filter.is_empty():
+            metrics.cache_lookups.inc(result="bypassed")
+            return False
+
+        with metrics.timed_stage("cache_lookup"):
+            ctx.corpus_version = self.answer_cache.current_version()
+            cached = self.answer_cache.get_exact(ctx.question)
+            ctx.cache_hit = "exact" if cached else None
+
+            if cached is None and self.answer_cache.semantic_enabled:
+                ctx.query_embedding = await rag_registry.embeddings().aembed_query(ctx.question)
+                cached = self.answer_cache.get_similar(ctx.query_embedding)
+                ctx.cache_hit = "semantic" if cached else None
+
+        metrics.cache_lookups.inc(result=ctx.cache_hit or "miss")
+        if cached is None:
+            return False
+        ctx.answer, ctx.documents = cached.answer, cached.documents
+        return True
+
+
+    def _preprocess_question(self, ctx: QueryContext) -> None:
         """
         Phase 3:
         - Analyze query
         - Rewrite if flagged
         """
-        analysis = self.query_analyzer.analyze(question)
-        self._last_analysis = analysis
-
-        if analysis.get("needs_rewrite", False):
-            rewritten = self.query_rewriter.rewrite(question)
-            self._rewritten_query = rewritten
-            return rewritten
+        with metrics.timed_stage("analyze"):
+            ctx.analysis = self.query_analyzer.analyze(ctx.question)
 
-        return question
+        if ctx.analysis.get("needs_rewrite", False):
+            metrics.rewrites.inc()
+            # The combined analyzer call already carries the rewrite
+            ctx.rewritten_query = ctx.analysis.get("rewritten_query")
+            if not ctx.rewritten_query:
+                with metrics.timed_stage("rewrite"):
+                    ctx.rewritten_query = self.query_rewriter.rewrite(ctx.question)
 
 
 
-    def _retrieve_and_generate(self, question: str):
+    def _retrieve(self, ctx: QueryContext) -> List[Document]:
         """
-        Phase 2:
+        Phase 2 (retrieval half):
         - Adaptive retrieval depth based on query analysis
+        - Hybrid fusion weighted by intent (MMR for broad intents),
+          over-fetched for the reranker, restricted by the request filter
+        - Reuses speculative results when still valid
+        - Reranks down to the chunks worth sending to the LLM, capped per paper
+        - Merges overlaps, drops repeats, fits the token budget
         """
-        analysis = self._last_analysis or {}
+        ctx.top_k = determine_top_k(ctx.intent, ctx.complexity)
+        metrics.top_k.observe(ctx.top_k, intent=ctx.intent)
+        depth = self.reranker.fetch_depth(ctx.top_k, self._per_paper_cap(ctx))
 
-        intent = analysis.get("intent", "conceptual")
-        complexity = analysis.get("complexity", "medium")
+        documents = None
+        if ctx.speculative_candidates is not None:
+            documents = self._resolve_speculation(ctx, depth)
+        if documents is None:
+            documents = retrieve_documents(
+                ctx.retrieval_question,
+                top_k=depth,
+                query_embedding=None if ctx.rewritten_query else ctx.query_embedding,
+                intent=ctx.intent,
+                retrieval_filter=ctx.retrieval_filter,
+            )
 
-        top_k = determine_top_k(intent, complexity)
+        with metrics.timed_stage("rerank"):
+            documents = self.reranker.rerank(
+                ctx.retrieval_question,
+                documents,
+                ctx.top_k,
+                self._per_paper_cap(ctx),
+                determine_min_top_k(ctx.intent),
+            )
+        return self._pack_context(documents)
 
-        return answer_question(question, top_k=top_k)
 
+    def _pack_context(self, documents: List[Document]) -> List[Document]:
+        """
+        Returns: Packed context (token count recorded by the packer's budget pass)
+        """
+        with metrics.timed_stage("pack"):
+            documents = self.context_packer.pack(documents)
+        metrics.context_documents.observe(len(documents))
+        return documents
 
-    def _postprocess_answer(self, answer: str, documents: List[Document]) -> Tuple[str, List[Document]]:
+
+    def _retrieve_and_generate(self, ctx: QueryContext) -> None:
+        """
+        Phase 2
+        """
+        documents = self._retrieve(ctx)
+
+        ctx.answer, ctx.documents = generate_answer(ctx.retrieval_question, documents)
+
+
+    async def _apreprocess_question(self, ctx: QueryContext) -> None:
+        """
+        Async Phase 3
+        """
+        with metrics.timed_stage("analyze"):
+            ctx.analysis = await self.query_analyzer.aanalyze(ctx.question)
+
+        if ctx.analysis.get("needs_rewrite", False):
+            metrics.rewrites.inc()
+            ctx.rewritten_query = ctx.analysis.get("rewritten_query")
+            if not ctx.rewritten_query:
+                with metrics.timed_stage("rewrite"):
+                    ctx.rewritten_query = await self.query_rewriter.arewrite(ctx.question)
+
+
+    async def _aretrieve(self, ctx: QueryContext) -> List[Document]:
+        """
+        Async Phase 2 (retrieval half)
+        """
+        ctx.top_k = determine_top_k(ctx.intent, ctx.complexity)
+        metrics.top_k.observe(ctx.top_k, intent=ctx.intent)
+        depth = self.reranker.fetch_depth(ctx.top_k, self._per_paper_cap(ctx))
+
+        documents = None
+        if ctx.speculative_candidates is not None:
+            documents = self._resolve_speculation(ctx, depth)
+        if documents is None:
+            documents = await aretrieve_documents(
+                ctx.retrieval_question,
+                top_k=depth,
+                query_embedding=None if ctx.rewritten_query else ctx.query_embedding,
+                intent=ctx.intent,
+                retrieval_filter=ctx.retrieval_filter,
+            )
+
+        with metrics.timed_stage("rerank"):
+            documents = await self.reranker.arerank(
+                ctx.retrieval_question,
+                documents,
+                ctx.top_k,
+                self._per_paper_cap(ctx),
+                determine_min_top_k(ctx.intent),
+            )
+        return self._pack_context(documents)
+
+
+    async def _aretrieve_and_generate(self, ctx: QueryContext) -> None:
+        """
+        Async Phase 2
+        """
+        documents = await self._aretrieve(ctx)
+
+        ctx.answer, ctx.documents = await agenerate_answer(ctx.retrieval_question, documents)
+
+
+    async def _apreprocess_batch(self, contexts: List[QueryContext], max_concurrency: int) -> None:
+        """
+        Batch Phase 3: one analyzer call, then the flagged rewrites fanned out
+        """
+        with use_traces([ctx.trace for ctx in contexts]), metrics.timed_stage("analyze"):
+            analyses = await self.query_analyzer.aanalyze_batch([ctx.question for ctx in contexts])
+        for ctx, analysis in zip(contexts, analyses):
+            ctx.analysis = analysis
+
+        flagged = [ctx for ctx in contexts if ctx.analysis.get("needs_rewrite", False)]
+        if flagged:
+            metrics.rewrites.inc(len(flagged))
+            with use_traces([ctx.trace for ctx in flagged]), metrics.timed_stage("rewrite"):
+                rewrites = await self.query_rewriter.arewrite_batch([ctx.question for ctx in flagged], max_concurrency)
+            for ctx, rewritten in zip(flagged, rewrites):
+                ctx.rewritten_query = rewritten
+
+
+    async def _aembed_batch(self, contexts: List[QueryContext], semantic: bool) -> None:
+        """
+        One embeddings request for every distinct text the batch needs:
+        the retrieval question of each, plus the original question when
+        it was rewritten and the semantic cache tier will look it up.
+        Sets ctx.query_embedding (original question) and ctx.retrieval_embedding.
+        """
+        texts = {ctx.retrieval_question: None for ctx in contexts}
+        if semantic:
+            texts.update({ctx.question: None for ctx in contexts})
+        with use_traces([ctx.trace for ctx in contexts]), metrics.timed_stage("embed"):
+            vectors = await rag_registry.embeddings().aembed_documents(list(texts))
+        embeddings = dict(zip(texts, vectors))
+        for ctx in contexts:
+            ctx.retrieval_embedding = embeddings[ctx.retrieval_question]
+            ctx.query_embedding = embeddings.get(ctx.question)
+
+
+    async def _aretrieve_batch(self, contexts: List[QueryContext]) -> List[List[Document]]:
+        """
+        Batch Phase 2 (retrieval half): questions needing the same depth
+        share one vector search call; fusion, reranking and packing stay
+        per question, exactly as in _aretrieve.
+        Returns: Packed context per question, in order
+        """
+        depths: Dict[int, List[int]] = {}
+        for position, ctx in enumerate(contexts):
+            ctx.top_k = determine_top_k(ctx.intent, ctx.complexity)
+            metrics.top_k.observe(ctx.top_k, intent=ctx.intent)
+            depths.setdefault(self.reranker.fetch_depth(ctx.top_k, self._per_paper_cap(ctx)), []).append(position)
+
+        fused: List[Optional[List[Document]]] = [None] * len(contexts)
+        for depth, positions in depths.items():
+            with use_traces([contexts[p].trace for p in positions]):
+                candidates = await aretrieve_candidates_batch(
+                    [contexts[p].retrieval_question for p in positions],
+                    [contexts[p].retrieval_embedding for p in positions],
+                    candidate_depth(depth),
+                    contexts[positions[0]].retrieval_filter,
+                )
+            for position, candidate in zip(positions, candidates):
+                with use_trace(contexts[position].trace):
+                    fused[position] = fuse_candidates(candidate, depth, contexts[position].intent)
+
+        reranked = await asyncio.gather(*(
+            self._arerank_batch_item(ctx, documents) for ctx, documents in zip(contexts, fused)
+        ))
+        packed = []
+        for ctx, documents in zip(contexts, reranked):
+            with use_trace(ctx.trace):
+                packed.append(self._pack_context(documents))
+        return packed
+
+
+    async def _arerank_batch_item(self, ctx: QueryContext, documents: List[Document]) -> List[Document]:
+        """
+        Reranks one question of a batch under its own trace (runs as its own task)
+        """
+        with use_trace(ctx.trace), metrics.timed_stage("rerank"):
+            return await self.reranker.arerank(
+                ctx.retrieval_question,
+                documents,
+                ctx.top_k,
+                self._per_paper_cap(ctx),
+                determine_min_top_k(ctx.intent),
+            )
+
+
+    def _batch_result(self, index: int, ctx: QueryContext, mode: str, start: float) -> Dict[str, Any]:
+        with use_trace(ctx.trace):
+            self._record_request(ctx, mode, start)
+        return {"index": index, "question": ctx.question, "answer": ctx.answer, "documents": ctx.documents}
+
+
+    def _speculative_preprocess_question(self, ctx: QueryContext) -> None:
+        """
+        Phase 3 with speculative retrieval:
+        - Retrieve candidates for the raw question at MAX_TOP_K on a worker thread
+        - Analyze / rewrite on the calling thread meanwhile
+        """
+        if self._speculation_pool is None:
+            self._speculation_pool = ThreadPoolExecutor(
+                max_workers=SPECULATIVE_WORKERS, thread_name_prefix="rag-speculation"
+            )
+        # Copy the context so the worker's stage timings land on this question's trace
+        speculative = self._speculation_pool.submit(
+            contextvars.copy_context().run,
+            retrieve_candidates,
+            ctx.question,
+            self._speculative_depth(),
+            ctx.query_embedding,
+            ctx.retrieval_filter,
+        )
+
+        self._preprocess_question(ctx)
+
+        try:
+            ctx.speculative_candidates = speculative.result()
+        except Exception:
+            self._record_speculation(ctx, "failed")
+
+
+    async def _aspeculative_preprocess_question(self, ctx: QueryContext) -> None:
+        """
+        Async Phase 3 with speculative retrieval
+        """
+        speculative = asyncio.create_task(
+            aretrieve_candidates(
+                ctx.question,
+                self._speculative_depth(),
+                query_embedding=ctx.query_embedding,
+                retrieval_filter=ctx.retrieval_filter,
+            )
+        )
+
+        try:
+            await self._apreprocess_question(ctx)
+        except BaseException:
+            speculative.cancel()
+            raise
+
+        try:
+            ctx.speculative_candidates = await speculative
+        except Exception:
+            self._record_speculation(ctx, "failed")
+
+
+    def _resolve_speculation(self, ctx: QueryContext, depth: int) -> Optional[List[Document]]:
+        """
+        Returns: Speculative candidates fused down to depth, or None when
+        a rewrite changed the query and retrieval must be redone.
+        """
+        if ctx.rewritten_query and ctx.rewritten_query != ctx.question:
+            self._record_speculation(ctx, "re-retrieved")
+            return None
+
+        self._record_speculation(ctx, "used")
+        return fuse_candidates(ctx.speculative_candidates, depth, ctx.intent)
+
+
+    def _speculative_depth(self) -> int:
+        """
+        Returns: Candidates per ranking that cover any top_k (and per-paper
+        cap) the analysis may pick
+        """
+        return candidate_depth(self.reranker.fetch_depth(MAX_TOP_K, max(PER_PAPER_CAPS.values())))
+
+
+    @staticmethod
+    def _per_paper_cap(ctx: QueryContext) -> Optional[int]:
+        return determine_per_paper_cap(ctx.intent, ctx.retrieval_filter)
+
+
+    def _record_speculation(self, ctx: QueryContext, outcome: str) -> None:
+        ctx.speculation = outcome
+        self.speculation_stats.record(outcome)
+        metrics.speculations.inc(outcome=outcome)
+
+
+    def _record_request(
+        self, ctx: QueryContext, mode: str, start: float, error: Optional[Exception] = None) -> None:
+        """
+        Records the end-to-end latency and token counts of a question
+        (or its error), and hands its trace to the tracer when traced.
+        """
+        trace = current_trace()
+        if error is not None:
+            metrics.request_errors.inc(mode=mode)
+        elif metrics.METRICS_ENABLED or trace is not None:
+            metrics.request_duration.observe(time.perf_counter() - start, mode=mode, cache=ctx.cache_hit or "miss")
+            metrics.record_tokens("question", count_tokens(ctx.question))
+            if ctx.cache_hit is None:
+                metrics.record_tokens("answer", count_tokens(ctx.answer))
+        if trace is None:
+            return
+
+        if ctx.cache_hit is None and error is None:
+            trace.add_answer_support(ctx.answer)
+            if "context" not in trace.tokens:
+                trace.add_tokens("context", sum(count_document_tokens(ctx.documents)))
+            trace.add_tokens(
+                "prompt", prompt_template_tokens() + count_tokens(ctx.retrieval_question) + trace.tokens["context"]
+            )
+        self.tracer.finish(trace, {
+            "mode": mode,
+            "question": ctx.question,
+            "rewritten_question": ctx.rewritten_query,
+            "analysis": ctx.analysis,
+            "top_k": ctx.top_k,
+            "filtered": not ctx.retrieval_filter.is_empty(),
+            "cache_hit": ctx.cache_hit,
+            "speculation": ctx.speculation,
+            "context_chunk_ids": [document.id for document in ctx.documents],
+            "error": repr(error) if error is not None else None,
+        })
+
+
+    def _postprocess_answer(self, ctx: QueryContext) -> None:
         """
         Phase 0:
         - No postprocessing
         - Reserved for validation / correction
         """
-        return answer, documents
+
+
+    def _store_answer(self, ctx: QueryContext) -> None:
+        """
+        Caches the final answer under the original question.
+        """
+        if not ctx.retrieval_filter.is_empty():
+            return
+        self.answer_cache.put(
+            ctx.question, ctx.answer, ctx.documents, embedding=ctx.query_embedding, version=ctx.corpus_version
+        )
 
 
 adaptive_rag_controller = AdaptiveRAGController()
+
+rag_registry.on_reload(answer_cache.clear)
@@ -0,0 +1,231 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+# Hits refresh last_used in memory; written with the next store, or once
+# this many are pending or this many seconds have passed
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("RAG_EMBEDDING_CACHE_TOUCH_BATCH", "1000"))
+EMBEDDING_CACHE_TOUCH_SECONDS = float(os.getenv("RAG_EMBEDDING_CACHE_TOUCH_SECONDS", "60"))
+
+# SQLite caps bound parameters per statement
+LOOKUP_CHUNK_SIZE = 500
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Hash text-> Look up (model, sha256)-> Embed misses-> Store float32 blobs-> Evict least recently used
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed embedding cache wrapping another Embeddings client.
+    Rows are keyed by (model name, sha256 of text) and hold the vector
+    as a float32 blob; past max_entries the least recently used rows go.
+    A hit only notes its last_used in memory: the notes are written in
+    batches (see EMBEDDING_CACHE_TOUCH_BATCH), so a cached question costs
+    a read, not a disk write. Safe to share between threads and between
+    the API and ingestion processes (SQLite WAL); the async methods run
+    SQLite on a worker thread.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_path: str,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        model: Optional[str] = None,
+        touch_batch: int = EMBEDDING_CACHE_TOUCH_BATCH,
+        touch_seconds: float = EMBEDDING_CACHE_TOUCH_SECONDS,
+    ):
+        self.embeddings = embeddings
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.touch_batch = touch_batch
+        self.touch_seconds = touch_seconds
+        self.hits = 0
+        self.misses = 0
+        # key -> last hit time, not yet written
+        self._touched: Dict[str, float] = {}
+        self._touches_flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        self._entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.cache_path, check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        connection.commit()
+        return connection
+
+    # -----------------------
+    # Embeddings interface
+    # -----------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        cached = self._lookup(keys)
+        missing = self._missing(texts, keys, cached)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            cached.update(self._store(list(missing), vectors))
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        A miss goes to the wrapped client's embed_query, so a scheduler
+        underneath admits it as a question, not as an ingestion batch.
+        """
+        key = text_key(text)
+        cached = self._lookup([key])
+        if self._missing([text], [key], cached):
+            cached.update(self._store([key], [self.embeddings.embed_query(text)]))
+        return cached[key]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        cached = await asyncio.to_thread(self._lookup, keys)
+        missing = self._missing(texts, keys, cached)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            cached.update(await asyncio.to_thread(self._store, list(missing), vectors))
+        return [cached[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = text_key(text)
+        cached = await asyncio.to_thread(self._lookup, [key])
+        if self._missing([text], [key], cached):
+            vector = await self.embeddings.aembed_query(text)
+            cached.update(await asyncio.to_thread(self._store, [key], [vector]))
+        return cached[key]
+
+    # -----------------------
+    # Storage
+    # -----------------------
+
+    def _missing(self, texts: List[str], keys: List[str], cached: Dict[str, List[float]]) -> Dict[str, str]:
+        """
+        Returns: key -> text for cache misses, deduplicated and in first-seen order
+        """
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return missing
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        unique_keys = list(dict.fromkeys(keys))
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(unique_keys), LOOKUP_CHUNK_SIZE):
+                chunk = unique_keys[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [self.model, *chunk],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if (
+                    len(self._touched) >= self.touch_batch
+                    or time.monotonic() - self._touches_flushed >= self.touch_seconds
+                ):
+                    self._write_touches()
+                    self._connection.commit()
+        return found
+
+    def flush(self) -> None:
+        """
+        Writes the pending last_used updates of cache hits.
+        """
+        with self._lock:
+            if self._touched:
+                self._write_touches()
+                self._connection.commit()
+
+    def _write_touches(self) -> None:
+        """
+        Caller holds the lock and commits.
+        """
+        self._connection.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+            [(last_used, self.model, key) for key, last_used in self._touched.items()],
+        )
+        self._touched = {}
+        self._touches_flushed = time.monotonic()
+
+    def _store(self, keys: List[str], vectors: List[List[float]]) -> Dict[str, List[float]]:
+        """
+        Returns: key -> vector rounded to float32, exactly as later hits will return it
+        """
+        now = time.time()
+        arrays = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        rows = [(self.model, key, array.tobytes(), now) for key, array in zip(keys, arrays)]
+        with self._lock:
+            # Pending hits ride along in the same transaction, and evictions see them
+            if self._touched:
+                self._write_touches()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._evict()
+            self._connection.commit()
+        return {key: array.tolist() for key, array in zip(keys, arrays)}
+
+    def _evict(self) -> None:
+        """
+        Deletes least recently used rows down to 90% of max_entries.
+        Caller holds the lock.
+        """
+        self._entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._entries -= excess
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._entries}
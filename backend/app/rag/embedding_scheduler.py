@@ -0,0 +1,308 @@
+import os
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import tiktoken
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+# Per-request limits (OpenAI allows 2048 inputs / 300k tokens per embeddings call)
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("RAG_EMBEDDING_MAX_BATCH_TOKENS", "50000"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("RAG_EMBEDDING_MAX_BATCH_SIZE", "512"))
+# In-flight document batches (ingestion), and single-question embeddings (API requests)
+EMBEDDING_CONCURRENCY = int(os.getenv("RAG_EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_QUERY_CONCURRENCY = int(os.getenv("RAG_EMBEDDING_QUERY_CONCURRENCY", "64"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("RAG_EMBEDDING_MAX_RETRIES", "6"))
+
+TOKEN_ENCODING = "cl100k_base"
+# Batches are sized by characters when the tokenizer cannot be loaded (its BPE file is
+# downloaded on first use); English averages ~4 per token, so 3 keeps batches under the limit
+FALLBACK_CHARS_PER_TOKEN = 3
+
+# Retried with back-off, without throttling the other senders
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+logger = logging.getLogger(__name__)
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Token-aware batches-> Bounded in-flight requests-> Back off on 429 (AIMD) and on transient errors
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight embedding requests. The cap halves and every
+    sender pauses on a rate-limit response, then grows back by one
+    after each `limit` consecutive successes (AIMD).
+    Usable from threads and coroutines alike: threads block on a
+    condition variable, coroutines on a future, and both are woken
+    when a slot frees up or the pause ends.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.rate_limited = 0
+        self._successes = 0
+        self._pause_until = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _try_acquire(self) -> Optional[float]:
+        """
+        Caller holds the condition.
+        Returns: None when a slot was taken, else the pause left (0 = wait for a release)
+        """
+        wait = self._pause_until - time.monotonic()
+        if wait > 0:
+            return wait
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+            return None
+        return 0.0
+
+    def acquire(self) -> None:
+        with self._condition:
+            while (wait := self._try_acquire()) is not None:
+                self._condition.wait(timeout=wait or None)
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                wait = self._try_acquire()
+                if wait is None:
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, timeout=wait or None)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, succeeded: bool) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if succeeded:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._wake_waiters()
+
+    def on_rate_limit(self, backoff_seconds: float) -> None:
+        with self._condition:
+            self.rate_limited += 1
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self._pause_until = max(self._pause_until, time.monotonic() + backoff_seconds)
+
+    def _wake_waiters(self) -> None:
+        """
+        Caller holds the condition. Every waiter re-checks for a slot, so
+        none is lost when a woken one has been cancelled meanwhile.
+        """
+        self._condition.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, waiter)
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings client with token-aware batching, a bounded
+    number of concurrent requests and adaptive throttling on 429s.
+    Used for both ingestion and query-time embedding: document batches
+    and single questions get separate limiters, so ingestion-sized
+    concurrency never queues the API's question embeddings.
+    Connection errors, timeouts and 5xx responses are retried with
+    back-off (the OpenAI client's own retries are off).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_concurrency: int = EMBEDDING_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        rate_limit_errors: Tuple[Type[BaseException], ...] = (openai.RateLimitError,),
+        transient_errors: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+        query_concurrency: int = EMBEDDING_QUERY_CONCURRENCY,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.rate_limit_errors = rate_limit_errors
+        self.transient_errors = transient_errors
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.query_limiter = AdaptiveConcurrencyLimiter(query_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rag-embed")
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.embeddings, "model", None)
+
+    # -----------------------
+    # Embeddings interface
+    # -----------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = self.make_batches(texts)
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        results = self._pool.map(self._embed_batch, batches)
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call_with_retries(self.embeddings.embed_query, text, self.query_limiter)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        results = await asyncio.gather(*(self._aembed_batch(batch) for batch in self.make_batches(texts)))
+        return [vector for batch in results for vector in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall_with_retries(self.embeddings.aembed_query, text, self.query_limiter)
+
+    # -----------------------
+    # Batching and scheduling
+    # -----------------------
+
+    def make_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Returns: Consecutive slices of texts under both the token and size limits
+        """
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for text, tokens in zip(texts, count_tokens(texts)):
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        return self._call_with_retries(self.embeddings.embed_documents, batch, self.limiter)
+
+    async def _aembed_batch(self, batch: List[str]) -> List[List[float]]:
+        return await self._acall_with_retries(self.embeddings.aembed_documents, batch, self.limiter)
+
+    def _call_with_retries(self, fn, payload, limiter: AdaptiveConcurrencyLimiter) -> Any:
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            try:
+                result = fn(payload)
+            except self.rate_limit_errors as error:
+                limiter.release(succeeded=False)
+                self._handle_rate_limit(error, attempt, limiter)
+                continue
+            except self.transient_errors as error:
+                limiter.release(succeeded=False)
+                time.sleep(self._transient_backoff(error, attempt))
+                continue
+            except BaseException:
+                limiter.release(succeeded=False)
+                raise
+            limiter.release(succeeded=True)
+            return result
+        raise RuntimeError(f"Embedding request still failing after {self.max_retries} retries")
+
+    async def _acall_with_retries(self, fn, payload, limiter: AdaptiveConcurrencyLimiter) -> Any:
+        for attempt in range(self.max_retries + 1):
+            await limiter.aacquire()
+            try:
+                result = await fn(payload)
+            except self.rate_limit_errors as error:
+                limiter.release(succeeded=False)
+                self._handle_rate_limit(error, attempt, limiter)
+                continue
+            except self.transient_errors as error:
+                limiter.release(succeeded=False)
+                await asyncio.sleep(self._transient_backoff(error, attempt))
+                continue
+            except BaseException:
+                limiter.release(succeeded=False)
+                raise
+            limiter.release(succeeded=True)
+            return result
+        raise RuntimeError(f"Embedding request still failing after {self.max_retries} retries")
+
+    def _handle_rate_limit(self, error: BaseException, attempt: int, limiter: AdaptiveConcurrencyLimiter) -> None:
+        if attempt >= self.max_retries:
+            raise error
+        limiter.on_rate_limit(retry_after_seconds(error) or backoff_seconds(attempt))
+
+    def _transient_backoff(self, error: BaseException, attempt: int) -> float:
+        """
+        Returns: Seconds this sender waits before retrying; re-raises after the last attempt
+        """
+        if attempt >= self.max_retries:
+            raise error
+        return backoff_seconds(attempt)
+
+
+@lru_cache(maxsize=None)
+def load_encoding(name: str = TOKEN_ENCODING) -> Optional[tiktoken.Encoding]:
+    """
+    Returns: The tokenizer, loaded on first use rather than at startup,
+    or None when it cannot be loaded (offline without a cached BPE file)
+    """
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as error:
+        logger.warning("Embedding batches sized by characters: %s tokenizer unavailable (%s)", name, error)
+        return None
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """
+    Returns: Tokens of each text, estimated from its length without the tokenizer
+    """
+    if not texts:
+        return []
+    encoding = load_encoding()
+    if encoding is None:
+        return [math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Returns: Server-suggested wait from a Retry-After header, if any
+    """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_seconds(attempt: int) -> float:
+    return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.8, 1.2)
@@ -0,0 +1,76 @@
+import re
+from typing import Optional
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Keyword rules-> Intent-> Complexity-> Rewrite flag-> Confident result or None
+
+
+INTENT_PATTERNS = {
+    "procedural": re.compile(
+        r"^(how (do|can|should|would) (i|we|you|one)|how to|steps? (to|for)|what are the steps)\b"
+        r"|\b(step[- ]by[- ]step|implement|install|configure|set up|reproduce|train)\b"
+    ),
+    "factual": re.compile(
+        r"^(what is|what are|what was|what does .{1,40} stand for|who|when|where|which|define|how many|how much)\b"
+        r"|\b(definition of|acronym|stands? for)\b"
+    ),
+    "conceptual": re.compile(
+        r"^(why|explain|how does|how do .{1,40} work|what is the (role|purpose|intuition|idea))\b"
+        r"|\b(difference between|compare|comparison|versus|vs\.?|trade-?offs?|intuition behind)\b"
+    ),
+    "exploratory": re.compile(
+        r"\b(overview|survey|state of the art|recent (work|advances|research)|trends?|"
+        r"literature|tell me about|what research|research directions?|open problems)\b"
+    ),
+}
+
+# A "what is/are" opener is weaker evidence than an explicit explanation request
+WEAK_FACTUAL_OPENER = re.compile(r"^(what is|what are|what was)\b")
+
+VAGUE_PATTERNS = re.compile(r"\b(stuff|things|etc|something|anything|whatever)\b|^(it|this|that|they)\b")
+
+HIGH_COMPLEXITY_MARKERS = re.compile(r"\b(and|versus|vs\.?|compare|relationship between|trade-?offs?|across)\b")
+
+
+class HeuristicQueryAnalyzer:
+    """
+    Network-free rule/keyword classifier for the QueryAnalyzer fields.
+    Returns a QueryAnalysis-shaped dict, or None when the query is
+    ambiguous so the caller can fall back to the LLM.
+    """
+
+    def classify(self, query: str) -> Optional[dict]:
+        text = re.sub(r"\s+", " ", query.strip().lower())
+        if not text:
+            return None
+
+        intent = self._intent(text)
+        if intent is None:
+            return None
+
+        return {
+            "intent": intent,
+            "complexity": self._complexity(text),
+            "needs_rewrite": self._needs_rewrite(text),
+        }
+
+    def _intent(self, text: str) -> Optional[str]:
+        matches = [intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(text)]
+
+        if len(matches) == 2 and "factual" in matches and WEAK_FACTUAL_OPENER.search(text):
+            matches.remove("factual")
+
+        return matches[0] if len(matches) == 1 else None
+
+    def _complexity(self, text: str) -> str:
+        words = len(text.split())
+        markers = len(HIGH_COMPLEXITY_MARKERS.findall(text))
+        if words > 20 or markers >= 2:
+            return "high"
+        if words <= 5 and markers == 0:
+            return "low"
+        return "medium"
+
+    def _needs_rewrite(self, text: str) -> bool:
+        return len(text.split()) == 1 or bool(VAGUE_PATTERNS.search(text))
@@ -0,0 +1,88 @@
+import os
+import threading
+import importlib.util
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connections open at once across every OpenAI call in the process (chat + embeddings)
+HTTP_MAX_CONNECTIONS = int(os.getenv("RAG_HTTP_MAX_CONNECTIONS", "100"))
+# Idle connections kept alive for reuse, and for how long (seconds)
+HTTP_MAX_KEEPALIVE = int(os.getenv("RAG_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("RAG_HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("RAG_HTTP_CONNECT_TIMEOUT", "5"))
+# auto: HTTP/2 when the optional h2 package is installed | true | false
+HTTP2 = os.getenv("RAG_HTTP2", "auto").lower()
+
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_lock = threading.Lock()
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#One sync + one async httpx client per process-> Injected into every ChatOpenAI / OpenAIEmbeddings-> Keep-alive pool shared by all stages
+
+
+def http2_enabled() -> bool:
+    if HTTP2 == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return HTTP2 == "true"
+
+
+def _client_options() -> dict:
+    """
+    Returns: Settings shared by the sync and async client. The read
+    timeout is only a fallback: each model passes its own per request.
+    """
+    return {
+        "http2": http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(600, connect=HTTP_CONNECT_TIMEOUT),
+        "follow_redirects": True,
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Returns: The process-wide sync HTTP client for OpenAI calls, created on first use
+    """
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns: The process-wide async HTTP client for OpenAI calls, created on first use.
+    Its pooled connections belong to the event loop that opened them, i.e. the app's loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = httpx.AsyncClient(**_client_options())
+    return _async_client
+
+
+async def aclose_http_clients() -> None:
+    """
+    Closes both clients and their pooled connections (app shutdown).
+    """
+    global _sync_client, _async_client
+    with _lock:
+        sync_client, async_client = _sync_client, _async_client
+        _sync_client = _async_client = None
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -0,0 +1,129 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from app.rag.metrics import timed_stage
+from app.rag.retrieval_policy import determine_keyword_weight, determine_retrieval_mode
+
+load_dotenv()
+
+HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "true").lower() == "true"
+# Depth of each ranking fed into fusion
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+# Standard RRF damping constant
+RRF_K = 60
+# Dense candidates MMR picks from, and its relevance/diversity trade-off (1 = plain similarity)
+MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "20"))
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))
+# Metadata key of a fused Document's cosine similarity to the question (dense
+# hits only), which the reranker's score-aware cutoff reads
+SIMILARITY_KEY = "similarity"
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Dense ranking (MMR-diversified per intent) + Keyword ranking-> Weighted reciprocal rank fusion-> Top_k Documents (+ similarity)
+
+
+@dataclass
+class RetrievalCandidates:
+    """
+    Rankings retrieved for one question, before fusion.
+    Kept separate so fusion (and MMR) can wait for the query analysis.
+    """
+    dense: List[Document]
+    keyword: List[Document] = field(default_factory=list)
+    query_embedding: Optional[List[float]] = None
+    dense_embeddings: Optional[List[List[float]]] = None
+
+    def similarities(self) -> Dict[str, float]:
+        """
+        Returns: Cosine similarity of each dense hit to the question, by
+        document key (empty when the vectors were not fetched)
+        """
+        if not self.dense_embeddings or self.query_embedding is None:
+            return {}
+        matrix = np.asarray(self.dense_embeddings, dtype=np.float32)
+        query = np.asarray(self.query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms > 0, norms, 1.0)
+        return {document_key(document): float(score) for document, score in zip(self.dense, scores)}
+
+
+def candidate_depth(top_k: int) -> int:
+    """
+    Returns: How many results to pull from each ranking for top_k fused results
+    """
+    return max(top_k, HYBRID_CANDIDATES if HYBRID_RETRIEVAL else top_k, MMR_FETCH_K)
+
+
+def document_key(document: Document) -> str:
+    return document.id or document.page_content
+
+
+def reciprocal_rank_fusion(
+    rankings: List[Tuple[List[Document], float]], top_k: int, k: int = RRF_K) -> List[Document]:
+    """
+    Scores every Document by sum(weight / (k + rank)) over the rankings it appears in.
+    Returns: Top_k Documents, best first (ties keep first-seen order)
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking, weight in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document_key(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [documents[key] for key in best]
+
+
+def mmr_ranking(candidates: RetrievalCandidates, lambda_mult: float = MMR_LAMBDA) -> List[Document]:
+    """
+    Returns: The first MMR_FETCH_K dense candidates re-ordered by maximal
+    marginal relevance (unchanged when their vectors were not fetched)
+    """
+    if not candidates.dense_embeddings or candidates.query_embedding is None:
+        return candidates.dense
+    pool = candidates.dense_embeddings[:MMR_FETCH_K]
+    order = maximal_marginal_relevance(
+        np.asarray(candidates.query_embedding, dtype=np.float32), pool, lambda_mult=lambda_mult, k=len(pool)
+    )
+    return [candidates.dense[i] for i in order]
+
+
+def fuse_candidates(candidates: RetrievalCandidates, top_k: int, intent: str) -> List[Document]:
+    """
+    Returns: Top_k Documents (the dense ranking alone when there is no keyword
+    ranking), dense hits carrying their similarity under SIMILARITY_KEY
+    """
+    with timed_stage("fusion"):
+        dense = mmr_ranking(candidates) if determine_retrieval_mode(intent) == "mmr" else candidates.dense
+        if not candidates.keyword:
+            fused = dense[:top_k]
+        else:
+            keyword_weight = determine_keyword_weight(intent)
+            fused = reciprocal_rank_fusion([(dense, 1.0 - keyword_weight), (candidates.keyword, keyword_weight)], top_k)
+        return with_similarities(fused, candidates.similarities())
+
+
+def with_similarities(documents: List[Document], similarities: Dict[str, float]) -> List[Document]:
+    """
+    Returns: Copies of the Documents with their similarity in the metadata
+    (the originals may be shared, e.g. by the keyword index)
+    """
+    if not similarities:
+        return documents
+    annotated = []
+    for document in documents:
+        similarity = similarities.get(document_key(document))
+        if similarity is None:
+            annotated.append(document)
+            continue
+        metadata = {**(document.metadata or {}), SIMILARITY_KEY: round(similarity, 4)}
+        annotated.append(Document(id=document.id, page_content=document.page_content, metadata=metadata))
+    return annotated
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+MANIFEST_FILE_NAME = "ingestion_manifest.json"
+MANIFEST_VERSION = 2
+# Replaced by ingestion whenever chunks were added or removed; the API's answer cache watches it
+CORPUS_VERSION_FILE_NAME = "corpus_version"
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Hash files-> Compare with manifest-> Persist manifest atomically
+
+
+class ManifestEntry(TypedDict):
+    sha256: str
+    size: int
+    mtime_ns: int
+    chunk_count: int
+
+
+def manifest_path(vector_database_path: str) -> str:
+    return os.path.join(vector_database_path, MANIFEST_FILE_NAME)
+
+
+def load_manifest(vector_database_path: str) -> Dict[str, ManifestEntry]:
+    """
+    Returns: file name -> entry of the last successful ingestion (empty if none)
+    """
+    path = manifest_path(vector_database_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    files = data.get("files", {})
+    if data.get("version") == 1:
+        # v1 stored every chunk id; they are derivable from sha256 + count
+        return {
+            name: {**{k: v for k, v in entry.items() if k != "chunk_ids"}, "chunk_count": len(entry["chunk_ids"])}
+            for name, entry in files.items()
+        }
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return files
+
+
+def save_manifest(vector_database_path: str, files: Dict[str, ManifestEntry]) -> None:
+    """
+    Writes the manifest through a temp file + rename so a crash
+    never leaves a truncated manifest behind.
+    """
+    os.makedirs(vector_database_path, exist_ok=True)
+    path = manifest_path(vector_database_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": dict(sorted(files.items()))}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def bump_corpus_version(vector_database_path: str) -> None:
+    """
+    Marks the indexed corpus as changed: answers cached before now are stale.
+    Written through a temp file + rename, so every bump is a new file.
+    """
+    os.makedirs(vector_database_path, exist_ok=True)
+    path = os.path.join(vector_database_path, CORPUS_VERSION_FILE_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+
+def corpus_version(vector_database_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns: Token that changes with every bump_corpus_version (one stat call),
+    or None before the first ingestion
+    """
+    try:
+        stat = os.stat(os.path.join(vector_database_path, CORPUS_VERSION_FILE_NAME))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str, previous: ManifestEntry | None) -> ManifestEntry:
+    """
+    Returns: Entry for path with no chunks recorded yet. The content hash is
+    reused from the previous entry when size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        sha256 = previous["sha256"]
+    else:
+        sha256 = file_sha256(path)
+    return {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chunk_count": 0}
+
+
+def chunk_id(sha256: str, index: int) -> str:
+    """
+    Returns: Deterministic chunk id from the file content hash and chunk position
+    """
+    return f"{sha256[:32]}-{index:05d}"
+
+
+def entry_chunk_ids(entry: ManifestEntry) -> List[str]:
+    """
+    Returns: Ids of every chunk ingested for a manifest entry
+    """
+    return [chunk_id(entry["sha256"], index) for index in range(entry["chunk_count"])]
@@ -1,30 +1,96 @@
 import os
+import time
+import logging
+import argparse
+from collections import deque
+from functools import lru_cache
+from typing import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from app.rag.embedding_cache import CachedEmbeddings
+from app.rag.http_clients import get_async_http_client, get_http_client
+from app.rag.vector_backend import open_vector_database
+from app.rag.numpy_vectorstore import NumpyVectorStore
+from app.rag.retrieval_filter import FILENAME_KEY, source_filename
+from app.rag.keyword_index import LEGACY_KEYWORD_INDEX_FILE_NAME, KeywordIndexStore, keyword_index_path
+from app.rag.embedding_scheduler import EMBEDDING_MAX_BATCH_SIZE, ScheduledEmbeddings
+from app.rag.ingestion_manifest import (
+    ManifestEntry,
+    chunk_id,
+    load_manifest,
+    save_manifest,
+    bump_corpus_version,
+    entry_chunk_ids,
+    file_fingerprint,
+)
+
 # === File & database paths ===
-files_folder_path = r"C:\Users\dell\Desktop\UMT\7th semester\Research papers"
+files_folder_path = os.getenv("RAG_PAPERS_PATH", r"C:\Users\dell\Desktop\UMT\7th semester\Research papers")
 vector_database_path = "/app/vector_database"
 
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+EMBEDDING_CACHE_ENABLED = os.getenv("RAG_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv(
+    "RAG_EMBEDDING_CACHE_PATH", os.path.join(vector_database_path, "embedding_cache.sqlite3")
+)
+INGESTION_WORKERS = int(os.getenv("RAG_INGESTION_WORKERS", str(os.cpu_count() or 1)))
+# Chunks embedded and written to the vector database per call; the embedding scheduler
+# splits each batch into concurrent, token-bounded requests
+INGESTION_BATCH_SIZE = int(os.getenv("RAG_INGESTION_BATCH_SIZE", "2048"))
+# Parsed files allowed to wait for the embedder before parsing pauses
+INGESTION_MAX_IN_FLIGHT = int(os.getenv("RAG_INGESTION_MAX_IN_FLIGHT", str(2 * INGESTION_WORKERS)))
+CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("RAG_INGESTION_CHECKPOINT_SECONDS", "5"))
+# Chunks read back from the vector database per call when backfilling the keyword index
+BACKFILL_PAGE_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
 #----------------------------------------------------------------------------------------------------------------------------------------
-#Loading PDFs-> Chunking-> Embedding and Chunk Storage-> Ingestion
+#Scan PDFs-> Diff against manifest-> Stream: load page-> split (+ filename)-> batch embed-> write (+ keyword index)-> Checkpoint
 
-def load_pdf_files(files_folder_path: str) -> list[Document]:
+@lru_cache(maxsize=1)
+def get_openai_embeddings() -> OpenAIEmbeddings:
+    """
+    Returns: The process-wide OpenAI embeddings client, on the shared HTTP connection pool
+    """
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL_NAME,
+        chunk_size=EMBEDDING_MAX_BATCH_SIZE,
+        # Rate limits and transient errors are retried by the scheduler so it can throttle
+        max_retries=0,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+
+
+def get_embedding_model() -> Embeddings:
+    """
+    Returns: Embedding model shared by ingestion and query-time retrieval:
+    persistent cache -> scheduler (batching, concurrency, 429 back-off) -> OpenAI
+    """
+    embedding_model = ScheduledEmbeddings(get_openai_embeddings())
+    if EMBEDDING_CACHE_ENABLED:
+        embedding_model = CachedEmbeddings(embedding_model, EMBEDDING_CACHE_PATH)
+    return embedding_model
+
+
+def list_pdf_files(files_folder_path: str) -> dict[str, str]:
     """
     Loads: All files with .pdf extension
-    Returns: List of Document Objects
+    Returns: File name -> full path, sorted by name for deterministic ingestion
     """
-    all_pdf_files = []
-    for file in os.listdir(files_folder_path):
-        if file.lower().endswith(".pdf"):
-            loader = PyPDFLoader(os.path.join(files_folder_path, file))
-            documents = loader.load()
-            all_pdf_files.extend(documents)
-    return all_pdf_files
+    return {
+        file: os.path.join(files_folder_path, file)
+        for file in sorted(os.listdir(files_folder_path))
+        if file.lower().endswith(".pdf")
+    }
 
 
 def split_text_into_chunks(All_pdf_files: list[Document]) -> list[Document]:
@@ -36,31 +102,197 @@ def split_text_into_chunks(All_pdf_files: list[Document]) -> list[Document]:
     chunked_documents = text_splitter.split_documents(All_pdf_files)
     return chunked_documents
 
-def embed_chunks_and_Vector_storage(chunked_documents: list[Document]) -> Chroma:
+
+def load_and_split_pdf(pdf_path: str) -> list[Document]:
     """
-    Embeds: Chunked Documents into Vector Database
-    Returns: Vector Database
+    Runs in a worker process.
+    Loads: One PDF page by page
+    Returns: Its chunked Documents, tagged with the file name retrieval
+    filters match on (only this file is ever held in memory)
     """
-    embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
-    vector_database = Chroma.from_documents(
-        documents=chunked_documents,
-        embedding=embedding_model,
-        persist_directory=vector_database_path,
-    )
-    return vector_database
+    chunked_documents = []
+    for page in PyPDFLoader(pdf_path).lazy_load():
+        page.metadata[FILENAME_KEY] = os.path.basename(pdf_path)
+        chunked_documents.extend(split_text_into_chunks([page]))
+    return chunked_documents
+
+
+def iter_chunked_files(
+    pdf_paths: dict[str, str], workers: int, max_in_flight: int) -> Iterator[tuple[str, list[Document]]]:
+    """
+    Parses PDFs in a process pool, yielding (file name, chunks) in input order.
+    At most max_in_flight files are parsed ahead of the consumer (backpressure).
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for name, path in pdf_paths.items():
+            if len(pending) >= max_in_flight:
+                done_name, future = pending.popleft()
+                yield done_name, future.result()
+            pending.append((name, pool.submit(load_and_split_pdf, path)))
+        while pending:
+            done_name, future = pending.popleft()
+            yield done_name, future.result()
+
 
-def ingestion_process()->Chroma:
+def iter_chunk_batches(
+    chunked_files: Iterable[tuple[str, list[Document]]],
+    fingerprints: dict[str, ManifestEntry],
+    batch_size: int,
+) -> Iterator[tuple[list[Document], list[str], list[tuple[str, int]]]]:
     """
-    Calls Functions:
+    Regroups per-file chunks into fixed-size batches.
+    Yields: (chunks, chunk ids, files whose last chunk is in this or an earlier batch)
+    """
+    documents, ids, completed = [], [], []
+    for name, chunked_documents in chunked_files:
+        sha256 = fingerprints[name]["sha256"]
+        for index, document in enumerate(chunked_documents):
+            documents.append(document)
+            ids.append(chunk_id(sha256, index))
+            if len(documents) >= batch_size:
+                yield documents, ids, completed
+                documents, ids, completed = [], [], []
+        completed.append((name, len(chunked_documents)))
+    if documents or completed:
+        yield documents, ids, completed
+
+
+def open_keyword_index_store(vector_database: VectorStore, vector_database_path: str) -> KeywordIndexStore:
+    """
+    Loads: The keyword index term table kept next to the vector database
+    Returns: It, backfilled page by page from every chunk already in the
+    vector database when the database predates it (or an older layout)
+    """
+    store = KeywordIndexStore(keyword_index_path(vector_database_path))
+    if len(store):
+        return store
+    offset = 0
+    while True:
+        stored = vector_database.get(include=["documents", "metadatas"], limit=BACKFILL_PAGE_SIZE, offset=offset)
+        if not stored["ids"]:
+            break
+        store.upsert(
+            stored["ids"],
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(stored["documents"], stored["metadatas"])],
+        )
+        offset += len(stored["ids"])
+    store.commit()
+    legacy_path = os.path.join(vector_database_path, LEGACY_KEYWORD_INDEX_FILE_NAME)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+    return store
+
 
-        Loads: All files with .pdf extension
-        Splits: Text from Documents into chunks
-        Embeds: Chunked Documents into Vector Database
+def backfill_filenames(vector_database: VectorStore) -> int:
+    """
+    Adds the `filename` metadata field to chunks written before ingestion
+    stored it (source filters match on it); vectors are left as they are.
+    Returns: How many chunks were updated
+    """
+    ids, metadatas, offset = [], [], 0
+    while True:
+        stored = vector_database.get(include=["metadatas"], limit=BACKFILL_PAGE_SIZE, offset=offset)
+        if not stored["ids"]:
+            break
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            metadata = metadata or {}
+            if FILENAME_KEY not in metadata and metadata.get("source"):
+                ids.append(chunk_id)
+                metadatas.append({**metadata, FILENAME_KEY: source_filename(str(metadata["source"]))})
+        offset += len(stored["ids"])
+    for start in range(0, len(ids), BACKFILL_PAGE_SIZE):
+        page_ids, page_metadatas = ids[start:start + BACKFILL_PAGE_SIZE], metadatas[start:start + BACKFILL_PAGE_SIZE]
+        if isinstance(vector_database, NumpyVectorStore):
+            vector_database.update_metadata(page_ids, page_metadatas)
+        else:
+            vector_database._collection.update(ids=page_ids, metadatas=page_metadatas)
+    return len(ids)
+
+
+def ingestion_process(
+    files_folder_path: str = files_folder_path,
+    vector_database_path: str = vector_database_path,
+    workers: int = INGESTION_WORKERS,
+    batch_size: int = INGESTION_BATCH_SIZE,
+    max_in_flight: int = INGESTION_MAX_IN_FLIGHT,
+    embedding_model: Embeddings | None = None,
+) -> VectorStore:
+    """
+    Incremental, streaming ingestion:
+
+        Hashes: Every PDF (hash reused when size + mtime are unchanged)
+        Deletes: Chunks of changed and removed files
+        Tags: Chunks stored before file names were, with their file name
+        Streams: New / changed files through parse -> split -> batch embed -> write
+        Indexes: The same chunks, under the same ids, in the BM25 keyword index
+        Optimizes: The NumPy store (compaction, IVF training) once the writes are done
         Returns: Vector Database
+
+    Memory is bounded by max_in_flight parsed files plus one batch.
+    Finished files are checkpointed in the manifest at most every
+    RAG_INGESTION_CHECKPOINT_SECONDS, so a crash resumes from there;
+    re-written chunks of a half-done file are upserted under the same ids.
+    Keyword index rows are written with each batch and committed before
+    the manifest at every checkpoint. The corpus version is bumped once
+    stale chunks are gone and again when new ones are in, which expires
+    the API's cached answers.
     """
-    All_pdf_files = load_pdf_files(files_folder_path)
-    chunked_documents = split_text_into_chunks(All_pdf_files)
-    vector_database = embed_chunks_and_Vector_storage(chunked_documents)
+    manifest = load_manifest(vector_database_path)
+    pdf_paths = list_pdf_files(files_folder_path)
+    current = {name: file_fingerprint(path, manifest.get(name)) for name, path in pdf_paths.items()}
+
+    changed = [
+        name for name, entry in current.items()
+        if name not in manifest or manifest[name]["sha256"] != entry["sha256"]
+    ]
+    removed = [name for name in manifest if name not in current]
+
+    vector_database = open_vector_database(vector_database_path, embedding_model or get_embedding_model())
+
+    keyword_index = open_keyword_index_store(vector_database, vector_database_path)
+    backfilled = backfill_filenames(vector_database)
+    if backfilled:
+        logger.info("Ingestion: added file names to %d stored chunks", backfilled)
+
+    stale_ids = [chunk for name in changed + removed if name in manifest for chunk in entry_chunk_ids(manifest[name])]
+    for start in range(0, len(stale_ids), batch_size):
+        vector_database.delete(ids=stale_ids[start:start + batch_size])
+    keyword_index.delete(stale_ids)
+
+    manifest = {
+        name: {**entry, "chunk_count": manifest[name]["chunk_count"]}
+        for name, entry in current.items()
+        if name not in changed
+    }
+    keyword_index.commit()
+    save_manifest(vector_database_path, manifest)
+    if stale_ids:
+        bump_corpus_version(vector_database_path)
+
+    if changed:
+        chunked_files = iter_chunked_files({name: pdf_paths[name] for name in changed}, workers, max_in_flight)
+        last_checkpoint = time.monotonic()
+        for documents, ids, completed in iter_chunk_batches(chunked_files, current, batch_size):
+            if documents:
+                vector_database.add_documents(documents, ids=ids)
+                keyword_index.upsert(ids, documents)
+            for name, chunk_count in completed:
+                manifest[name] = {**current[name], "chunk_count": chunk_count}
+            if completed and time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+                keyword_index.commit()
+                save_manifest(vector_database_path, manifest)
+                last_checkpoint = time.monotonic()
+        keyword_index.commit()
+        save_manifest(vector_database_path, manifest)
+        bump_corpus_version(vector_database_path)
+    keyword_index.close()
+    if isinstance(vector_database, NumpyVectorStore):
+        vector_database.optimize()
+
+    logger.info(
+        "Ingestion: %d new/changed, %d removed, %d unchanged", len(changed), len(removed), len(current) - len(changed)
+    )
     return vector_database
 
 
@@ -69,4 +301,12 @@ if __name__ == "__main__":
     Calls Function:
         Injestion Process
     """
-    ingestion_process()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", default=files_folder_path)
+    parser.add_argument("--vector-database", default=vector_database_path)
+    parser.add_argument("--workers", type=int, default=INGESTION_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGESTION_BATCH_SIZE)
+    parser.add_argument("--max-in-flight", type=int, default=INGESTION_MAX_IN_FLIGHT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ingestion_process(args.papers, args.vector_database, args.workers, args.batch_size, args.max_in_flight)
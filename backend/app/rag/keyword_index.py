@@ -0,0 +1,331 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.rag.retrieval_filter import source_filename
+
+if TYPE_CHECKING:
+    from app.rag.retrieval_filter import RetrievalFilter
+
+KEYWORD_INDEX_FILE_NAME = "keyword_index.sqlite3"
+# Written by earlier versions (every chunk's text in one JSON file); superseded
+LEGACY_KEYWORD_INDEX_FILE_NAME = "keyword_index.json"
+KEYWORD_INDEX_VERSION = 2
+
+# SQLite caps bound parameters per statement
+SQLITE_CHUNK_SIZE = 500
+
+# Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps identifiers such as "resnet-50", "squad2.0" or "f1_score" whole;
+# their parts are indexed as well so "resnet" still matches
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+TOKEN_PART_PATTERN = re.compile(r"[-_.]")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how in into is it its of on or "
+    "that the their this to was we were what when where which who why will with you".split()
+)
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Tokenize chunks-> Term table (SQLite, next to the vector database)-> Compiled postings with BM25 impacts-> Score query terms-> Texts by id
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Returns: Lower-cased terms of text without stopwords; compound
+    identifiers are emitted whole and split into their parts
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        parts = TOKEN_PART_PATTERN.split(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part and part not in STOPWORDS)
+    return terms
+
+
+def keyword_index_path(vector_database_path: str) -> str:
+    return os.path.join(vector_database_path, KEYWORD_INDEX_FILE_NAME)
+
+
+class KeywordIndex:
+    """
+    In-process BM25 index over the same chunks (and chunk ids) as the vector database.
+
+    Updates go to a per-chunk term table; searches run against a compiled
+    snapshot holding, per term, the chunk positions and their precomputed
+    BM25 impact, so a query is a few numpy adds and one argpartition.
+    The snapshot is rebuilt after a change, on the next search or compile().
+    Only terms, source and page are held per chunk: matched chunks are
+    loaded by id through `documents` (the vector database). Without it,
+    added Documents are kept in memory (benchmarks, small corpora).
+    """
+
+    def __init__(self, documents: Optional[Callable[[List[str]], List[Document]]] = None):
+        self._load_documents = documents
+        self._documents: Dict[str, Document] = {}
+        self._term_counts: Dict[str, Counter] = {}
+        self._fields: Dict[str, Tuple[Optional[str], int]] = {}
+        self._lock = threading.Lock()
+        self._compiled = None
+
+    def __len__(self) -> int:
+        return len(self._term_counts)
+
+    def add(self, ids: List[str], documents: List[Document]) -> None:
+        """
+        Adds or replaces chunks under their vector database ids.
+        """
+        with self._lock:
+            for chunk_id, document in zip(ids, documents):
+                self._term_counts[chunk_id] = Counter(tokenize(document.page_content))
+                self._fields[chunk_id] = chunk_fields(document.metadata)
+                if self._load_documents is None:
+                    self._documents[chunk_id] = Document(
+                        id=chunk_id, page_content=document.page_content, metadata=document.metadata or {}
+                    )
+            self._compiled = None
+
+    def add_terms(self, chunk_id: str, term_counts: Counter, source: Optional[str], page: int) -> None:
+        """
+        Adds a chunk already tokenized (loading from a KeywordIndexStore).
+        """
+        with self._lock:
+            self._term_counts[chunk_id] = term_counts
+            self._fields[chunk_id] = (source, page)
+            self._compiled = None
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for chunk_id in ids:
+                self._term_counts.pop(chunk_id, None)
+                self._fields.pop(chunk_id, None)
+                self._documents.pop(chunk_id, None)
+            self._compiled = None
+
+    def search(
+        self, query: str, k: int, retrieval_filter: Optional["RetrievalFilter"] = None) -> List[Tuple[Document, float]]:
+        """
+        Returns: Up to k (Document, BM25 score) pairs, best first;
+        only chunks sharing at least one term with the query and
+        passing the filter
+        """
+        if k <= 0:
+            return []
+        compiled = self._compiled or self.compile()
+        ids, postings = compiled["ids"], compiled["postings"]
+        scores = None
+        for term in set(tokenize(query)):
+            posting = postings.get(term)
+            if posting is None:
+                continue
+            if scores is None:
+                scores = np.zeros(len(ids), dtype=np.float32)
+            positions, impacts = posting
+            scores[positions] += impacts
+
+        if scores is None:
+            return []
+        if retrieval_filter is not None and not retrieval_filter.is_empty():
+            scores[~self._filter_mask(compiled, retrieval_filter)] = 0
+        matched = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        matched = matched[scores[matched] > 0]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        documents = self._documents_by_id([ids[position] for position in matched])
+        return [
+            (documents[ids[position]], float(scores[position]))
+            for position in matched
+            if ids[position] in documents
+        ]
+
+    def _documents_by_id(self, ids: List[str]) -> Dict[str, Document]:
+        """
+        Returns: chunk id -> Document for the ids still present in the vector database
+        """
+        if not ids:
+            return {}
+        if self._load_documents is None:
+            return {chunk_id: self._documents[chunk_id] for chunk_id in ids if chunk_id in self._documents}
+        return {document.id: document for document in self._load_documents(ids)}
+
+    @staticmethod
+    def _filter_mask(compiled: dict, retrieval_filter: "RetrievalFilter") -> np.ndarray:
+        """
+        Returns: Boolean mask of chunk positions passing the filter
+        """
+        mask = np.ones(len(compiled["ids"]), dtype=bool)
+        if retrieval_filter.sources:
+            mask &= np.isin(compiled["filenames"], list(retrieval_filter.filenames()))
+        if retrieval_filter.page_from is not None:
+            mask &= compiled["pages"] >= retrieval_filter.page_from - 1
+        if retrieval_filter.page_to is not None:
+            mask &= (compiled["pages"] <= retrieval_filter.page_to - 1) & (compiled["pages"] >= 0)
+        return mask
+
+    def compile(self) -> dict:
+        """
+        Builds the read-only search snapshot: term -> (chunk positions, BM25 impacts).
+        Runs at load (startup warm-up) so no request pays for it.
+        """
+        with self._lock:
+            if self._compiled is not None:
+                return self._compiled
+            ids = list(self._term_counts)
+            lengths = np.array([sum(self._term_counts[chunk_id].values()) for chunk_id in ids], dtype=np.float32)
+            average_length = max(float(lengths.mean()), 1.0) if len(ids) else 1.0
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+
+            term_positions: Dict[str, List[int]] = {}
+            term_frequencies: Dict[str, List[int]] = {}
+            for position, chunk_id in enumerate(ids):
+                for term, count in self._term_counts[chunk_id].items():
+                    term_positions.setdefault(term, []).append(position)
+                    term_frequencies.setdefault(term, []).append(count)
+
+            postings = {}
+            for term, positions in term_positions.items():
+                positions = np.array(positions, dtype=np.int32)
+                frequencies = np.array(term_frequencies[term], dtype=np.float32)
+                idf = math.log(1 + (len(ids) - len(positions) + 0.5) / (len(positions) + 0.5))
+                impacts = idf * frequencies * (BM25_K1 + 1) / (frequencies + length_norm[positions])
+                postings[term] = (positions, impacts.astype(np.float32))
+
+            fields = [self._fields[chunk_id] for chunk_id in ids]
+            self._compiled = {
+                "ids": ids,
+                "postings": postings,
+                "filenames": np.array(
+                    [None if source is None else source_filename(source) for source, _ in fields], dtype=object
+                ),
+                "pages": np.array([page for _, page in fields], dtype=np.int64),
+            }
+            return self._compiled
+
+
+class KeywordIndexStore:
+    """
+    Persistent term table of the keyword index, one SQLite row per chunk:
+    its id, source, page and term counts (no chunk text; that stays in the
+    vector database). Ingestion upserts and deletes rows as it goes and
+    commits at each checkpoint, so a checkpoint costs what changed since
+    the last one, not the size of the corpus. WAL lets the API load it
+    while ingestion writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != KEYWORD_INDEX_VERSION:
+            # Older layouts are dropped; ingestion backfills from the vector database
+            connection.execute("DROP TABLE IF EXISTS chunks")
+            connection.execute(f"PRAGMA user_version = {KEYWORD_INDEX_VERSION}")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                source TEXT,
+                page INTEGER NOT NULL,
+                terms TEXT NOT NULL
+            )
+            """
+        )
+        connection.commit()
+        return connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def upsert(self, ids: List[str], documents: List[Document]) -> None:
+        """
+        Adds or replaces chunks under their vector database ids (visible after commit).
+        """
+        rows = [
+            (chunk_id, *chunk_fields(document.metadata), json.dumps(Counter(tokenize(document.page_content))))
+            for chunk_id, document in zip(ids, documents)
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks (id, source, page, terms) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for start in range(0, len(ids), SQLITE_CHUNK_SIZE):
+                chunk = ids[start:start + SQLITE_CHUNK_SIZE]
+                self._connection.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
+    def commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+    def rows(self) -> Iterator[Tuple[str, Optional[str], int, Dict[str, int]]]:
+        """
+        Yields: (chunk id, source, page, term counts) of every committed chunk
+        """
+        with self._lock:
+            cursor = self._connection.execute("SELECT id, source, page, terms FROM chunks")
+            while batch := cursor.fetchmany(SQLITE_CHUNK_SIZE):
+                for chunk_id, source, page, terms in batch:
+                    yield chunk_id, source, page, json.loads(terms)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def chunk_fields(metadata: Optional[dict]) -> Tuple[Optional[str], int]:
+    """
+    Returns: The (source, page) a RetrievalFilter can match on; page -1 when unknown
+    """
+    metadata = metadata or {}
+    source = metadata.get("source")
+    page = metadata.get("page")
+    return (None if source is None else str(source)), (page if isinstance(page, int) else -1)
+
+
+def load_keyword_index(
+    vector_database_path: str,
+    documents: Optional[Callable[[List[str]], List[Document]]] = None,
+) -> Optional[KeywordIndex]:
+    """
+    Returns: Compiled index over the term table kept next to the vector
+    database, or None when ingestion has not written one yet.
+    documents loads matched chunks by id (e.g. the vector database's get_by_ids).
+    """
+    path = keyword_index_path(vector_database_path)
+    if not os.path.exists(path):
+        return None
+    store = KeywordIndexStore(path)
+    try:
+        index = KeywordIndex(documents=documents)
+        for chunk_id, source, page, term_counts in store.rows():
+            index.add_terms(chunk_id, Counter(term_counts), source, page)
+    finally:
+        store.close()
+    index.compile()
+    return index
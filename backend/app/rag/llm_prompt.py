@@ -1,13 +1,13 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
+from app.rag.models import stage_chat_model
 from app.rag.prompt_loader import load_rag_prompt
 
 load_dotenv()
 
-# LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.3, timeout=60, max_retries=2)
+# LLM (generator stage of app/rag/models.yaml)
+llm = stage_chat_model("generator")
 
 raw_prompt = load_rag_prompt("app/rag/rag_prompt.yaml")
 
@@ -0,0 +1,210 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from app.rag.tracing import current_trace
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("RAG_METRICS_ENABLED", "true").lower() == "true"
+
+# Seconds; stages range from sub-millisecond (fusion, packing) to LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+TOP_K_BUCKETS = (2, 4, 6, 8, 10, 12, 16)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Pipeline records (timers, counts)-> In-process counters / histograms (+ the request's trace)-> Prometheus text format on /metrics
+
+
+def format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = tuple(map(labels.__getitem__, self.labelnames))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}_total{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, optionally split by labels. An
+    observation is one bisect and three additions under a lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = tuple(map(labels.__getitem__, self.labelnames))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observes the wall time of the block (also when it raises).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        lines = []
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                labels = format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics rendered together for scraping.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(name, documentation, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Returns: Every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+request_duration = metrics_registry.histogram(
+    "rag_request_duration_seconds", "End-to-end RAG question latency", LATENCY_BUCKETS, ("mode", "cache"),
+)
+stage_duration = metrics_registry.histogram(
+    "rag_stage_duration_seconds", "Latency of one RAG pipeline stage", LATENCY_BUCKETS, ("stage",),
+)
+first_token_latency = metrics_registry.histogram(
+    "rag_time_to_first_token_seconds", "Streamed questions: time until the first answer token", LATENCY_BUCKETS,
+)
+tokens = metrics_registry.histogram(
+    "rag_tokens", "Tokens per question by kind (question, packed context, answer)", TOKEN_BUCKETS, ("kind",),
+)
+top_k = metrics_registry.histogram(
+    "rag_top_k", "Retrieval depth chosen by the query analysis", TOP_K_BUCKETS, ("intent",),
+)
+context_documents = metrics_registry.histogram(
+    "rag_context_documents", "Chunks sent to the LLM after reranking and packing", TOP_K_BUCKETS,
+)
+cache_lookups = metrics_registry.counter(
+    "rag_answer_cache_lookups", "Answer cache lookups by result (exact, semantic, miss, bypassed)", ("result",),
+)
+rewrites = metrics_registry.counter("rag_query_rewrites", "Questions rewritten before retrieval")
+speculations = metrics_registry.counter(
+    "rag_speculative_retrievals", "Speculative retrieval outcomes (used, re-retrieved, failed)", ("outcome",),
+)
+model_escalations = metrics_registry.counter(
+    "rag_model_escalations", "Stage replies re-asked to the escalation model, by stage and reason (invalid, error)",
+    ("stage", "reason"),
+)
+request_errors = metrics_registry.counter("rag_request_errors", "Questions that raised", ("mode",))
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """
+    Times a pipeline stage into rag_stage_duration_seconds and, when the
+    question is traced, into its trace.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_stage(stage, elapsed)
+
+
+def record_tokens(kind: str, count: int) -> None:
+    tokens.observe(count, kind=kind)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_tokens(kind, count)
@@ -0,0 +1,223 @@
+import os
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import BaseMessage
+
+from app.rag import metrics
+from app.rag.http_clients import get_async_http_client, get_http_client
+
+load_dotenv()
+
+MODELS_CONFIG_PATH = os.getenv("RAG_MODELS_CONFIG", "app/rag/models.yaml")
+
+# Used when the YAML file is missing or leaves a stage / field out
+DEFAULT_MODEL_CONFIGS = {
+    "analyzer": {"model": "gpt-4o-mini", "temperature": 0.0, "timeout": 30.0, "max_retries": 1, "escalate_to": "gpt-4o"},
+    "rewriter": {"model": "gpt-4o-mini", "temperature": 0.0, "timeout": 10.0, "max_tokens": 200, "max_retries": 1, "escalate_to": "gpt-4o"},
+    "generator": {"model": "gpt-4o", "temperature": 0.3, "timeout": 60.0, "max_retries": 2},
+}
+
+_NONE_VALUES = ("", "none", "null")
+_FIELD_TYPES = {"model": str, "temperature": float, "timeout": float, "max_tokens": int, "max_retries": int, "escalate_to": str}
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Defaults-> models.yaml-> RAG_<STAGE>_<FIELD> env-> Pooled ChatOpenAI per distinct config-> Router (small model, escalate on bad reply)
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    """
+    Chat model settings of one pipeline stage. Frozen, so equal configs
+    share one pooled client.
+    """
+    model: str
+    temperature: float = 0.0
+    timeout: float = 60.0
+    max_tokens: Optional[int] = None
+    max_retries: int = 2
+    escalate_to: Optional[str] = None
+
+    def escalation(self) -> Optional["ModelConfig"]:
+        """
+        Returns: The same settings on the escalation model, or None when the stage never escalates
+        """
+        if not self.escalate_to:
+            return None
+        return replace(self, model=self.escalate_to, escalate_to=None)
+
+
+def _parse_env(value: str, kind: type) -> Any:
+    if value.strip().lower() in _NONE_VALUES:
+        return None
+    return kind(value)
+
+
+def load_model_configs(path: str = MODELS_CONFIG_PATH) -> Dict[str, ModelConfig]:
+    """
+    Loads: Stage settings from the YAML file (when present), then the environment
+    Returns: Stage name -> ModelConfig
+    """
+    data = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+
+    configs = {}
+    for stage in set(DEFAULT_MODEL_CONFIGS) | set(data):
+        values = {**DEFAULT_MODEL_CONFIGS.get(stage, {}), **(data.get(stage) or {})}
+        for name, kind in _FIELD_TYPES.items():
+            value = os.getenv(f"RAG_{stage.upper()}_{name.upper()}")
+            if value is not None:
+                values[name] = _parse_env(value, kind)
+        configs[stage] = ModelConfig(**values)
+    return configs
+
+
+MODEL_CONFIGS = load_model_configs()
+
+_chat_models: Dict[ModelConfig, ChatOpenAI] = {}
+_chat_models_lock = threading.Lock()
+
+
+def model_config(stage: str) -> ModelConfig:
+    return MODEL_CONFIGS[stage]
+
+
+def get_chat_model(config: ModelConfig) -> ChatOpenAI:
+    """
+    Returns: The process-wide client for these settings (created on first use),
+    so components configured alike share one client. Every client sends its
+    requests over the process-wide HTTP connection pool.
+    """
+    chat_model = _chat_models.get(config)
+    if chat_model is not None:
+        return chat_model
+    with _chat_models_lock:
+        if config not in _chat_models:
+            _chat_models[config] = ChatOpenAI(
+                model=config.model,
+                temperature=config.temperature,
+                timeout=config.timeout,
+                max_tokens=config.max_tokens,
+                max_retries=config.max_retries,
+                http_client=get_http_client(),
+                http_async_client=get_async_http_client(),
+            )
+        return _chat_models[config]
+
+
+def stage_chat_model(stage: str) -> ChatOpenAI:
+    return get_chat_model(model_config(stage))
+
+
+class ModelRouter:
+    """
+    Sends a stage's prompts to its configured (small) model and re-asks
+    the escalation model when a reply fails: the call raised, the reply
+    was cut off at max_tokens, or the stage's validate(content) rejected it.
+    Without an escalation model replies are returned as they are.
+    Passing llm replaces the configured clients (benchmarks, tests); it
+    escalates only to an escalation_llm passed alongside.
+    """
+
+    def __init__(self, stage: str, llm: Any = None, escalation_llm: Any = None):
+        config = model_config(stage)
+        escalation = config.escalation()
+        self.stage = stage
+        self.llm = llm if llm is not None else get_chat_model(config)
+        self.escalation_llm = escalation_llm
+        if escalation_llm is None and llm is None and escalation is not None:
+            self.escalation_llm = get_chat_model(escalation)
+
+    def invoke(self, prompt: Any, validate: Optional[Callable[[str], bool]] = None, **kwargs) -> BaseMessage:
+        """
+        Returns: The small model's reply, or the escalation model's when that one failed
+        kwargs are bound to both models (e.g. response_format)
+        """
+        try:
+            response = self._bound(self.llm, kwargs).invoke(prompt)
+        except Exception:
+            if self.escalation_llm is None:
+                raise
+            return self._escalate(prompt, kwargs, "error")
+        if self.escalation_llm is None or self._accepted(response, validate):
+            return response
+        return self._escalate(prompt, kwargs, "invalid")
+
+    async def ainvoke(self, prompt: Any, validate: Optional[Callable[[str], bool]] = None, **kwargs) -> BaseMessage:
+        """
+        Async twin of invoke.
+        """
+        try:
+            response = await self._bound(self.llm, kwargs).ainvoke(prompt)
+        except Exception:
+            if self.escalation_llm is None:
+                raise
+            return await self._aescalate(prompt, kwargs, "error")
+        if self.escalation_llm is None or self._accepted(response, validate):
+            return response
+        return await self._aescalate(prompt, kwargs, "invalid")
+
+    def batch(self, prompts: List[Any], validate: Optional[Callable[[str], bool]] = None, max_concurrency: int = 8) -> List[Any]:
+        """
+        Returns: One reply (or exception) per prompt, in order; failed ones
+        are re-asked together to the escalation model
+        """
+        config = {"max_concurrency": max_concurrency}
+        responses = self.llm.batch(prompts, config=config, return_exceptions=True)
+        failed = self._failed(responses, validate)
+        if failed:
+            retried = self.escalation_llm.batch([prompts[i] for i in failed], config=config, return_exceptions=True)
+            for i, response in zip(failed, retried):
+                responses[i] = response
+        return responses
+
+    async def abatch(self, prompts: List[Any], validate: Optional[Callable[[str], bool]] = None, max_concurrency: int = 8) -> List[Any]:
+        """
+        Async twin of batch.
+        """
+        config = {"max_concurrency": max_concurrency}
+        responses = await self.llm.abatch(prompts, config=config, return_exceptions=True)
+        failed = self._failed(responses, validate)
+        if failed:
+            retried = await self.escalation_llm.abatch([prompts[i] for i in failed], config=config, return_exceptions=True)
+            for i, response in zip(failed, retried):
+                responses[i] = response
+        return responses
+
+    def _escalate(self, prompt: Any, kwargs: dict, reason: str) -> BaseMessage:
+        metrics.model_escalations.inc(stage=self.stage, reason=reason)
+        return self._bound(self.escalation_llm, kwargs).invoke(prompt)
+
+    async def _aescalate(self, prompt: Any, kwargs: dict, reason: str) -> BaseMessage:
+        metrics.model_escalations.inc(stage=self.stage, reason=reason)
+        return await self._bound(self.escalation_llm, kwargs).ainvoke(prompt)
+
+    def _failed(self, responses: List[Any], validate: Optional[Callable[[str], bool]]) -> List[int]:
+        if self.escalation_llm is None:
+            return []
+        failed = []
+        for i, response in enumerate(responses):
+            if isinstance(response, Exception):
+                metrics.model_escalations.inc(stage=self.stage, reason="error")
+                failed.append(i)
+            elif not self._accepted(response, validate):
+                metrics.model_escalations.inc(stage=self.stage, reason="invalid")
+                failed.append(i)
+        return failed
+
+    @staticmethod
+    def _bound(llm: Any, kwargs: dict) -> Any:
+        return llm.bind(**kwargs) if kwargs else llm
+
+    @staticmethod
+    def _accepted(response: BaseMessage, validate: Optional[Callable[[str], bool]]) -> bool:
+        if response.response_metadata.get("finish_reason") == "length":
+            return False
+        return validate is None or validate(response.content.strip())
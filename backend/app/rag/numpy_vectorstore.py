@@ -0,0 +1,811 @@
+import io
+import os
+import json
+import math
+import uuid
+import threading
+from functools import reduce
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from app.rag.vector_quantization import VectorCodec, build_codec, normalize
+
+NUMPY_STORE_DIRECTORY = "numpy_store"
+NUMPY_STORE_VERSION = 1
+STATE_FILE_NAME = "state.json"
+VECTORS_FILE_NAME = "vectors.f32"
+CODES_FILE_NAME = "codes.bin"
+CHUNKS_FILE_NAME = "chunks.jsonl"
+OFFSETS_FILE_NAME = "offsets.i64"
+IDS_FILE_NAME = "ids.txt"
+CENTROIDS_FILE_NAME = "ivf_centroids.npy"
+ASSIGNMENTS_FILE_NAME = "ivf_lists.i32"
+COLUMN_CODES_FILE_NAME = "column_{}.i32"
+COLUMN_VALUES_FILE_NAME = "column_{}.json"
+# Metadata kept as columns next to the rows, so `where` masks on these keys
+# never read chunk text (other keys still do)
+STORED_COLUMNS = ("source", "filename", "page")
+
+# Below this many chunks an IVF store still searches exhaustively
+IVF_MIN_ROWS = 10_000
+# Vectors sampled to train the k-means centroids
+IVF_TRAINING_SAMPLE = 100_000
+IVF_TRAINING_ITERATIONS = 10
+# The centroids are retrained once the store has grown this much since training
+IVF_RETRAIN_GROWTH = 2.0
+# optimize() rewrites the store once this share of its rows are deleted or replaced
+COMPACT_DEAD_SHARE = 0.2
+# Rows scored per matrix product while assigning or brute-forcing
+SCAN_BATCH_ROWS = 16_384
+# Rescoring vectors kept next to compact codes (stored "float32" storage rows stay float32)
+RESCORE_DTYPES = ("float16", "float32")
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Append chunks (text/metadata + normalized rows, float32 or compact codes, metadata columns)-> optimize (compact, train IVF)
+#-> memmap-> Flat scan or IVF probes-> Top k by cosine (compact codes: top k * rescore_factor, rescored with full precision)
+
+
+def top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns: Positions of the k highest finite scores, best first
+    """
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    top = top[np.isfinite(scores[top])]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class MetadataColumn:
+    """
+    One metadata key across every row: codes into its distinct values for
+    $eq/$in, and a float view (NaN when not numeric) for range operators.
+    """
+
+    def __init__(self, codes: np.ndarray, values: List[Any]):
+        self.categories: Dict[str, int] = {json.dumps(value, sort_keys=True): code for code, value in enumerate(values)}
+        self.codes = codes
+        numeric = np.array([
+            value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan for value in values
+        ], dtype=np.float64)
+        self.numeric = numeric[codes] if len(values) else np.full(len(codes), np.nan)
+
+    @classmethod
+    def from_values(cls, values: List[Any]) -> "MetadataColumn":
+        categories: Dict[str, int] = {}
+        distinct: List[Any] = []
+        codes = np.empty(len(values), dtype=np.int64)
+        for row, value in enumerate(values):
+            key = json.dumps(value, sort_keys=True)
+            if key not in categories:
+                categories[key] = len(distinct)
+                distinct.append(value)
+            codes[row] = categories[key]
+        return cls(codes, distinct)
+
+    def isin(self, values: Iterable[Any]) -> np.ndarray:
+        wanted = [self.categories[key] for key in (json.dumps(v, sort_keys=True) for v in values) if key in self.categories]
+        return np.isin(self.codes, wanted)
+
+
+WHERE_OPERATORS: Dict[str, Callable[[MetadataColumn, Any], np.ndarray]] = {
+    "$eq": lambda column, value: column.isin([value]),
+    "$ne": lambda column, value: ~column.isin([value]),
+    "$in": lambda column, values: column.isin(values),
+    "$nin": lambda column, values: ~column.isin(values),
+    "$gt": lambda column, value: column.numeric > value,
+    "$gte": lambda column, value: column.numeric >= value,
+    "$lt": lambda column, value: column.numeric < value,
+    "$lte": lambda column, value: column.numeric <= value,
+}
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store over a memory-mapped float32 matrix.
+
+    Rows are L2-normalized at insert, so a search is one matrix-vector
+    product (cosine similarity) over the whole matrix ("flat", exact), or
+    over the rows of the ivf_probes closest k-means lists ("ivf",
+    approximate). Chunk text and metadata sit in an append-only JSONL file
+    read back only for the hits; source, filename and page are also kept
+    as columns for `where` masks. Deletes and re-added ids are tombstoned;
+    compact() rewrites the files without them. state.json holds the
+    committed row count, so a crash mid-append is truncated on next open.
+
+    One writer (ingestion) at a time. Searches never write: the IVF lists
+    are (re)trained, and the store compacted, by optimize() at the end of
+    ingestion. A read_only store (the API) neither truncates nor writes;
+    it reads through handles opened at load, and writers replace files
+    rather than rewrite them, so it serves the rows it loaded until it
+    is re-opened (RAGRegistry.reload).
+
+    storage "matryoshka" / "int8" / "binary" scans compact codes instead
+    of float32 rows (see vector_quantization) and rescores the best
+    k * rescore_factor candidates with full precision: from vectors.f32
+    when keep_full_precision (kept on disk as rescore_dtype, float16 by
+    default so codes + rescoring rows stay smaller than float32 rows
+    alone; only candidate rows are paged in), otherwise by re-embedding
+    their text through the embedding function, i.e. the embedding cache
+    filled at ingestion. The storage options are fixed when the store is
+    created.
+    Chroma `where` clauses ($and/$or, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)
+    are evaluated as NumPy masks.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embedding_function: Embeddings,
+        index: str = "flat",
+        ivf_lists: Optional[int] = None,
+        ivf_probes: int = 16,
+        storage: str = "float32",
+        matryoshka_dimensions: Optional[int] = None,
+        keep_full_precision: bool = True,
+        rescore_factor: int = 4,
+        rescore_dtype: str = "float16",
+        read_only: bool = False,
+    ):
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown NumPy index: {index}")
+        if rescore_dtype not in RESCORE_DTYPES:
+            raise ValueError(f"Unknown rescore dtype: {rescore_dtype}")
+        self.persist_directory = persist_directory
+        self.index = index
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.storage = storage
+        self.matryoshka_dimensions = matryoshka_dimensions
+        self.keep_full_precision = keep_full_precision or storage == "float32"
+        self.rescore_factor = rescore_factor
+        self.rescore_dtype = rescore_dtype
+        self.read_only = read_only
+        self._embedding_function = embedding_function
+        self._lock = threading.RLock()
+        self._files: Dict[str, Any] = {}
+        os.makedirs(persist_directory, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def __len__(self) -> int:
+        return len(self._rows_by_id)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    #--------------------------------------------------------------------------------------------------------------------------
+    # Persistence
+
+    def _load(self) -> None:
+        state = {}
+        if os.path.exists(self._path(STATE_FILE_NAME)):
+            with open(self._path(STATE_FILE_NAME), "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != NUMPY_STORE_VERSION:
+                raise ValueError(f"{self.persist_directory} was written by an incompatible NumPy store version")
+        self._dimensions: Optional[int] = state.get("dimensions")
+        self._row_count: int = state.get("rows", 0)
+        self._chunks_bytes: int = state.get("chunks_bytes", 0)
+        self._ids_bytes: int = state.get("ids_bytes", 0)
+        self._ivf_trained_rows: int = state.get("ivf_trained_rows", 0)
+        # Stores written before the columns existed get them when optimize() compacts them
+        self._stored_columns: bool = state.get("stored_columns", not self._row_count)
+        if state:
+            self.storage = state.get("storage", "float32")
+            self.matryoshka_dimensions = state.get("matryoshka_dimensions")
+            self.keep_full_precision = state.get("full_precision", True)
+            # Stores written before rescore_dtype existed kept float32 rows
+            self.rescore_dtype = state.get("rescore_dtype", "float32")
+        self._codec: Optional[VectorCodec] = None
+        if self._dimensions is not None:
+            self._codec = build_codec(self.storage, self._dimensions, self.matryoshka_dimensions)
+
+        # Drop anything appended after the last committed state (interrupted add)
+        full_row_bytes = (self._dimensions or 0) * self._vector_dtype.itemsize if self.keep_full_precision else 0
+        self._truncate(VECTORS_FILE_NAME, self._row_count * full_row_bytes)
+        self._truncate(CODES_FILE_NAME, self._row_count * self._code_row_bytes())
+        self._truncate(OFFSETS_FILE_NAME, self._row_count * 8)
+        self._truncate(CHUNKS_FILE_NAME, self._chunks_bytes)
+        self._truncate(IDS_FILE_NAME, self._ids_bytes)
+        self._truncate(ASSIGNMENTS_FILE_NAME, self._row_count * 4 if self._ivf_trained_rows else 0)
+        for key in STORED_COLUMNS:
+            self._truncate(COLUMN_CODES_FILE_NAME.format(key), self._row_count * 4 if self._stored_columns else 0)
+
+        with open(self._path(IDS_FILE_NAME), "rb") as f:
+            self._ids: List[str] = f.read(self._ids_bytes).decode("utf-8").splitlines()
+        self._live = np.ones(self._row_count, dtype=bool)
+        self._live[np.asarray(state.get("deleted", []), dtype=np.int64)] = False
+        self._rows_by_id: Dict[str, int] = {
+            chunk_id: row for row, chunk_id in enumerate(self._ids) if self._live[row]
+        }
+        self._centroids = None
+        if self._ivf_trained_rows and os.path.exists(self._path(CENTROIDS_FILE_NAME)):
+            self._centroids = np.load(self._path(CENTROIDS_FILE_NAME))
+        self._column_values: Dict[str, List[Any]] = {}
+        for key in STORED_COLUMNS:
+            path = self._path(COLUMN_VALUES_FILE_NAME.format(key))
+            values = []
+            if self._stored_columns and os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    values = json.load(f)
+            self._column_values[key] = values
+        self._column_codes: Dict[str, Dict[str, int]] = {
+            key: {json.dumps(value, sort_keys=True): code for code, value in enumerate(values)}
+            for key, values in self._column_values.items()
+        }
+        self._open_files()
+        self._invalidate()
+
+    def _open_files(self) -> None:
+        """
+        Opens the handles every read goes through. They are held until the
+        next load, so after a writer compacts or retrains (which replaces
+        files) this process keeps reading the files it loaded.
+        """
+        for handle in self._files.values():
+            handle.close()
+        names = [VECTORS_FILE_NAME, CODES_FILE_NAME, CHUNKS_FILE_NAME, OFFSETS_FILE_NAME, ASSIGNMENTS_FILE_NAME]
+        names += [COLUMN_CODES_FILE_NAME.format(key) for key in STORED_COLUMNS]
+        self._files = {name: open(self._path(name), "rb") for name in names}
+
+    def _read(self, name: str, size: int, offset: int = 0) -> bytes:
+        return os.pread(self._files[name].fileno(), size, offset)
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise ValueError(f"{self.persist_directory} is open read-only")
+
+    @property
+    def _vector_dtype(self) -> np.dtype:
+        """
+        Returns: dtype of the rows in vectors.f32 (float32 when they are what searches scan)
+        """
+        return np.dtype(np.float32 if self.storage == "float32" else self.rescore_dtype)
+
+    def _code_row_bytes(self) -> int:
+        if self._codec is None or self._codec.lossless:
+            return 0
+        return self._codec.width * np.dtype(self._codec.dtype).itemsize
+
+    def _truncate(self, name: str, size: int) -> None:
+        """
+        Creates the file if needed and, unless read-only, drops bytes past size.
+        """
+        with open(self._path(name), "ab") as f:
+            if not self.read_only and f.tell() > size:
+                f.truncate(size)
+
+    def _invalidate(self) -> None:
+        self._vectors = None
+        self._codes = None
+        self._offsets = None
+        self._inverted_lists = None
+        self._columns: Dict[str, MetadataColumn] = {}
+
+    def _save_state(self) -> None:
+        path = self._path(STATE_FILE_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": NUMPY_STORE_VERSION,
+                "dimensions": self._dimensions,
+                "rows": self._row_count,
+                "chunks_bytes": self._chunks_bytes,
+                "ids_bytes": self._ids_bytes,
+                "ivf_trained_rows": self._ivf_trained_rows,
+                "storage": self.storage,
+                "matryoshka_dimensions": self.matryoshka_dimensions,
+                "full_precision": self.keep_full_precision,
+                "rescore_dtype": self.rescore_dtype,
+                "stored_columns": self._stored_columns,
+                "deleted": np.flatnonzero(~self._live).tolist(),
+            }, f)
+        os.replace(tmp_path, path)
+
+    def _vectors_view(self) -> Optional[np.ndarray]:
+        """
+        Returns: Full-precision rows as a memmap (None when empty or not kept)
+        """
+        vectors = self._vectors
+        if vectors is None and self._row_count and self.keep_full_precision:
+            vectors = np.memmap(
+                self._files[VECTORS_FILE_NAME], dtype=self._vector_dtype, mode="r", shape=(self._row_count, self._dimensions)
+            )
+            self._vectors = vectors
+        return vectors
+
+    def _codes_view(self) -> Optional[np.ndarray]:
+        """
+        Returns: The rows searches scan: compact codes, or the float32 rows themselves
+        """
+        if self._codec is None or self._codec.lossless:
+            return self._vectors_view()
+        codes = self._codes
+        if codes is None and self._row_count:
+            codes = np.memmap(
+                self._files[CODES_FILE_NAME], dtype=self._codec.dtype, mode="r", shape=(self._row_count, self._codec.width)
+            )
+            self._codes = codes
+        return codes
+
+    def _full_vectors(self, rows: np.ndarray, documents: Optional[List[Document]] = None) -> np.ndarray:
+        """
+        Returns: Full-precision vectors of rows, from disk or re-embedded from their text
+        """
+        if not len(rows):
+            return np.empty((0, self._dimensions or 0), dtype=np.float32)
+        if self._codec.lossless:
+            return np.asarray(self._vectors_view()[rows])
+        if self.keep_full_precision:
+            # pread instead of the memmap: rescoring touches a few scattered rows, and
+            # mapped pages (plus the kernel's fault-around) would pull the file into RSS
+            dtype = self._vector_dtype
+            row_bytes = self._dimensions * dtype.itemsize
+            data = b"".join(self._read(VECTORS_FILE_NAME, row_bytes, int(row) * row_bytes) for row in rows)
+            return np.frombuffer(data, dtype=dtype).reshape(len(rows), self._dimensions).astype(np.float32)
+        documents = documents if documents is not None else self._documents(rows)
+        texts = [document.page_content for document in documents]
+        return normalize(np.asarray(self._embedding_function.embed_documents(texts), dtype=np.float32))
+
+    def _offsets_view(self) -> np.ndarray:
+        if self._offsets is None:
+            self._offsets = np.frombuffer(self._read(OFFSETS_FILE_NAME, self._row_count * 8), dtype=np.int64)
+        return self._offsets
+
+    #--------------------------------------------------------------------------------------------------------------------------
+    # Writes
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        return self.add_vectors(self._embedding_function.embed_documents(texts), texts, metadatas, ids)
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        ids = kwargs.get("ids") or [document.id or str(uuid.uuid4()) for document in documents]
+        return self.add_texts(
+            [document.page_content for document in documents],
+            [document.metadata for document in documents],
+            ids=ids,
+        )
+
+    def add_vectors(
+        self,
+        vectors: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[dict]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """
+        Appends (or replaces, by id) chunks whose vectors are already computed.
+        Returns: Their ids
+        """
+        matrix = normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        if not ids:
+            return []
+
+        with self._lock:
+            self._check_writable()
+            if self._dimensions is None:
+                self._dimensions = matrix.shape[1]
+                self._codec = build_codec(self.storage, self._dimensions, self.matryoshka_dimensions)
+            if matrix.shape[1] != self._dimensions:
+                raise ValueError(f"Expected {self._dimensions}-dimensional vectors, got {matrix.shape[1]}")
+            codes = self._codec.encode(matrix)
+
+            lines = [
+                json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}).encode("utf-8") + b"\n"
+                for chunk_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            offsets = self._chunks_bytes + np.cumsum([0] + [len(line) for line in lines[:-1]], dtype=np.int64)
+            id_bytes = "".join(f"{chunk_id}\n" for chunk_id in ids).encode("utf-8")
+
+            with open(self._path(CHUNKS_FILE_NAME), "ab") as f:
+                f.writelines(lines)
+            if self.keep_full_precision:
+                with open(self._path(VECTORS_FILE_NAME), "ab") as f:
+                    f.write(matrix.astype(self._vector_dtype).tobytes())
+            if not self._codec.lossless:
+                with open(self._path(CODES_FILE_NAME), "ab") as f:
+                    f.write(codes.tobytes())
+            with open(self._path(OFFSETS_FILE_NAME), "ab") as f:
+                f.write(offsets.tobytes())
+            with open(self._path(IDS_FILE_NAME), "ab") as f:
+                f.write(id_bytes)
+            if self._stored_columns:
+                self._append_columns(metadatas)
+            if self._centroids is not None:
+                with open(self._path(ASSIGNMENTS_FILE_NAME), "ab") as f:
+                    f.write(self._assign(self._codec.decode(codes)).tobytes())
+
+            first_row = self._row_count
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+            for row, chunk_id in enumerate(ids, start=first_row):
+                previous = self._rows_by_id.get(chunk_id)
+                if previous is not None:
+                    self._live[previous] = False
+                self._rows_by_id[chunk_id] = row
+            self._ids.extend(ids)
+            self._row_count += len(ids)
+            self._chunks_bytes += sum(len(line) for line in lines)
+            self._ids_bytes += len(id_bytes)
+            self._invalidate()
+            self._save_state()
+        return ids
+
+    def _append_columns(self, metadatas: Sequence[dict]) -> None:
+        """
+        Appends the rows' codes to the stored metadata columns; a column's
+        values file is replaced (never rewritten in place) when it gains values.
+        """
+        for key in STORED_COLUMNS:
+            values, codes_by_value = self._column_values[key], self._column_codes[key]
+            codes = np.empty(len(metadatas), dtype=np.int32)
+            grew = False
+            for row, metadata in enumerate(metadatas):
+                value = (metadata or {}).get(key)
+                token = json.dumps(value, sort_keys=True)
+                if token not in codes_by_value:
+                    codes_by_value[token] = len(values)
+                    values.append(value)
+                    grew = True
+                codes[row] = codes_by_value[token]
+            if grew:
+                self._replace(COLUMN_VALUES_FILE_NAME.format(key), json.dumps(values).encode("utf-8"))
+            with open(self._path(COLUMN_CODES_FILE_NAME.format(key)), "ab") as f:
+                f.write(codes.tobytes())
+
+    def _replace(self, name: str, data: bytes) -> None:
+        """
+        Writes a file next to the old one and swaps it in, so readers holding
+        the old one keep reading what they loaded.
+        """
+        tmp_path = self._path(name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(name))
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            self._check_writable()
+            for chunk_id in ids or []:
+                row = self._rows_by_id.pop(chunk_id, None)
+                if row is not None:
+                    self._live[row] = False
+            self._save_state()
+        return True
+
+    def update_metadata(self, ids: Sequence[str], metadatas: Sequence[dict]) -> None:
+        """
+        Replaces the metadata of stored chunks: they are appended again with
+        their stored vectors, and the old rows wait for compact().
+        """
+        with self._lock:
+            self._check_writable()
+            updates = {chunk_id: metadata for chunk_id, metadata in zip(ids, metadatas) if chunk_id in self._rows_by_id}
+            if not updates:
+                return
+            rows = np.array([self._rows_by_id[chunk_id] for chunk_id in updates], dtype=np.int64)
+            documents = self._documents(rows)
+            self.add_vectors(
+                self._full_vectors(rows, documents),
+                [document.page_content for document in documents],
+                list(updates.values()),
+                list(updates),
+            )
+
+    def compact(self) -> None:
+        """
+        Rewrites the store without deleted and replaced rows (and with
+        metadata columns, for stores written before them). Files are
+        unlinked, not truncated, so open readers keep their snapshot.
+        """
+        with self._lock:
+            self._check_writable()
+            rows = np.flatnonzero(self._live)
+            if len(rows) == self._row_count and self._stored_columns:
+                return
+            documents = self._documents(rows)
+            vectors = self._full_vectors(rows, documents)
+            self._invalidate()
+            names = [STATE_FILE_NAME, VECTORS_FILE_NAME, CODES_FILE_NAME, CHUNKS_FILE_NAME, OFFSETS_FILE_NAME,
+                     IDS_FILE_NAME, CENTROIDS_FILE_NAME, ASSIGNMENTS_FILE_NAME]
+            for key in STORED_COLUMNS:
+                names += [COLUMN_CODES_FILE_NAME.format(key), COLUMN_VALUES_FILE_NAME.format(key)]
+            for name in names:
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._load()
+            for start in range(0, len(rows), SCAN_BATCH_ROWS):
+                batch = documents[start:start + SCAN_BATCH_ROWS]
+                self.add_vectors(
+                    vectors[start:start + SCAN_BATCH_ROWS],
+                    [d.page_content for d in batch],
+                    [d.metadata for d in batch],
+                    [d.id for d in batch],
+                )
+
+    def optimize(self) -> None:
+        """
+        Writer-side upkeep, run at the end of ingestion and never by searches:
+        compacts once COMPACT_DEAD_SHARE of the rows are dead (or the metadata
+        columns are missing), then (re)trains the IVF lists when the index is
+        "ivf" and the store has outgrown its training by IVF_RETRAIN_GROWTH.
+        """
+        with self._lock:
+            self._check_writable()
+            dead = self._row_count - len(self._rows_by_id)
+            if not self._stored_columns or dead > COMPACT_DEAD_SHARE * self._row_count:
+                self.compact()
+            live = len(self._rows_by_id)
+            if self.index != "ivf" or live < IVF_MIN_ROWS:
+                return
+            if self._centroids is None or live > IVF_RETRAIN_GROWTH * self._ivf_trained_rows:
+                self.train_ivf()
+
+    #--------------------------------------------------------------------------------------------------------------------------
+    # IVF
+
+    def train_ivf(self, lists: Optional[int] = None, seed: int = 0) -> None:
+        """
+        Trains spherical k-means centroids on a sample of the stored
+        rows (decoded from their codes) and assigns every row to its closest list.
+        """
+        with self._lock:
+            self._check_writable()
+            codes = self._codes_view()
+            rows = np.flatnonzero(self._live)
+            if codes is None or not len(rows):
+                return
+            lists = max(1, min(lists or self.ivf_lists or int(math.sqrt(len(rows))), len(rows)))
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(rows, min(len(rows), IVF_TRAINING_SAMPLE), replace=False))
+            sample = normalize(self._codec.decode(codes[sample_rows]))
+            centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+            for _ in range(IVF_TRAINING_ITERATIONS):
+                assignments = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, sample)
+                filled = np.bincount(assignments, minlength=lists) > 0
+                centroids[filled] = normalize(sums[filled])
+
+            self._centroids = centroids.astype(np.float32)
+            assignments = np.concatenate([
+                self._assign(self._codec.decode(codes[start:start + SCAN_BATCH_ROWS]))
+                for start in range(0, self._row_count, SCAN_BATCH_ROWS)
+            ])
+            buffer = io.BytesIO()
+            np.save(buffer, self._centroids)
+            self._replace(CENTROIDS_FILE_NAME, buffer.getvalue())
+            self._replace(ASSIGNMENTS_FILE_NAME, assignments.tobytes())
+            self._files[ASSIGNMENTS_FILE_NAME].close()
+            self._files[ASSIGNMENTS_FILE_NAME] = open(self._path(ASSIGNMENTS_FILE_NAME), "rb")
+            self._ivf_trained_rows = len(rows)
+            self._inverted_lists = None
+            self._save_state()
+
+    def _assign(self, matrix: np.ndarray) -> np.ndarray:
+        return np.argmax(matrix @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _ivf_ready(self) -> bool:
+        """
+        Returns: Whether searches probe the IVF lists (trained by optimize(), never here)
+        """
+        return self.index == "ivf" and self._centroids is not None and len(self._rows_by_id) >= IVF_MIN_ROWS
+
+    def _probe_rows(self, query: np.ndarray) -> np.ndarray:
+        """
+        Returns: Rows in the ivf_probes lists whose centroids are closest to the query
+        """
+        if self._inverted_lists is None:
+            assignments = np.frombuffer(self._read(ASSIGNMENTS_FILE_NAME, self._row_count * 4), dtype=np.int32)
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._inverted_lists = (order, bounds)
+        order, bounds = self._inverted_lists
+        probes = top_indices(self._centroids @ self._codec.project(query), self.ivf_probes)
+        return np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes]))
+
+    #--------------------------------------------------------------------------------------------------------------------------
+    # Search
+
+    def _column(self, key: str) -> MetadataColumn:
+        column = self._columns.get(key)
+        if column is None:
+            if key in STORED_COLUMNS and self._stored_columns:
+                codes = self._read(COLUMN_CODES_FILE_NAME.format(key), self._row_count * 4)
+                column = MetadataColumn(np.frombuffer(codes, dtype=np.int32), self._column_values[key])
+            else:
+                documents = self._documents(np.arange(self._row_count))
+                column = MetadataColumn.from_values([d.metadata.get(key) for d in documents])
+            self._columns[key] = column
+        return column
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        if "$and" in where:
+            return reduce(np.logical_and, (self._where_mask(clause) for clause in where["$and"]))
+        if "$or" in where:
+            return reduce(np.logical_or, (self._where_mask(clause) for clause in where["$or"]))
+        mask = np.ones(self._row_count, dtype=bool)
+        for key, condition in where.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            column = self._column(key)
+            for operator, value in condition.items():
+                if operator not in WHERE_OPERATORS:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+                mask &= WHERE_OPERATORS[operator](column, value)
+        return mask
+
+    def _search(
+        self, query_embedding: Sequence[float], k: int, where: Optional[dict] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Returns: Rows of the k most similar live chunks (best first), their
+        cosine similarity and, when rescored, their full-precision vectors
+        """
+        with self._lock:
+            codes = self._codes_view()
+            if codes is None or k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), None
+            codec = self._codec
+            query = normalize(np.asarray(query_embedding, dtype=np.float32))
+            mask = self._live if not where else self._live & self._where_mask(where)
+            candidates = self._probe_rows(query) if self._ivf_ready() else None
+
+        depth = k if codec.lossless else k * self.rescore_factor
+        projected = codec.project(query)
+        if candidates is None:
+            scores = np.concatenate([
+                codec.score(codes[start:start + SCAN_BATCH_ROWS], projected)
+                for start in range(0, len(codes), SCAN_BATCH_ROWS)
+            ]).astype(np.float32)
+            scores[~mask] = -np.inf
+            rows = top_indices(scores, depth)
+            scores = scores[rows]
+        else:
+            candidates = candidates[mask[candidates]]
+            scores = codec.score(codes[candidates], projected).astype(np.float32)
+            top = top_indices(scores, depth)
+            rows, scores = candidates[top], scores[top]
+        if codec.lossless:
+            return rows, scores, None
+
+        vectors = self._full_vectors(rows)
+        exact = vectors @ query
+        order = top_indices(exact, k)
+        return rows[order], exact[order], vectors[order]
+
+    def search_rows(
+        self, query_embedding: Sequence[float], k: int, where: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns: Rows of the k most similar live chunks (best first) and their cosine similarity
+        """
+        rows, scores, _ = self._search(query_embedding, k, where)
+        return rows, scores
+
+    def _documents(self, rows: Iterable[int]) -> List[Document]:
+        offsets = self._offsets_view()
+        documents = []
+        for row in rows:
+            start = int(offsets[row])
+            end = int(offsets[row + 1]) if row + 1 < self._row_count else self._chunks_bytes
+            chunk = json.loads(self._read(CHUNKS_FILE_NAME, end - start, start))
+            documents.append(Document(id=chunk["id"], page_content=chunk["text"], metadata=chunk["metadata"]))
+        return documents
+
+    def similarity_search_with_vectors(
+        self, query_embedding: Sequence[float], k: int, where: Optional[dict] = None) -> Tuple[List[Document], List[List[float]]]:
+        """
+        Returns: Top k Documents (best first) and their stored vectors, for MMR
+        """
+        rows, _, vectors = self._search(query_embedding, k, where)
+        if vectors is None:
+            vectors = self._full_vectors(rows)
+        return self._documents(rows), vectors.tolist()
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        rows, scores = self.search_rows(embedding, k, filter)
+        return list(zip(self._documents(rows), scores.tolist()))
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._cosine_relevance_score_fn
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        documents, vectors = self.similarity_search_with_vectors(embedding, fetch_k, filter)
+        if not documents:
+            return []
+        selected = maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32), vectors, lambda_mult=lambda_mult, k=k
+        )
+        return [documents[i] for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding_function.embed_query(query), k, fetch_k, lambda_mult, filter
+        )
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        rows = [self._rows_by_id[chunk_id] for chunk_id in ids if chunk_id in self._rows_by_id]
+        return self._documents(rows)
+
+    def get(
+        self,
+        include: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        **kwargs: Any,
+    ) -> Dict[str, List[Any]]:
+        """
+        Returns: Live chunks (all, or a limit / offset page), shaped like
+        Chroma's `get` (ids, documents, metadatas)
+        """
+        rows = np.flatnonzero(self._live)[offset:]
+        documents = self._documents(rows if limit is None else rows[:limit])
+        return {
+            "ids": [d.id for d in documents],
+            "documents": [d.page_content for d in documents],
+            "metadatas": [d.metadata for d in documents],
+        }
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        if persist_directory is None:
+            raise ValueError("NumpyVectorStore needs a persist_directory")
+        store = cls(persist_directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
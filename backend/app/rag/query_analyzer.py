@@ -1,12 +1,63 @@
-from typing import TypedDict
-from langchain_openai import ChatOpenAI
+import os
+import json
+from dotenv import load_dotenv
+from typing import Any, Callable, List, NotRequired, Optional, TypedDict
 from langchain_core.prompts import ChatPromptTemplate
 
+from app.rag.models import ModelRouter
+from app.rag.heuristic_analyzer import HeuristicQueryAnalyzer
+
+load_dotenv()
+
+# llm: always call the LLM | heuristic: never call it | hybrid: LLM only for ambiguous queries (opt-in)
+QUERY_ANALYZER_MODE = os.getenv("QUERY_ANALYZER_MODE", "llm")
+# Analyze and rewrite in one JSON-mode call instead of an analysis call followed by a rewrite call
+QUERY_ANALYZER_COMBINED = os.getenv("QUERY_ANALYZER_COMBINED", "false").lower() == "true"
+
+INTENTS = ("factual", "conceptual", "procedural", "exploratory")
+COMPLEXITIES = ("low", "medium", "high")
+
+DEFAULT_ANALYSIS = {
+    "intent": "conceptual",
+    "complexity": "medium",
+    "needs_rewrite": False,
+}
+
+
+# OpenAI JSON mode: the reply is always one parseable JSON object
+JSON_MODE = {"type": "json_object"}
+
 
 class QueryAnalysis(TypedDict):
     intent: str
     complexity: str
     needs_rewrite: bool
+    # Only from the combined call: the rewrite, so no separate QueryRewriter call is needed
+    rewritten_query: NotRequired[Optional[str]]
+
+
+def _loads(content: str) -> Any:
+    try:
+        return json.loads(content)
+    except Exception:
+        return None
+
+
+def valid_analysis(data: Any, combined: bool = False) -> bool:
+    """
+    Returns: Whether a parsed reply is a complete analysis with allowed values
+    """
+    if not (
+        isinstance(data, dict)
+        and data.get("intent") in INTENTS
+        and data.get("complexity") in COMPLEXITIES
+        and isinstance(data.get("needs_rewrite"), bool)
+    ):
+        return False
+    if combined and data["needs_rewrite"]:
+        rewritten = data.get("rewritten_query")
+        return isinstance(rewritten, str) and bool(rewritten.strip())
+    return True
 
 
 class QueryAnalyzer:
@@ -15,11 +66,12 @@ class QueryAnalyzer:
     Used by AdaptiveRAGController before retrieval.
     """
 
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0
-        )
+    def __init__(self, mode: str = QUERY_ANALYZER_MODE, combined: bool = QUERY_ANALYZER_COMBINED):
+        self.mode = mode
+        self.combined = combined
+        self.heuristic = HeuristicQueryAnalyzer()
+        # Small model by default (app/rag/models.yaml), escalating replies that fail validation
+        self.router = ModelRouter("analyzer")
 
         self.prompt = ChatPromptTemplate.from_template(
             """
@@ -48,9 +100,79 @@ class QueryAnalyzer:
             """
             )
 
+        self.combined_prompt = ChatPromptTemplate.from_template(
+            """
+            You are a query analysis and rewriting engine for a Retrieval-Augmented Generation (RAG) system.
+
+            Classify the user's query and, if it needs it, rewrite it.
+            Return a JSON object with exactly these keys:
+            - intent: factual | conceptual | procedural | exploratory
+            - complexity: low | medium | high
+            - needs_rewrite: true | false
+            - rewritten_query: the rewritten query text when needs_rewrite is true, otherwise null
+
+            Guidelines:
+            - factual: asks for a specific fact or definition
+            - conceptual: asks for explanations or understanding
+            - procedural: asks for steps or how-to
+            - exploratory: broad, vague, or research-style queries
+
+            Rewrite is needed if:
+            - the query is vague
+            - the query is ambiguous
+            - the query is poorly structured
+
+            A rewrite must be clear, specific and optimized for document retrieval.
+            It must preserve the original intent, add no new information and not
+            answer the question.
+
+            User query:
+            {query}
+            """
+            )
+
+        self.batch_prompt = ChatPromptTemplate.from_template(
+            """
+            You are a query analysis engine for a Retrieval-Augmented Generation (RAG) system.
+
+            Classify each numbered user query below. Return STRICT JSON only:
+            a JSON array with exactly one object per query, in the same order,
+            each with the keys intent, complexity and needs_rewrite.
+
+            Allowed values:
+            - intent: factual | conceptual | procedural | exploratory
+            - complexity: low | medium | high
+            - needs_rewrite: true | false
+
+            Guidelines:
+            - factual: asks for a specific fact or definition
+            - conceptual: asks for explanations or understanding
+            - procedural: asks for steps or how-to
+            - exploratory: broad, vague, or research-style queries
+
+            Rewrite is needed if:
+            - the query is vague
+            - the query is ambiguous
+            - the query is poorly structured
+
+            User queries:
+            {queries}
+            """
+            )
+
     def analyze(self, query: str) -> QueryAnalysis:
-        response = self.llm.invoke(
-            self.prompt.format(query=query)
+        local = self._classify_locally(query)
+        if local is not None:
+            return local
+
+        if self.combined:
+            response = self.router.invoke(
+                self.combined_prompt.format(query=query), validate=self._valid_reply, response_format=JSON_MODE
+            )
+            return self._safe_parse_combined(response.content.strip())
+
+        response = self.router.invoke(
+            self.prompt.format(query=query), validate=self._valid_reply
         )
 
         # LangChain returns an AIMessage
@@ -58,12 +180,88 @@ class QueryAnalyzer:
 
         return self._safe_parse(content)
 
+    async def aanalyze(self, query: str) -> QueryAnalysis:
+        local = self._classify_locally(query)
+        if local is not None:
+            return local
+
+        if self.combined:
+            response = await self.router.ainvoke(
+                self.combined_prompt.format(query=query), validate=self._valid_reply, response_format=JSON_MODE
+            )
+            return self._safe_parse_combined(response.content.strip())
+
+        response = await self.router.ainvoke(
+            self.prompt.format(query=query), validate=self._valid_reply
+        )
+
+        content = response.content.strip()
+
+        return self._safe_parse(content)
+
+    def analyze_batch(self, queries: List[str]) -> List[QueryAnalysis]:
+        """
+        Classifies many queries with at most one LLM call: heuristics
+        first, every remaining query in a single numbered prompt.
+        Returns: One analysis per query, in order
+        """
+        analyses = [self._classify_locally(query) for query in queries]
+        pending = [i for i, analysis in enumerate(analyses) if analysis is None]
+        if pending:
+            response = self.router.invoke(
+                self._format_batch([queries[i] for i in pending]), validate=self._valid_batch_reply(len(pending))
+            )
+            for i, analysis in zip(pending, self._safe_parse_batch(response.content.strip(), len(pending))):
+                analyses[i] = analysis
+        return analyses
+
+    async def aanalyze_batch(self, queries: List[str]) -> List[QueryAnalysis]:
+        """
+        Async twin of analyze_batch.
+        """
+        analyses = [self._classify_locally(query) for query in queries]
+        pending = [i for i, analysis in enumerate(analyses) if analysis is None]
+        if pending:
+            response = await self.router.ainvoke(
+                self._format_batch([queries[i] for i in pending]), validate=self._valid_batch_reply(len(pending))
+            )
+            for i, analysis in zip(pending, self._safe_parse_batch(response.content.strip(), len(pending))):
+                analyses[i] = analysis
+        return analyses
+
+    def _valid_reply(self, content: str) -> bool:
+        """
+        Router validation: the reply is an analysis with allowed labels
+        (and, in combined mode, a rewrite whenever one is flagged).
+        """
+        return valid_analysis(_loads(content), combined=self.combined)
+
+    def _valid_batch_reply(self, expected: int) -> Callable[[str], bool]:
+        def validate(content: str) -> bool:
+            data = _loads(content)
+            return isinstance(data, list) and len(data) == expected and all(map(valid_analysis, data))
+        return validate
+
+    def _format_batch(self, queries: List[str]) -> str:
+        numbered = "\n".join(f"{number}. {' '.join(query.split())}" for number, query in enumerate(queries, start=1))
+        return self.batch_prompt.format(queries=numbered)
+
+    def _classify_locally(self, query: str) -> QueryAnalysis | None:
+        """
+        Heuristic fast-path. None means "ask the LLM".
+        """
+        if self.mode == "llm":
+            return None
+        analysis = self.heuristic.classify(query)
+        if analysis is None and self.mode == "heuristic":
+            return dict(DEFAULT_ANALYSIS)
+        return analysis
+
     def _safe_parse(self, content: str) -> QueryAnalysis:
         """
         Defensive parsing to avoid runtime crashes.
         """
         try:
-            import json
             data = json.loads(content)
 
             return {
@@ -73,8 +271,40 @@ class QueryAnalyzer:
             }
         except Exception:
             # Fail-safe defaults
-            return {
-                "intent": "conceptual",
-                "complexity": "medium",
-                "needs_rewrite": False,
-            }
+            return dict(DEFAULT_ANALYSIS)
+
+    def _safe_parse_batch(self, content: str, expected: int) -> List[QueryAnalysis]:
+        """
+        Defensive parsing of the batch reply: anything but a list of the
+        expected length falls back to defaults for every query.
+        """
+        try:
+            data = json.loads(content)
+        except Exception:
+            data = None
+        if not isinstance(data, list) or len(data) != expected:
+            return [dict(DEFAULT_ANALYSIS) for _ in range(expected)]
+        return [self._safe_parse(json.dumps(item)) if isinstance(item, dict) else dict(DEFAULT_ANALYSIS) for item in data]
+
+    def _safe_parse_combined(self, content: str) -> QueryAnalysis:
+        """
+        Parsing of the combined reply. JSON mode guarantees an object, so
+        this checks the values: unknown labels fall back field by field,
+        and a flagged rewrite without text leaves the rewrite to QueryRewriter.
+        """
+        try:
+            data = json.loads(content)
+        except Exception:
+            data = None
+        if not isinstance(data, dict):
+            return dict(DEFAULT_ANALYSIS)
+
+        rewritten = data.get("rewritten_query")
+        rewritten = rewritten.strip() if isinstance(rewritten, str) else ""
+        needs_rewrite = data.get("needs_rewrite") is True
+        return {
+            "intent": data["intent"] if data.get("intent") in INTENTS else DEFAULT_ANALYSIS["intent"],
+            "complexity": data["complexity"] if data.get("complexity") in COMPLEXITIES else DEFAULT_ANALYSIS["complexity"],
+            "needs_rewrite": needs_rewrite,
+            "rewritten_query": rewritten if needs_rewrite and rewritten else None,
+        }
@@ -0,0 +1,49 @@
+from typing import Any, List, Optional
+from dataclasses import dataclass, field
+from langchain_core.documents import Document
+
+from app.rag.tracing import RequestTrace
+from app.rag.query_analyzer import QueryAnalysis
+from app.rag.retrieval_filter import RetrievalFilter
+from app.rag.hybrid_retrieval import RetrievalCandidates
+
+
+@dataclass
+class QueryContext:
+    """
+    Per-request pipeline state.
+    Created by AdaptiveRAGController for every question and passed
+    through each phase, so concurrent requests never share state.
+    """
+    question: str
+    retrieval_filter: RetrievalFilter = field(default_factory=RetrievalFilter)
+    analysis: Optional[QueryAnalysis] = None
+    rewritten_query: Optional[str] = None
+    top_k: Optional[int] = None
+    query_embedding: Optional[List[float]] = None
+    # Embedding of retrieval_question, when computed up front (batch path)
+    retrieval_embedding: Optional[List[float]] = None
+    cache_hit: Optional[str] = None
+    # Corpus version at the cache lookup; the answer is cached under it
+    corpus_version: Any = None
+    # Batch path only: this question's trace (the other paths use the current one)
+    trace: Optional[RequestTrace] = None
+    speculative_candidates: Optional[RetrievalCandidates] = None
+    speculation: Optional[str] = None
+    answer: str = ""
+    documents: List[Document] = field(default_factory=list)
+
+    @property
+    def retrieval_question(self) -> str:
+        """
+        Returns: Rewritten query when one was produced, else the original question
+        """
+        return self.rewritten_query or self.question
+
+    @property
+    def intent(self) -> str:
+        return (self.analysis or {}).get("intent", "conceptual")
+
+    @property
+    def complexity(self) -> str:
+        return (self.analysis or {}).get("complexity", "medium")
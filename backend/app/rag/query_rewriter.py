@@ -1,6 +1,9 @@
-from langchain_openai import ChatOpenAI
+from typing import List
+
 from langchain_core.prompts import ChatPromptTemplate
 
+from app.rag.models import ModelRouter
+
 
 class QueryRewriter:
     """
@@ -9,10 +12,8 @@ class QueryRewriter:
     """
 
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0,
-        )
+        # Small model by default (app/rag/models.yaml); empty or cut-off rewrites escalate
+        self.router = ModelRouter("rewriter")
 
         self.prompt = ChatPromptTemplate.from_template(
             """
@@ -36,10 +37,45 @@ class QueryRewriter:
 
     def rewrite(self, query: str) -> str:
         try:
-            response = self.llm.invoke(
-                self.prompt.format(query=query)
+            response = self.router.invoke(
+                self.prompt.format(query=query), validate=bool
+            )
+            rewritten = response.content.strip()
+            return rewritten if rewritten else query
+        except Exception:
+            return query
+
+    async def arewrite(self, query: str) -> str:
+        try:
+            response = await self.router.ainvoke(
+                self.prompt.format(query=query), validate=bool
             )
             rewritten = response.content.strip()
             return rewritten if rewritten else query
         except Exception:
             return query
+
+    def rewrite_batch(self, queries: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        Rewrites many queries with at most max_concurrency LLM calls in flight.
+        Returns: One rewrite per query, in order (the query itself on failure)
+        """
+        responses = self.router.batch(
+            [self.prompt.format(query=query) for query in queries], validate=bool, max_concurrency=max_concurrency
+        )
+        return [self._rewritten(query, response) for query, response in zip(queries, responses)]
+
+    async def arewrite_batch(self, queries: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        Async twin of rewrite_batch.
+        """
+        responses = await self.router.abatch(
+            [self.prompt.format(query=query) for query in queries], validate=bool, max_concurrency=max_concurrency
+        )
+        return [self._rewritten(query, response) for query, response in zip(queries, responses)]
+
+    def _rewritten(self, query: str, response) -> str:
+        if isinstance(response, Exception):
+            return query
+        rewritten = response.content.strip()
+        return rewritten if rewritten else query
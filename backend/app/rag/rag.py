@@ -1,17 +1,32 @@
 import os
-from typing import Any, List, Tuple
+import asyncio
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Optional, Tuple, Union
 
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_classic.chains import create_retrieval_chain
 from langchain_classic.chains.combine_documents import create_stuff_documents_chain
 
+from app.rag.registry import RAGRegistry
+from app.rag.tokens import count_tokens
+from app.rag.metrics import timed_stage
 from app.rag.llm_prompt import llm, prompt
-from app.rag.vectorstore import retriever_database
+from app.rag.injestion import get_embedding_model
+from app.rag.retrieval_filter import RetrievalFilter
+from app.rag.vectorstore import (
+    get_keyword_index,
+    get_vector_database,
+    similarity_search_with_vectors,
+    similarity_search_with_vectors_batch,
+)
+from app.rag.hybrid_retrieval import HYBRID_RETRIEVAL, RetrievalCandidates, candidate_depth, fuse_candidates
 
 #--------------------------------------------------------------------------------------------------------------------------
 #Context Builder->Final RAG Chain-> Final Answer Question
 
+GENERAL_KNOWLEDGE_PREFIX = "This question is not covered by the provided documents, so the following answer is based on general knowledge."
+
+
 def context_documents_retrieval_chain(
     llm: Any, prompt: ChatPromptTemplate) -> Any:
     """
@@ -22,38 +37,248 @@ def context_documents_retrieval_chain(
     return document_chain
 
 
-def get_rag_chain(top_k: int = 8) -> Any:
+rag_registry = RAGRegistry(
+    vector_database_factory=get_vector_database,
+    embedding_model_factory=get_embedding_model,
+    document_chain_factory=lambda: context_documents_retrieval_chain(llm, prompt),
+    keyword_index_factory=(lambda: get_keyword_index(rag_registry.vector_database)) if HYBRID_RETRIEVAL else None,
+)
+
+
+def answer_question(
+    question: str,
+    top_k: int = 8,
+    query_embedding: Optional[List[float]] = None,
+    intent: str = "conceptual",
+) -> Tuple[str, List[Document]]:
+    """
+    -Retrieves: Documents with retrieve_documents (dense + keyword, fused)
+    -Generates: User's reply and source of documents
+    Returns: User answer and List of source documents
     """
-    Builds and returns the full RAG chain.
+    source_docs = retrieve_documents(question, top_k=top_k, query_embedding=query_embedding, intent=intent)
+    return generate_answer(question, source_docs)
 
-    This function:
-    - Loads the vector database retriever
-    - Creates the document-combination chain (LLM + prompt)
-    - Wraps both into a retrieval chain used to answer user questions
 
-    Returns:
-        A LangChain retrieval chain object ready for querying.
+def retrieve_candidates(
+    question: str,
+    depth: int = 8,
+    query_embedding: Optional[List[float]] = None,
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> RetrievalCandidates:
     """
-    retriever = retriever_database(top_k=top_k)
-    document_chain = context_documents_retrieval_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever=retriever, combine_docs_chain=document_chain)
-    return rag_chain
+    -Embeds: User question (skipped when the caller already holds its embedding)
+    -Searches: Shared vector database (filter pushed into Chroma's `where`) and keyword index
+    Returns: Both rankings, depth deep, unfused, with the dense vectors for MMR
+    """
+    vector_database = rag_registry.vector_database()
+    if query_embedding is None:
+        with timed_stage("embed"):
+            query_embedding = vector_database.embeddings.embed_query(question)
+    with timed_stage("vector_search"):
+        dense, dense_embeddings = similarity_search_with_vectors(
+            vector_database, query_embedding, depth, where=chroma_where(retrieval_filter)
+        )
+    return RetrievalCandidates(
+        dense=dense,
+        keyword=keyword_search(question, depth, retrieval_filter),
+        query_embedding=query_embedding,
+        dense_embeddings=dense_embeddings,
+    )
+
+
+def chroma_where(retrieval_filter: Optional[RetrievalFilter]) -> Optional[dict]:
+    return retrieval_filter.to_chroma_where() if retrieval_filter is not None else None
+
 
-def answer_question(question: str, top_k: int = 8) -> Tuple[str, List[Document]]:
+def keyword_search(
+    question: str, depth: int, retrieval_filter: Optional[RetrievalFilter] = None) -> List[Document]:
     """
-    -Loads: Retrieval chain
-    -Invokes: User question
-    -Generates: User's reply and source of documents
+    Returns: BM25 ranking from the shared keyword index (empty when hybrid retrieval is off)
+    """
+    keyword_index = rag_registry.keyword_index()
+    if keyword_index is None:
+        return []
+    with timed_stage("keyword_search"):
+        return [document for document, _ in keyword_index.search(question, depth, retrieval_filter)]
+
+
+def retrieve_documents(
+    question: str,
+    top_k: int = 8,
+    query_embedding: Optional[List[float]] = None,
+    intent: str = "conceptual",
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> List[Document]:
+    """
+    -Retrieves: Dense and keyword rankings for the question
+    -Fuses: Them with the mode and weights chosen for the query intent
+    Returns: Top_k Documents
+    """
+    candidates = retrieve_candidates(question, candidate_depth(top_k), query_embedding, retrieval_filter)
+    return fuse_candidates(candidates, top_k, intent)
+
+
+def generate_answer(question: str, source_docs: List[Document]) -> Tuple[str, List[Document]]:
+    """
+    -Generates: User's reply from already retrieved Documents
+    Returns: User answer and List of source documents
+    """
+    with timed_stage("generate"):
+        answer = rag_registry.document_chain().invoke({"input": question, "context": source_docs})
+    answer = answer.strip()
+    return answer, drop_sources_if_general_knowledge(answer, source_docs)
+
+
+async def aretrieve_candidates(
+    question: str,
+    depth: int = 8,
+    query_embedding: Optional[List[float]] = None,
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> RetrievalCandidates:
+    """
+    Async twin of retrieve_candidates.
+    -Embeds: User question without blocking the event loop
+    -Searches: Vector database and keyword index off the loop (local disk/CPU
+     work; keyword hits load their texts from the vector database), concurrently
+    """
+    vector_database = rag_registry.vector_database()
+    if query_embedding is None:
+        with timed_stage("embed"):
+            query_embedding = await vector_database.embeddings.aembed_query(question)
+    keyword = asyncio.ensure_future(asyncio.to_thread(keyword_search, question, depth, retrieval_filter))
+    with timed_stage("vector_search"):
+        dense, dense_embeddings = await asyncio.to_thread(
+            similarity_search_with_vectors, vector_database, query_embedding, depth, chroma_where(retrieval_filter)
+        )
+    return RetrievalCandidates(
+        dense=dense,
+        keyword=await keyword,
+        query_embedding=query_embedding,
+        dense_embeddings=dense_embeddings,
+    )
+
+
+async def aretrieve_candidates_batch(
+    questions: List[str],
+    query_embeddings: List[List[float]],
+    depth: int = 8,
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> List[RetrievalCandidates]:
+    """
+    Batch twin of aretrieve_candidates for already embedded questions.
+    -Searches: Vector database once for every question, and the keyword
+     index per question, off the loop
+    Returns: One RetrievalCandidates per question, in order
+    """
+    vector_database = rag_registry.vector_database()
+    keyword = asyncio.ensure_future(asyncio.to_thread(
+        lambda: [keyword_search(question, depth, retrieval_filter) for question in questions]
+    ))
+    with timed_stage("vector_search"):
+        dense_results = await asyncio.to_thread(
+            similarity_search_with_vectors_batch, vector_database, query_embeddings, depth, chroma_where(retrieval_filter)
+        )
+    return [
+        RetrievalCandidates(
+            dense=dense,
+            keyword=keyword_results,
+            query_embedding=query_embedding,
+            dense_embeddings=dense_embeddings,
+        )
+        for query_embedding, (dense, dense_embeddings), keyword_results in zip(query_embeddings, dense_results, await keyword)
+    ]
+
+
+async def aretrieve_documents(
+    question: str,
+    top_k: int = 8,
+    query_embedding: Optional[List[float]] = None,
+    intent: str = "conceptual",
+    retrieval_filter: Optional[RetrievalFilter] = None,
+) -> List[Document]:
+    """
+    Async twin of retrieve_documents.
+    """
+    candidates = await aretrieve_candidates(question, candidate_depth(top_k), query_embedding, retrieval_filter)
+    return fuse_candidates(candidates, top_k, intent)
+
+
+async def aanswer_question(
+    question: str,
+    top_k: int = 8,
+    query_embedding: Optional[List[float]] = None,
+    intent: str = "conceptual",
+) -> Tuple[str, List[Document]]:
+    """
+    Async twin of answer_question.
+    -Retrieves: Documents with aretrieve_documents (hybrid)
+    -Generates: User's reply with agenerate_answer
     Returns: User answer and List of source documents
     """
-    rag_chain = get_rag_chain(top_k=top_k)
-    result = rag_chain.invoke({"input": question})
-    answer = result.get("answer", "").strip()
-    source_docs = result.get("context", [])
-    if answer.startswith("This question is not covered by the provided documents, so the following answer is based on general knowledge."):
-        source_docs = []
+    source_docs = await aretrieve_documents(question, top_k=top_k, query_embedding=query_embedding, intent=intent)
+    return await agenerate_answer(question, source_docs)
+
+
+async def agenerate_answer(question: str, source_docs: List[Document]) -> Tuple[str, List[Document]]:
+    """
+    Async twin of generate_answer.
+    """
+    with timed_stage("generate"):
+        answer = await rag_registry.document_chain().ainvoke(
+            {"input": question, "context": source_docs}
+        )
+    answer = answer.strip()
+    return answer, drop_sources_if_general_knowledge(answer, source_docs)
+
+
+async def agenerate_answers_as_completed(
+    items: List[Tuple[str, List[Document]]], max_concurrency: int = 8) -> AsyncIterator[Tuple[int, Union[Tuple[str, List[Document]], Exception]]]:
+    """
+    -Generates: Replies for many (question, Documents) pairs, at most
+     max_concurrency LLM calls in flight
+    Yields: (index, (answer, sources)) as each finishes, or (index, exception)
+    """
+    inputs = [{"input": question, "context": source_docs} for question, source_docs in items]
+    # One observation for the whole fan-out, kept apart from per-question generate timings
+    with timed_stage("generate_batch"):
+        async for index, answer in rag_registry.document_chain().abatch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            if isinstance(answer, Exception):
+                yield index, answer
+                continue
+            answer = answer.strip()
+            yield index, (answer, drop_sources_if_general_knowledge(answer, items[index][1]))
+
+
+async def astream_answer(question: str, source_docs: List[Document]) -> AsyncIterator[str]:
+    """
+    -Streams: User's reply token by token from the shared document chain
+    Returns: Async iterator of text deltas
+    """
+    async for token in rag_registry.document_chain().astream(
+        {"input": question, "context": source_docs}
+    ):
+        if token:
+            yield token
 
-    return answer, source_docs
+
+@lru_cache(maxsize=1)
+def prompt_template_tokens() -> int:
+    """
+    Returns: Prompt tokens of the RAG template itself (question and context left empty)
+    """
+    return count_tokens(prompt.format(input="", context=""))
+
+
+def drop_sources_if_general_knowledge(answer: str, source_docs: List[Document]) -> List[Document]:
+    """
+    Returns: No sources when the LLM fell back to general knowledge
+    """
+    if answer.startswith(GENERAL_KNOWLEDGE_PREFIX):
+        return []
+    return source_docs
 
 
 def format_source(doc: Document) -> str:
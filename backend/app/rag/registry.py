@@ -0,0 +1,123 @@
+import threading
+from typing import Any, Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Process-wide RAG resources-> Warm up-> Reload when the index changes on disk
+
+
+class RAGRegistry:
+    """
+    Long-lived, thread-safe holder of the expensive RAG objects.
+
+    Keeps one vector database handle, one compiled keyword index and one
+    stuffed-documents chain, so requests stop rebuilding them on every
+    query. With an embedding_model_factory, the embedding model (cache
+    connection, scheduler thread pool) is built once and handed to every
+    vector database the registry opens, so reloads do not leak it.
+    """
+
+    def __init__(
+        self,
+        vector_database_factory: Callable[..., VectorStore],
+        document_chain_factory: Callable[[], Any],
+        keyword_index_factory: Optional[Callable[[], Any]] = None,
+        embedding_model_factory: Optional[Callable[[], Embeddings]] = None,
+    ):
+        self._vector_database_factory = vector_database_factory
+        self._document_chain_factory = document_chain_factory
+        self._keyword_index_factory = keyword_index_factory
+        self._embedding_model_factory = embedding_model_factory
+        self._lock = threading.RLock()
+        self._embedding_model = None
+        self._vector_database = None
+        self._keyword_index = None
+        self._document_chain = None
+        self._reload_listeners: List[Callable[[], None]] = []
+
+    def vector_database(self) -> VectorStore:
+        """
+        Returns: Shared vector database, opened on first use
+        """
+        vector_database = self._vector_database
+        if vector_database is not None:
+            return vector_database
+        with self._lock:
+            if self._vector_database is None:
+                if self._embedding_model_factory is None:
+                    self._vector_database = self._vector_database_factory()
+                else:
+                    self._vector_database = self._vector_database_factory(self.embeddings())
+            return self._vector_database
+
+    def keyword_index(self) -> Any:
+        """
+        Returns: Shared keyword index, loaded on first use (None when not configured)
+        """
+        keyword_index = self._keyword_index
+        if keyword_index is not None or self._keyword_index_factory is None:
+            return keyword_index
+        with self._lock:
+            if self._keyword_index is None:
+                self._keyword_index = self._keyword_index_factory()
+            return self._keyword_index
+
+    def document_chain(self) -> Any:
+        """
+        Returns: Shared stuffed-documents chain (LLM + prompt)
+        """
+        document_chain = self._document_chain
+        if document_chain is not None:
+            return document_chain
+        with self._lock:
+            if self._document_chain is None:
+                self._document_chain = self._document_chain_factory()
+            return self._document_chain
+
+    def embeddings(self) -> Embeddings:
+        """
+        Returns: Shared embedding model, built on first use and kept across
+        reloads (without a factory, the one owned by the vector database)
+        """
+        if self._embedding_model_factory is None:
+            return self.vector_database().embeddings
+        embedding_model = self._embedding_model
+        if embedding_model is not None:
+            return embedding_model
+        with self._lock:
+            if self._embedding_model is None:
+                self._embedding_model = self._embedding_model_factory()
+            return self._embedding_model
+
+    def warm(self) -> None:
+        """
+        Opens the vector database, loads and compiles the keyword index and
+        builds the document chain ahead of traffic: what every request uses.
+        """
+        self.vector_database()
+        keyword_index = self.keyword_index()
+        if keyword_index is not None:
+            keyword_index.compile()
+        self.document_chain()
+
+    def reload(self) -> None:
+        """
+        Drops every cached object but the embedding model, so the next
+        request re-opens the vector database. Call after the index changes on disk.
+        """
+        with self._lock:
+            self._vector_database = None
+            self._keyword_index = None
+            self._document_chain = None
+            listeners = list(self._reload_listeners)
+        for listener in listeners:
+            listener()
+
+    def on_reload(self, listener: Callable[[], None]) -> None:
+        """
+        Registers a callback run after every reload.
+        """
+        with self._lock:
+            self._reload_listeners.append(listener)
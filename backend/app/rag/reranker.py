@@ -0,0 +1,348 @@
+import os
+import math
+import asyncio
+import threading
+from collections import Counter
+from typing import Callable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.rag.tracing import current_trace
+from app.rag.keyword_index import tokenize
+from app.rag.tokens import count_document_tokens
+from app.rag.hybrid_retrieval import SIMILARITY_KEY
+from app.rag.retrieval_policy import (
+    ADAPTIVE_TOP_K,
+    PER_PAPER_FETCH_FACTOR,
+    TOP_K_MAX_DROP,
+    TOP_K_MIN_SCORE,
+    relevance_falls_off,
+)
+
+load_dotenv()
+
+# none | lexical | embedding | cross-encoder. Lexical by default: on the labelled
+# fixture (benchmarks.eval_reranker_tokens) it raises MRR 0.660 -> 0.670 at the
+# same context recall (embedding: 0.654), with no model or network call
+RERANKER = os.getenv("RAG_RERANKER", "lexical").lower()
+# Candidates scored per question = top_k * factor
+RERANK_FETCH_FACTOR = int(os.getenv("RAG_RERANK_FETCH_FACTOR", "2"))
+# With a reranker enabled, at most this many chunks reach the LLM, whatever
+# top_k asked for; with none, top_k chunks do
+RERANK_TOP_N = int(os.getenv("RAG_RERANK_TOP_N", "5"))
+# Share of the final score kept from the retrieval (fusion) rank. Fusion already
+# weighs BM25 over the whole corpus, so the lexical rescoring only breaks near-ties
+# (MRR on the fixture: 0.599 at 0.3, 0.654 at 0.5, 0.670 at 0.7, 0.642 at 0.8)
+RETRIEVAL_RANK_WEIGHT = float(os.getenv("RAG_RERANK_RETRIEVAL_WEIGHT", "0.7"))
+CROSS_ENCODER_MODEL = os.getenv("RAG_CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Over-fetch candidates-> Score against the question-> Blend with retrieval rank-> Best N until raw relevance falls off (packed by ContextPacker)
+
+
+class Reranker:
+    """
+    Reranking stage between retrieval and generation.
+
+    The base class keeps retrieval order and passes top_k chunks
+    through untouched (RAG_RERANKER=none). Subclasses implement
+    `score`; selection then keeps the best top_n chunks, which the
+    ContextPacker fits into the prompt token budget. With min_score /
+    max_drop set, selection also stops early once relevance (see
+    `relevance`, not the min-max blended score, whose best candidate
+    always scores ~1) falls under min_score or drops by more than
+    max_drop, but never below min_top_k chunks.
+    """
+
+    name = "none"
+
+    def __init__(
+        self,
+        fetch_factor: int = 1,
+        top_n: Optional[int] = None,
+        retrieval_rank_weight: float = RETRIEVAL_RANK_WEIGHT,
+        min_score: Optional[float] = None,
+        max_drop: Optional[float] = None,
+    ):
+        self.fetch_factor = fetch_factor
+        self.top_n = top_n
+        self.retrieval_rank_weight = retrieval_rank_weight
+        self.min_score = min_score
+        self.max_drop = max_drop
+
+    def fetch_depth(self, top_k: int, per_paper_cap: Optional[int] = None) -> int:
+        """
+        Returns: How many candidates retrieval should hand to the reranker
+        (more under a per-paper cap, whose dropped chunks need replacements)
+        """
+        if per_paper_cap:
+            return top_k * max(self.fetch_factor, PER_PAPER_FETCH_FACTOR)
+        return top_k * self.fetch_factor
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        """
+        Returns: Relevance of each Document to the query, higher is better
+        """
+        return [-float(rank) for rank in range(len(documents))]
+
+    async def ascore(self, query: str, documents: List[Document]) -> List[float]:
+        return self.score(query, documents)
+
+    def relevance(self, documents: List[Document], scores: List[float]) -> Optional[List[Optional[float]]]:
+        """
+        Returns: Relevance on a fixed scale that means the same for every
+        question, which the score-aware cutoff compares against its
+        thresholds. Ranks have no such scale, so the base class uses the
+        dense similarity fusion attached to each Document (None for
+        keyword-only hits; None overall when no vectors were fetched)
+        """
+        similarities = [(document.metadata or {}).get(SIMILARITY_KEY) for document in documents]
+        return similarities if any(similarity is not None for similarity in similarities) else None
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: int,
+        per_paper_cap: Optional[int] = None,
+        min_top_k: int = 1,
+    ) -> List[Document]:
+        if not documents:
+            return []
+        return self.select(documents, self.score(query, documents), top_k, per_paper_cap, min_top_k)
+
+    async def arerank(
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: int,
+        per_paper_cap: Optional[int] = None,
+        min_top_k: int = 1,
+    ) -> List[Document]:
+        if not documents:
+            return []
+        return self.select(documents, await self.ascore(query, documents), top_k, per_paper_cap, min_top_k)
+
+    def select(
+        self,
+        documents: List[Document],
+        scores: List[float],
+        top_k: int,
+        per_paper_cap: Optional[int] = None,
+        min_top_k: int = 1,
+    ) -> List[Document]:
+        """
+        Blends scores with the retrieval rank, then keeps the best
+        min(top_k, top_n) Documents, at most per_paper_cap per source,
+        stopping after min_top_k once relevance falls off (when configured).
+        Returns: Selected Documents, best first
+        """
+        blended = self._blend(scores)
+        relevance = self.relevance(documents, scores)
+        order = sorted(range(len(documents)), key=lambda i: blended[i], reverse=True)
+        limit = min(top_k, self.top_n) if self.top_n else top_k
+        adaptive = self.min_score is not None and self.max_drop is not None and relevance is not None
+
+        selected, per_paper, previous = [], Counter(), None
+        for i in order:
+            if len(selected) >= limit:
+                break
+            score = relevance[i] if relevance is not None else None
+            if adaptive and score is not None and len(selected) >= min_top_k and relevance_falls_off(
+                score, previous, self.min_score, self.max_drop
+            ):
+                break
+            source = (documents[i].metadata or {}).get("source")
+            if per_paper_cap and source is not None and per_paper[source] >= per_paper_cap:
+                continue
+            per_paper[source] += 1
+            selected.append(i)
+            if score is not None:
+                previous = score
+
+        trace = current_trace()
+        if trace is not None:
+            self._trace_selection(trace, documents, blended, relevance, order, selected)
+        return [documents[i] for i in selected]
+
+    @staticmethod
+    def _trace_selection(
+        trace,
+        documents: List[Document],
+        blended: List[float],
+        relevance: Optional[List[Optional[float]]],
+        order: List[int],
+        selected: List[int],
+    ) -> None:
+        """
+        Records the sent chunks and every ranked candidate (blended score,
+        relevance, tokens), so app.rag.top_k_tuner can replay the cutoff offline.
+        """
+        tokens = count_document_tokens(documents)
+        trace.chunks = [
+            {"id": documents[i].id, "source": (documents[i].metadata or {}).get("source"), "score": round(blended[i], 4)}
+            for i in selected
+        ]
+        trace.candidates = [
+            {
+                "id": documents[i].id,
+                "score": round(blended[i], 4),
+                "relevance": None if relevance is None or relevance[i] is None else round(relevance[i], 4),
+                "tokens": tokens[i],
+            }
+            for i in order
+        ]
+        trace.chunk_texts = [documents[i].page_content for i in selected]
+
+    def _blend(self, scores: List[float]) -> List[float]:
+        values = np.asarray(scores, dtype=np.float64)
+        spread = values.max() - values.min()
+        normalized = (values - values.min()) / spread if spread > 0 else np.zeros_like(values)
+        retrieval_prior = 1.0 - np.arange(len(values)) / len(values)
+        return ((1 - self.retrieval_rank_weight) * normalized + self.retrieval_rank_weight * retrieval_prior).tolist()
+
+
+class LexicalReranker(Reranker):
+    """
+    BM25 over the candidate set itself, with the same tokenizer as the
+    keyword index. Microseconds per question, no model or network.
+    Scores are divided by the most a chunk could score for the question
+    (every term at saturation), so they lie in [0, 1) and a candidate
+    set without the question's terms scores 0 throughout.
+
+    The score-aware cutoff still reads the dense similarity when fusion
+    attached one: the BM25 share is computed over the candidate set
+    only, and cutting on it drops context recall 0.677 -> 0.635 on the
+    fixture at the default thresholds, where the similarity keeps it.
+    """
+
+    name = "lexical"
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        query_terms = set(tokenize(query))
+        term_counts = [Counter(tokenize(document.page_content)) for document in documents]
+        lengths = [sum(counts.values()) for counts in term_counts]
+        average_length = max(sum(lengths) / len(lengths), 1.0)
+        idf = {}
+        for term in query_terms:
+            document_frequency = sum(1 for counts in term_counts if term in counts)
+            idf[term] = math.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        attainable = sum(idf.values()) * (BM25_K1 + 1) or 1.0
+
+        scores = []
+        for counts, length in zip(term_counts, lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            scores.append(sum(
+                idf[term] * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+                for term in query_terms
+                if term in counts
+            ) / attainable)
+        return scores
+
+    def relevance(self, documents: List[Document], scores: List[float]) -> Optional[List[Optional[float]]]:
+        """
+        Returns: The dense similarities fusion attached, or the BM25 shares without them
+        """
+        return super().relevance(documents, scores) or scores
+
+
+class EmbeddingReranker(Reranker):
+    """
+    Cosine similarity between the question and each candidate.
+    Chunk vectors normally come straight from the embedding cache
+    filled at ingestion, so this costs no extra API calls.
+    """
+
+    name = "embedding"
+
+    def __init__(self, embeddings: Callable[[], Embeddings], **kwargs):
+        super().__init__(**kwargs)
+        self._embeddings = embeddings
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        embeddings = self._embeddings()
+        return self._cosine(embeddings.embed_query(query), embeddings.embed_documents([d.page_content for d in documents]))
+
+    async def ascore(self, query: str, documents: List[Document]) -> List[float]:
+        embeddings = self._embeddings()
+        query_vector, document_vectors = await asyncio.gather(
+            embeddings.aembed_query(query),
+            embeddings.aembed_documents([d.page_content for d in documents]),
+        )
+        return self._cosine(query_vector, document_vectors)
+
+    def relevance(self, documents: List[Document], scores: List[float]) -> Optional[List[Optional[float]]]:
+        return scores
+
+    @staticmethod
+    def _cosine(query_vector: List[float], document_vectors: List[List[float]]) -> List[float]:
+        matrix = np.asarray(document_vectors, dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        return (matrix @ query / np.where(norms > 0, norms, 1.0)).tolist()
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Local cross-encoder (sentence-transformers), loaded on first use.
+    Scores run off the event loop on the async path.
+    """
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL, **kwargs):
+        super().__init__(**kwargs)
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as error:
+                    raise ImportError(
+                        "RAG_RERANKER=cross-encoder needs the sentence-transformers package"
+                    ) from error
+                self._model = CrossEncoder(self.model_name)
+            return self._model
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        model = self._model or self._load()
+        return [float(s) for s in model.predict([(query, d.page_content) for d in documents])]
+
+    async def ascore(self, query: str, documents: List[Document]) -> List[float]:
+        return await asyncio.to_thread(self.score, query, documents)
+
+    def relevance(self, documents: List[Document], scores: List[float]) -> Optional[List[Optional[float]]]:
+        """
+        Returns: The logits as probabilities (ms-marco models are trained with a sigmoid)
+        """
+        return (1.0 / (1.0 + np.exp(-np.asarray(scores, dtype=np.float64)))).tolist()
+
+
+def build_reranker(name: str = RERANKER, embeddings: Optional[Callable[[], Embeddings]] = None) -> Reranker:
+    """
+    Returns: Reranker configured from RAG_RERANK_* for name
+    """
+    cutoff = {"min_score": TOP_K_MIN_SCORE, "max_drop": TOP_K_MAX_DROP} if ADAPTIVE_TOP_K else {}
+    if name == "none":
+        return Reranker(**cutoff)
+    options = {"fetch_factor": RERANK_FETCH_FACTOR, "top_n": RERANK_TOP_N, **cutoff}
+    if name == "lexical":
+        return LexicalReranker(**options)
+    if name == "embedding":
+        if embeddings is None:
+            raise ValueError("The embedding reranker needs an embeddings provider")
+        return EmbeddingReranker(embeddings, **options)
+    if name == "cross-encoder":
+        return CrossEncoderReranker(**options)
+    raise ValueError(f"Unknown reranker: {name}")
@@ -0,0 +1,60 @@
+import ntpath
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Metadata key holding a chunk's PDF file name (its source path's basename)
+FILENAME_KEY = "filename"
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Request filters-> Chroma `where` clause / metadata predicate (keyword index)
+
+
+def source_filename(source: str) -> str:
+    """
+    Returns: The file name of a source path, whether it was written with
+    POSIX or Windows separators
+    """
+    return ntpath.basename(source)
+
+
+@dataclass(frozen=True)
+class RetrievalFilter:
+    """
+    Metadata restrictions for one question.
+
+    sources: PDF file names or full source paths, matched on the file
+    name (stored at ingestion as `filename`), so a filter holds wherever
+    the papers folder was. page_from / page_to: inclusive, 1-based page
+    numbers as printed; stored metadata is 0-based.
+    """
+    sources: Optional[Tuple[str, ...]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+
+    def is_empty(self) -> bool:
+        return not self.sources and self.page_from is None and self.page_to is None
+
+    def filenames(self) -> Tuple[str, ...]:
+        """
+        Returns: `filename` metadata values the filter accepts
+        """
+        names = []
+        for source in self.sources or ():
+            name = source_filename(source)
+            names.append(name if name.lower().endswith(".pdf") else f"{name}.pdf")
+        return tuple(names)
+
+    def to_chroma_where(self) -> Optional[dict]:
+        """
+        Returns: Equivalent Chroma `where` clause (None when unfiltered)
+        """
+        clauses = []
+        if self.sources:
+            clauses.append({FILENAME_KEY: {"$in": list(self.filenames())}})
+        if self.page_from is not None:
+            clauses.append({"page": {"$gte": self.page_from - 1}})
+        if self.page_to is not None:
+            clauses.append({"page": {"$lte": self.page_to - 1}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
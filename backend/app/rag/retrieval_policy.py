@@ -1,3 +1,19 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.rag.retrieval_filter import RetrievalFilter
+
+load_dotenv()
+
+# Every depth determine_top_k can return
+TOP_K_VALUES = (3, 4, 5, 6, 8)
+
+# Depth used for speculative retrieval before the analysis is known
+MAX_TOP_K = max(TOP_K_VALUES)
+
+
 def determine_top_k(intent: str, complexity: str) -> int:
     """
     Decide retrieval depth based on query characteristics.
@@ -16,3 +32,85 @@ def determine_top_k(intent: str, complexity: str) -> int:
 
     # exploratory or fallback
     return 8
+
+
+# Score-aware depth: determine_top_k is the ceiling, and the reranker stops adding
+# chunks once relevance falls off. The defaults only cut at sharp falls (recall
+# unchanged on benchmarks.eval_adaptive_top_k); app.rag.top_k_tuner, run on
+# traces of the deployment, fits tighter thresholds.
+ADAPTIVE_TOP_K = os.getenv("RAG_ADAPTIVE_TOP_K", "true").lower() == "true"
+# Relevance (Reranker.relevance: dense cosine similarity without a reranker,
+# BM25 share, cosine, cross-encoder probability) below which a chunk is not sent
+TOP_K_MIN_SCORE = float(os.getenv("RAG_TOP_K_MIN_SCORE", "0.1"))
+# Relevance drop from the previous chunk that ends the context
+TOP_K_MAX_DROP = float(os.getenv("RAG_TOP_K_MAX_DROP", "0.3"))
+
+# Chunks always sent, however sharply the scores fall
+MIN_TOP_K = {
+    "factual": 1,
+    "procedural": 2,
+    "conceptual": 2,
+    "exploratory": 3,
+}
+
+
+def determine_min_top_k(intent: str) -> int:
+    """
+    Decide the floor of the score-aware cutoff.
+    """
+    return MIN_TOP_K.get(intent, MIN_TOP_K["conceptual"])
+
+
+def relevance_falls_off(score: float, previous: Optional[float], min_score: float, max_drop: float) -> bool:
+    """
+    Returns: Whether a chunk scored `score`, ranked after one scored
+    `previous`, is past the point where relevance falls off
+    """
+    return score < min_score or (previous is not None and previous - score > max_drop)
+
+
+# Share of the keyword (BM25) ranking in hybrid fusion; dense search gets the rest.
+# Factual questions tend to hinge on exact names, acronyms and datasets.
+KEYWORD_WEIGHTS = {
+    "factual": 0.5,
+    "procedural": 0.4,
+    "conceptual": 0.3,
+    "exploratory": 0.25,
+}
+
+
+def determine_keyword_weight(intent: str) -> float:
+    """
+    Decide how much exact-term matches count against semantic similarity.
+    """
+    return KEYWORD_WEIGHTS.get(intent, KEYWORD_WEIGHTS["conceptual"])
+
+
+# Broad questions get a diversified dense ranking (maximal marginal relevance)
+MMR_INTENTS = frozenset({"conceptual", "exploratory"})
+
+# Most chunks from one paper that may reach the LLM
+PER_PAPER_CAPS = {
+    "conceptual": 3,
+    "exploratory": 2,
+}
+# Candidates retrieved per chunk sent while a per-paper cap is active, so the
+# slots of chunks the cap drops are refilled from other papers
+PER_PAPER_FETCH_FACTOR = int(os.getenv("RAG_PER_PAPER_FETCH_FACTOR", "3"))
+
+
+def determine_retrieval_mode(intent: str) -> str:
+    """
+    Decide between plain similarity and MMR for the dense ranking.
+    """
+    return "mmr" if intent in MMR_INTENTS else "similarity"
+
+
+def determine_per_paper_cap(intent: str, retrieval_filter: Optional[RetrievalFilter] = None) -> Optional[int]:
+    """
+    Decide how many chunks a single paper may contribute (None = no cap).
+    A question filtered down to one paper is not capped.
+    """
+    if retrieval_filter is not None and len(set(retrieval_filter.filenames())) == 1:
+        return None
+    return PER_PAPER_CAPS.get(intent)
@@ -1,8 +1,14 @@
+import json
+from contextlib import aclosing
+
 from app.db.schemas import User
-from fastapi import APIRouter, Depends
-from app.rag.schemas import RAGQueryRequest
-from app.auth.dependencies import require_active_user
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from app.rag.schemas import RAGBatchQueryRequest, RAGQueryRequest
+from app.rag.rag import rag_registry
+from app.rag.answer_cache import answer_cache
 from app.rag.controller import adaptive_rag_controller
+from app.auth.dependencies import require_active_user, require_admin_user
 
 router = APIRouter(prefix="/rag", tags=["rag"])
 
@@ -15,8 +21,109 @@ def format_sources(docs):
 
 
 @router.post("/query")
-def query_rag(
+async def query_rag(
     data: RAGQueryRequest,
     current_user: User = Depends(require_active_user),):
-    answer, sources = adaptive_rag_controller.run(data.question)
+    answer, sources = await adaptive_rag_controller.arun(data.question, data.retrieval_filter())
     return {"answer": answer, "sources": format_sources(sources)}
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/query/stream")
+async def stream_query_rag(
+    data: RAGQueryRequest,
+    request: Request,
+    current_user: User = Depends(require_active_user),):
+    """
+    Server-Sent Events version of /rag/query:
+    sources first, then answer tokens, then done.
+    Stops generating as soon as the client disconnects.
+    """
+    async def event_stream():
+        async with aclosing(adaptive_rag_controller.astream(data.question, data.retrieval_filter())) as events:
+            async for event in events:
+                if await request.is_disconnected():
+                    break
+                payload = event["data"]
+                if event["event"] == "sources":
+                    payload = format_sources(payload)
+                yield format_sse(event["event"], payload)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/query/batch")
+async def query_rag_batch(
+    data: RAGBatchQueryRequest,
+    request: Request,
+    current_user: User = Depends(require_active_user),):
+    """
+    Answers many questions in one call, sharing the analyzer call, the
+    embeddings request and the vector searches; generations run with
+    bounded concurrency. Results come back in question order, or with
+    stream=true as Server-Sent Events (one result per question as it
+    completes, carrying its index), then done.
+    """
+    if not data.stream:
+        results = await adaptive_rag_controller.arun_batch(data.questions, data.retrieval_filter())
+        return {"results": [format_batch_result(result) for result in results]}
+
+    async def event_stream():
+        async with aclosing(adaptive_rag_controller.astream_batch(data.questions, data.retrieval_filter())) as results:
+            async for result in results:
+                if await request.is_disconnected():
+                    break
+                yield format_sse("result", format_batch_result(result))
+        yield format_sse("done", {"questions": len(data.questions)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def format_batch_result(result: dict) -> dict:
+    if "error" in result:
+        return result
+    return {
+        "index": result["index"],
+        "question": result["question"],
+        "answer": result["answer"],
+        "sources": format_sources(result["documents"]),
+    }
+
+
+@router.post("/reload")
+def reload_rag(
+    _: User = Depends(require_admin_user),):
+    """
+    Drops the cached vector store and chains after re-ingestion.
+    """
+    rag_registry.reload()
+    return {"message": "RAG resources reloaded."}
+
+
+@router.get("/cache/stats")
+def answer_cache_stats(
+    _: User = Depends(require_admin_user),):
+    """
+    Returns answer cache hit-rate counters.
+    """
+    return answer_cache.stats()
+
+
+@router.get("/speculation/stats")
+def speculation_stats(
+    _: User = Depends(require_admin_user),):
+    """
+    Returns how often speculative retrieval results were used.
+    """
+    return adaptive_rag_controller.speculation_stats.stats()
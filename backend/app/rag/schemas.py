@@ -1,4 +1,33 @@
-from pydantic import BaseModel
+import os
+from typing import List, Optional
 
-class RAGQueryRequest(BaseModel):
+from pydantic import BaseModel, Field
+
+from app.rag.retrieval_filter import RetrievalFilter
+
+# Questions accepted by one /rag/query/batch call
+BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "200"))
+
+
+class RetrievalFilterFields(BaseModel):
+    sources: Optional[List[str]] = Field(
+        default=None, description="Only retrieve from these PDFs (file names or source paths)"
+    )
+    page_from: Optional[int] = Field(default=None, ge=1, description="First page to retrieve from (1-based)")
+    page_to: Optional[int] = Field(default=None, ge=1, description="Last page to retrieve from (1-based)")
+
+    def retrieval_filter(self) -> RetrievalFilter:
+        return RetrievalFilter(
+            sources=tuple(self.sources) if self.sources else None,
+            page_from=self.page_from,
+            page_to=self.page_to,
+        )
+
+
+class RAGQueryRequest(RetrievalFilterFields):
     question: str
+
+
+class RAGBatchQueryRequest(RetrievalFilterFields):
+    questions: List[str] = Field(min_length=1, max_length=BATCH_MAX_QUESTIONS)
+    stream: bool = Field(default=False, description="Server-Sent Events, one result event per question as it completes")
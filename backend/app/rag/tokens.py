@@ -0,0 +1,32 @@
+from functools import lru_cache
+from typing import List
+
+import tiktoken
+from langchain_core.documents import Document
+
+# Model whose prompt budgets are counted
+PROMPT_MODEL = "gpt-4o"
+# Used when the model's own encoding cannot be loaded (e.g. offline);
+# it slightly over-counts for gpt-4o, so budgets stay on the safe side
+FALLBACK_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = PROMPT_MODEL) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+
+def count_tokens(text: str, model: str = PROMPT_MODEL) -> int:
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def count_document_tokens(documents: List[Document], model: str = PROMPT_MODEL) -> List[int]:
+    """
+    Returns: Prompt tokens of each Document's page_content
+    """
+    if not documents:
+        return []
+    return [len(tokens) for tokens in get_encoding(model).encode_ordinary_batch([d.page_content for d in documents])]
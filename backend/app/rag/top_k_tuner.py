@@ -0,0 +1,175 @@
+import argparse
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from app.rag.reranker import RERANK_TOP_N
+from app.rag.trace_report import read_traces, trace_files
+from app.rag.tracing import TRACE_BACKUPS, TRACE_PATH
+from app.rag.retrieval_policy import (
+    TOP_K_MAX_DROP,
+    TOP_K_MIN_SCORE,
+    determine_min_top_k,
+    determine_top_k,
+    relevance_falls_off,
+)
+
+# A sent chunk sharing at least this share of the answer's words counts as used
+MIN_SUPPORT = 0.3
+MIN_SCORE_GRID = np.round(np.arange(0.0, 0.95, 0.05), 2)
+# 1.0 never fires: relevance of the built-in rerankers lies in [0, 1]
+MAX_DROP_GRID = np.round(np.arange(0.05, 1.05, 0.05), 2)
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Traces (ranked candidate relevance + answer support)-> Replay the cutoff per threshold pair-> Fewest tokens at the target recall
+
+
+@dataclass
+class Sample:
+    """
+    One traced question: its ranked candidates, depth bounds and the chunks the answer used.
+    """
+    intent: str
+    top_k: int
+    min_top_k: int
+    scores: List[Optional[float]]
+    tokens: List[int]
+    ids: List[str]
+    used: Set[str]
+
+
+@dataclass
+class Outcome:
+    min_score: Optional[float]
+    max_drop: Optional[float]
+    chunks: float
+    tokens: float
+    recall: float
+
+
+def load_samples(traces: Iterable[dict], min_support: float = MIN_SUPPORT) -> List[Sample]:
+    """
+    Returns: Samples of the traces that recorded candidates with a relevance
+    (answered, not cached, by a reranker that scores relevance or with dense
+    similarities; keyword-only hits have none)
+    """
+    samples = []
+    for trace in traces:
+        candidates = trace.get("candidates")
+        analysis = trace.get("analysis") or {}
+        if not candidates or trace.get("cache_hit") or trace.get("error"):
+            continue
+        if all(c.get("relevance") is None for c in candidates):
+            continue
+        intent = analysis.get("intent", "conceptual")
+        samples.append(Sample(
+            intent=intent,
+            top_k=determine_top_k(intent, analysis.get("complexity", "medium")),
+            min_top_k=determine_min_top_k(intent),
+            scores=[c["relevance"] for c in candidates],
+            tokens=[c["tokens"] for c in candidates],
+            ids=[c["id"] for c in candidates],
+            used={c["id"] for c in trace.get("chunks", []) if c.get("support", 0.0) >= min_support},
+        ))
+    return samples
+
+
+def replay(sample: Sample, top_n: Optional[int], min_score: Optional[float], max_drop: Optional[float]) -> int:
+    """
+    Returns: How many ranked candidates the reranker's selection keeps under
+    these thresholds (None = fixed depth). The per-paper cap is not replayed;
+    candidates without a relevance never end the context, as in selection.
+    """
+    limit = min(sample.top_k, top_n) if top_n else sample.top_k
+    limit = min(limit, len(sample.scores))
+    if min_score is None or max_drop is None:
+        return limit
+    kept, previous = 0, None
+    for score in sample.scores[:limit]:
+        if score is not None and kept >= sample.min_top_k and relevance_falls_off(score, previous, min_score, max_drop):
+            break
+        kept += 1
+        if score is not None:
+            previous = score
+    return kept
+
+
+def evaluate(samples: List[Sample], top_n: Optional[int], min_score: Optional[float], max_drop: Optional[float]) -> Outcome:
+    """
+    Returns: Mean chunks and tokens sent per question, and the share of used chunks still sent
+    """
+    chunks, tokens, used, kept_used = [], [], 0, 0
+    for sample in samples:
+        kept = replay(sample, top_n, min_score, max_drop)
+        chunks.append(kept)
+        tokens.append(sum(sample.tokens[:kept]))
+        used += len(sample.used)
+        kept_used += len(sample.used & set(sample.ids[:kept]))
+    return Outcome(
+        min_score, max_drop, float(np.mean(chunks)), float(np.mean(tokens)), kept_used / used if used else 1.0,
+    )
+
+
+def fit(samples: List[Sample], top_n: Optional[int], target_recall: float) -> Outcome:
+    """
+    Returns: The threshold pair sending the fewest tokens while keeping
+    target_recall of the used chunks (ties: higher recall)
+    """
+    best = evaluate(samples, top_n, None, None)
+    for min_score in MIN_SCORE_GRID:
+        for max_drop in MAX_DROP_GRID:
+            outcome = evaluate(samples, top_n, float(min_score), float(max_drop))
+            if outcome.recall < target_recall:
+                continue
+            if (outcome.tokens, -outcome.recall) < (best.tokens, -best.recall):
+                best = outcome
+    return best
+
+
+def format_outcomes(outcomes: Dict[str, Outcome]) -> str:
+    lines = [f"{'policy':<10} {'min_score':>9} {'max_drop':>9} {'chunks':>7} {'tokens':>8} {'recall':>7}"]
+    for name, outcome in outcomes.items():
+        min_score = "-" if outcome.min_score is None else f"{outcome.min_score:.2f}"
+        max_drop = "-" if outcome.max_drop is None else f"{outcome.max_drop:.2f}"
+        lines.append(
+            f"{name:<10} {min_score:>9} {max_drop:>9} {outcome.chunks:>7.2f} {outcome.tokens:>8.0f} {outcome.recall:>7.3f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    """
+    Fits RAG_TOP_K_MIN_SCORE / RAG_TOP_K_MAX_DROP from request traces:
+        python -m app.rag.top_k_tuner --path app/data/traces/rag_traces.jsonl --target-recall 0.95
+    Traces should be collected with RAG_ADAPTIVE_TOP_K=false: chunks the
+    cutoff did not send have no answer support to learn from.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=TRACE_PATH)
+    parser.add_argument("--backups", type=int, default=TRACE_BACKUPS)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--min-support", type=float, default=MIN_SUPPORT)
+    parser.add_argument("--top-n", type=int, default=RERANK_TOP_N)
+    args = parser.parse_args()
+
+    files = trace_files(args.path, args.backups)
+    if not files:
+        parser.exit(1, f"No traces at {args.path}\n")
+    samples = load_samples(read_traces(files), args.min_support)
+    if not samples:
+        parser.exit(1, "No traces with reranked candidates\n")
+
+    fitted = fit(samples, args.top_n, args.target_recall)
+    print(f"{len(samples)} traced questions, {sum(len(s.used) for s in samples)} used chunks "
+          f"(support >= {args.min_support})\n")
+    print(format_outcomes({
+        "fixed": evaluate(samples, args.top_n, None, None),
+        "current": evaluate(samples, args.top_n, TOP_K_MIN_SCORE, TOP_K_MAX_DROP),
+        "fitted": fitted,
+    }))
+    if fitted.min_score is None:
+        print(f"\nNo thresholds keep {args.target_recall:.0%} of the used chunks; keep RAG_ADAPTIVE_TOP_K=false")
+    else:
+        print(f"\nRAG_ADAPTIVE_TOP_K=true\nRAG_TOP_K_MIN_SCORE={fitted.min_score:.2f}\nRAG_TOP_K_MAX_DROP={fitted.max_drop:.2f}")
@@ -0,0 +1,101 @@
+import os
+import json
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.rag.tracing import TRACE_BACKUPS, TRACE_PATH
+
+PERCENTILES = (50, 95, 99)
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Rotated JSONL traces-> Per-stage / per-token-kind samples-> p50 / p95 / p99 table (+ slowest questions)
+
+
+def trace_files(path: str, backups: int = TRACE_BACKUPS) -> List[str]:
+    """
+    Returns: The trace file and its rotated backups that exist, oldest first
+    """
+    candidates = [f"{path}.{index}" for index in range(backups, 0, -1)] + [path]
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+
+def read_traces(paths: List[str]) -> Iterator[dict]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                # The last line of a file still being written may be partial
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def collect(traces: Iterator[dict], mode: Optional[str] = None) -> tuple[Dict[str, List[float]], Dict[str, List[float]], List[dict]]:
+    """
+    Returns: Stage timings (ms, with "total"), token counts by kind, and the kept traces
+    """
+    stages: Dict[str, List[float]] = {}
+    tokens: Dict[str, List[float]] = {}
+    kept = []
+    for trace in traces:
+        if mode and trace.get("mode") != mode:
+            continue
+        kept.append(trace)
+        for stage, ms in trace.get("stages_ms", {}).items():
+            stages.setdefault(stage, []).append(ms)
+        stages.setdefault("total", []).append(trace.get("total_ms", 0.0))
+        for kind, count in trace.get("tokens", {}).items():
+            tokens.setdefault(kind, []).append(count)
+    return stages, tokens, kept
+
+
+def format_table(title: str, samples: Dict[str, List[float]], precision: int) -> str:
+    header = f"{title:<16} {'count':>7}" + "".join(f" {'p' + str(p):>9}" for p in PERCENTILES) + f" {'max':>9}"
+    lines = [header]
+    for name, values in sorted(samples.items(), key=lambda item: (item[0] == "total", item[0])):
+        quantiles = np.percentile(values, PERCENTILES)
+        lines.append(
+            f"{name:<16} {len(values):>7}" + "".join(f" {q:>9.{precision}f}" for q in quantiles) + f" {max(values):>9.{precision}f}"
+        )
+    return "\n".join(lines)
+
+
+def format_slowest(traces: List[dict], count: int) -> str:
+    lines = [f"slowest {count}"]
+    for trace in sorted(traces, key=lambda t: t.get("total_ms", 0.0), reverse=True)[:count]:
+        stages = trace.get("stages_ms") or {"-": 0.0}
+        stage, ms = max(stages.items(), key=lambda item: item[1])
+        lines.append(f"  {trace.get('total_ms', 0.0):9.1f} ms  {stage} {ms:.1f} ms  {trace.get('question', '')[:80]!r}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    """
+    Summarizes request traces:
+        python -m app.rag.trace_report --path app/data/traces/rag_traces.jsonl --slowest 10
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=TRACE_PATH)
+    parser.add_argument("--backups", type=int, default=TRACE_BACKUPS)
+    parser.add_argument("--mode", choices=["sync", "async", "stream", "batch"])
+    parser.add_argument("--slowest", type=int, default=0)
+    args = parser.parse_args()
+
+    files = trace_files(args.path, args.backups)
+    if not files:
+        parser.exit(1, f"No traces at {args.path}\n")
+    stages, tokens, traces = collect(read_traces(files), args.mode)
+    if not traces:
+        parser.exit(1, "No matching traces\n")
+
+    print(f"{len(traces)} traces from {len(files)} file(s)\n")
+    print(format_table("stage (ms)", stages, precision=1))
+    if tokens:
+        print()
+        print(format_table("tokens", tokens, precision=0))
+    if args.slowest:
+        print()
+        print(format_slowest(traces, args.slowest))
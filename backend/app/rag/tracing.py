@@ -0,0 +1,273 @@
+import os
+import re
+import json
+import time
+import queue
+import atexit
+import random
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Share of questions traced (0 = only slow ones, when RAG_TRACE_SLOW_MS is set)
+TRACE_SAMPLE_RATE = float(os.getenv("RAG_TRACE_SAMPLE_RATE", "0"))
+# Questions slower than this are always traced (0 = off)
+TRACE_SLOW_MS = float(os.getenv("RAG_TRACE_SLOW_MS", "0"))
+# Under the mounted app/data volume, so traces outlive the container
+TRACE_PATH = os.getenv("RAG_TRACE_PATH", "app/data/traces/rag_traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("RAG_TRACE_MAX_BYTES", str(50 * 2**20)))
+TRACE_BACKUPS = int(os.getenv("RAG_TRACE_BACKUPS", "5"))
+# Records waiting for the writer thread; beyond this they are dropped, never waited on
+TRACE_QUEUE_SIZE = int(os.getenv("RAG_TRACE_QUEUE_SIZE", "1000"))
+
+# Words of four letters or more: skips most stopwords without a list
+WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9-]{3,}")
+
+_active_trace: ContextVar[Optional[Union["RequestTrace", "TraceGroup"]]] = ContextVar("rag_active_trace", default=None)
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Request start-> Sample?-> Stages / chunks / tokens collected on the trace-> Queue-> Writer thread-> Rotating JSONL
+
+
+@dataclass
+class RequestTrace:
+    """
+    What one traced question went through. Pipeline stages find it with
+    current_trace() and add their timings, token counts and chunks.
+    """
+    sampled: bool
+    started: float = field(default_factory=time.time)
+    stages_ms: Dict[str, float] = field(default_factory=dict)
+    tokens: Dict[str, int] = field(default_factory=dict)
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+    # Every reranked candidate, best first, whether sent or not
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+    # Text of the sent chunks, only kept to measure answer support (not written)
+    chunk_texts: List[str] = field(default_factory=list, repr=False)
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        # Stages that run more than once (e.g. embed for speculation and retrieval) add up
+        self.stages_ms[stage] = self.stages_ms.get(stage, 0.0) + seconds * 1000
+
+    def add_tokens(self, kind: str, count: int) -> None:
+        self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def add_answer_support(self, answer: str) -> None:
+        """
+        Sets each sent chunk's "support": the share of the answer's words
+        found in the chunk. A label-free hint of which chunks the answer used.
+        """
+        answer_words = set(WORD_PATTERN.findall(answer.lower()))
+        if not answer_words:
+            return
+        for chunk, text in zip(self.chunks, self.chunk_texts):
+            chunk["support"] = round(len(answer_words & set(WORD_PATTERN.findall(text.lower()))) / len(answer_words), 4)
+
+
+class TraceGroup:
+    """
+    Current "trace" while a batch runs one stage for many questions at
+    once (one analyzer call, one embeddings request, ...): the stage's
+    time goes to every traced question in it, each having waited for all of it.
+    """
+
+    def __init__(self, traces: List[RequestTrace]):
+        self.traces = traces
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        for trace in self.traces:
+            trace.add_stage(stage, seconds)
+
+    def add_tokens(self, kind: str, count: int) -> None:
+        for trace in self.traces:
+            trace.add_tokens(kind, count)
+
+
+def current_trace() -> Optional[Union[RequestTrace, TraceGroup]]:
+    """
+    Returns: Trace of the question being answered in this context, if traced
+    """
+    return _active_trace.get()
+
+
+@contextmanager
+def use_trace(trace: Optional[RequestTrace]) -> Iterator[None]:
+    """
+    Makes trace current within the block; batch steps that work on one
+    question at a time run under that question's trace.
+    """
+    token = _active_trace.set(trace)
+    try:
+        yield
+    finally:
+        _active_trace.reset(token)
+
+
+@contextmanager
+def use_traces(traces: List[Optional[RequestTrace]]) -> Iterator[None]:
+    """
+    Makes the traced questions of a batch current together for a shared stage.
+    """
+    traces = [trace for trace in traces if trace is not None]
+    with use_trace(TraceGroup(traces) if traces else None):
+        yield
+
+
+class JsonlTraceSink:
+    """
+    Appends records as JSON lines from a background thread, rotating the
+    file at max_bytes (path.1 … path.<backups>). submit never blocks:
+    when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(
+        self,
+        path: str = TRACE_PATH,
+        max_bytes: int = TRACE_MAX_BYTES,
+        backups: int = TRACE_BACKUPS,
+        queue_size: int = TRACE_QUEUE_SIZE,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self.written = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._drain, name="rag-trace-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self) -> None:
+        """
+        Writes what is queued, then stops the writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _drain(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+                if file.tell() and file.tell() + len(line) > self.max_bytes:
+                    file.close()
+                    self._rotate()
+                    file = open(self.path, "a", encoding="utf-8")
+                file.write(line)
+                self.written += 1
+                if self._queue.empty():
+                    file.flush()
+        finally:
+            file.close()
+
+    def _rotate(self) -> None:
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+class Tracer:
+    """
+    Decides which questions are traced and hands finished records to the sink.
+
+    A question is traced from the start when it falls in the sample; with
+    a slow threshold every question is collected provisionally and kept
+    only if it turned out slow. The sink (and its thread) is created on
+    the first kept record.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        slow_ms: float = TRACE_SLOW_MS,
+        sink: Optional[JsonlTraceSink] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._sink = sink
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    @property
+    def sink(self) -> JsonlTraceSink:
+        if self._sink is None:
+            with self._lock:
+                if self._sink is None:
+                    self._sink = JsonlTraceSink()
+        return self._sink
+
+    def start(self) -> Optional[RequestTrace]:
+        """
+        Returns: The new question's trace (also made current), or None when not traced
+        """
+        trace = self._new_trace()
+        _active_trace.set(trace)
+        return trace
+
+    def start_batch(self, count: int) -> List[Optional[RequestTrace]]:
+        """
+        Returns: One trace (or None) per question of a batch, each sampled
+        on its own. None is made current: batch steps pick theirs with
+        use_trace (one question) or use_traces (a shared stage).
+        """
+        _active_trace.set(None)
+        return [self._new_trace() for _ in range(count)]
+
+    def _new_trace(self) -> Optional[RequestTrace]:
+        if not self.enabled:
+            return None
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if sampled or self.slow_ms > 0:
+            return RequestTrace(sampled=sampled)
+        return None
+
+    def finish(self, trace: RequestTrace, record: Dict[str, Any]) -> bool:
+        """
+        Returns: Whether the record (request fields + the trace's) was queued for writing
+        """
+        total_ms = (time.time() - trace.started) * 1000
+        slow = self.slow_ms > 0 and total_ms >= self.slow_ms
+        if not (trace.sampled or slow):
+            return False
+        return self.sink.submit({
+            "timestamp": trace.started,
+            **record,
+            "chunks": trace.chunks,
+            "candidates": trace.candidates,
+            "tokens": trace.tokens,
+            "stages_ms": {stage: round(ms, 3) for stage, ms in trace.stages_ms.items()},
+            "total_ms": round(total_ms, 3),
+            "kept": "sampled" if trace.sampled else "slow",
+        })
+
+
+tracer = Tracer()
@@ -0,0 +1,117 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.rag.vector_quantization import VECTOR_STORAGES
+from app.rag.numpy_vectorstore import NUMPY_STORE_DIRECTORY, NumpyVectorStore
+
+load_dotenv()
+
+# chroma | numpy
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma").lower()
+
+# Chroma HNSW graph. space / M / ef_construction only apply when the
+# collection is created (re-ingest into an empty directory to change them);
+# ef_search is applied whenever the collection is opened (read when a process
+# first loads the HNSW index).
+HNSW_SPACE = os.getenv("RAG_HNSW_SPACE", "l2")
+HNSW_M = int(os.getenv("RAG_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "100"))
+
+# NumPy backend: flat (exact brute force) | ivf (k-means inverted lists)
+NUMPY_INDEX = os.getenv("RAG_NUMPY_INDEX", "flat").lower()
+# Inverted lists; 0 = sqrt(chunk count) when the index is trained
+IVF_LISTS = int(os.getenv("RAG_IVF_LISTS", "0"))
+# Lists scanned per question: more = better recall, slower
+IVF_PROBES = int(os.getenv("RAG_IVF_PROBES", "16"))
+
+# NumPy backend vector storage, fixed when the store is created:
+# float32 | matryoshka (first RAG_MATRYOSHKA_DIMENSIONS dims) | int8 | binary
+VECTOR_STORAGE = os.getenv("RAG_VECTOR_STORAGE", "float32").lower()
+MATRYOSHKA_DIMENSIONS = int(os.getenv("RAG_MATRYOSHKA_DIMENSIONS", "256"))
+# Keep vectors on disk for rescoring; false re-embeds the
+# candidates instead (served by the embedding cache)
+VECTOR_KEEP_FULL_PRECISION = os.getenv("RAG_VECTOR_KEEP_FULL_PRECISION", "true").lower() == "true"
+# Precision of those rescoring vectors: float16 (half the disk) | float32
+VECTOR_RESCORE_DTYPE = os.getenv("RAG_VECTOR_RESCORE_DTYPE", "float16").lower()
+# Compact-code candidates rescored with full precision = k * factor
+RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "4"))
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#RAG_VECTOR_BACKEND-> Chroma (tuned HNSW) or memory-mapped NumPy store-> Same VectorStore interface
+
+
+def hnsw_configuration(
+    space: str = HNSW_SPACE,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    ef_search: int = HNSW_EF_SEARCH,
+) -> dict:
+    """
+    Returns: Chroma collection configuration for the HNSW graph
+    """
+    return {"hnsw": {"space": space, "max_neighbors": m, "ef_construction": ef_construction, "ef_search": ef_search}}
+
+
+def open_chroma(
+    persist_directory: str,
+    embedding_model: Embeddings,
+    ef_search: int = HNSW_EF_SEARCH,
+    **hnsw_options,
+) -> Chroma:
+    """
+    Loads: Chroma collection, created with the configured HNSW parameters
+    Returns: Chroma vector database searching with ef_search
+    """
+    configuration = hnsw_configuration(ef_search=ef_search, **hnsw_options)
+    vector_database = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embedding_model,
+        collection_configuration=configuration,
+    )
+    current = (vector_database._collection.configuration or {}).get("hnsw") or {}
+    if current.get("ef_search") != ef_search:
+        vector_database._collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    return vector_database
+
+
+def open_vector_database(
+    persist_directory: str,
+    embedding_model: Embeddings,
+    backend: Optional[str] = None,
+    read_only: bool = False,
+) -> VectorStore:
+    """
+    Loads: Vector database of the configured backend under persist_directory
+    (the NumPy store lives in its own sub-directory, next to Chroma's files;
+    read_only opens it for searching only, as the API does)
+    Returns: Vector Database
+    """
+    backend = backend or VECTOR_BACKEND
+    if VECTOR_STORAGE not in VECTOR_STORAGES:
+        raise ValueError(f"Unknown vector storage: {VECTOR_STORAGE}")
+    if backend == "chroma":
+        if VECTOR_STORAGE != "float32":
+            raise ValueError("RAG_VECTOR_STORAGE other than float32 needs RAG_VECTOR_BACKEND=numpy")
+        return open_chroma(persist_directory, embedding_model)
+    if backend == "numpy":
+        return NumpyVectorStore(
+            os.path.join(persist_directory, NUMPY_STORE_DIRECTORY),
+            embedding_model,
+            index=NUMPY_INDEX,
+            ivf_lists=IVF_LISTS or None,
+            ivf_probes=IVF_PROBES,
+            storage=VECTOR_STORAGE,
+            matryoshka_dimensions=MATRYOSHKA_DIMENSIONS,
+            keep_full_precision=VECTOR_KEEP_FULL_PRECISION,
+            rescore_factor=RESCORE_FACTOR,
+            rescore_dtype=VECTOR_RESCORE_DTYPE,
+            read_only=read_only,
+        )
+    raise ValueError(f"Unknown vector backend: {backend}")
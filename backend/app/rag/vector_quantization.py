@@ -0,0 +1,154 @@
+from typing import Optional
+
+import numpy as np
+
+VECTOR_STORAGES = ("float32", "matryoshka", "int8", "binary")
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Full-precision vectors-> Compact codes (searched)-> Candidate scores-> Rescored with full precision by the store
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class VectorCodec:
+    """
+    How a vector store keeps the matrix it scans. Rows come in
+    L2-normalized; `encode` turns them into fixed-width code rows of
+    `dtype`, `score` ranks code rows against a query, `decode` maps codes
+    back into the (possibly truncated) space IVF centroids live in.
+    The base codec stores float32 unchanged, so scores are exact.
+    """
+
+    name = "float32"
+    dtype = np.float32
+    lossless = True
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    @property
+    def width(self) -> int:
+        return self.dimensions
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def project(self, query: np.ndarray) -> np.ndarray:
+        """
+        Returns: The normalized query in the decoded space
+        """
+        return query
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Returns: Similarity of each code row to the query, higher is better
+        """
+        return np.asarray(codes) @ query
+
+
+class MatryoshkaCodec(VectorCodec):
+    """
+    Keeps the first `truncate_to` dimensions, renormalized. Matches what
+    text-embedding-3 models return for a smaller `dimensions`, whose
+    leading dimensions carry most of the signal.
+    """
+
+    name = "matryoshka"
+    lossless = False
+
+    def __init__(self, dimensions: int, truncate_to: int):
+        super().__init__(dimensions)
+        self.truncate_to = min(truncate_to, dimensions)
+
+    @property
+    def width(self) -> int:
+        return self.truncate_to
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(normalize(vectors[:, :self.truncate_to]), dtype=np.float32)
+
+    def project(self, query: np.ndarray) -> np.ndarray:
+        return normalize(query[:self.truncate_to])
+
+
+class Int8Codec(VectorCodec):
+    """
+    Scalar quantization with one scale per row: each code row is the
+    int8 values (max |value| mapped to 127) followed by the float32 scale,
+    4x smaller than float32.
+    """
+
+    name = "int8"
+    dtype = np.uint8
+    lossless = False
+
+    @property
+    def width(self) -> int:
+        return self.dimensions + 4
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        values = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return np.concatenate([values.view(np.uint8), scales.view(np.uint8)], axis=1)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        values = codes[:, :self.dimensions].view(np.int8).astype(np.float32)
+        return values * np.ascontiguousarray(codes[:, self.dimensions:]).view(np.float32)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        scales = np.ascontiguousarray(codes[:, self.dimensions:]).view(np.float32)[:, 0]
+        # einsum reads the int8 values directly; casting the block to float32 first is ~3x slower
+        return np.einsum("ij,j->i", codes[:, :self.dimensions].view(np.int8), query) * scales
+
+
+class BinaryCodec(VectorCodec):
+    """
+    One sign bit per dimension (32x smaller than float32), scored by
+    Hamming distance between the packed query and row bits.
+    """
+
+    name = "binary"
+    dtype = np.uint8
+    lossless = False
+
+    @property
+    def width(self) -> int:
+        return (self.dimensions + 7) // 8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > 0, axis=1)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        bits = np.unpackbits(np.asarray(codes), axis=1, count=self.dimensions).astype(np.float32)
+        return (2 * bits - 1) / np.sqrt(self.dimensions)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        query_bits = np.packbits(query > 0)
+        return -np.bitwise_count(np.bitwise_xor(np.asarray(codes), query_bits)).sum(axis=1, dtype=np.int32)
+
+
+def build_codec(storage: str, dimensions: int, matryoshka_dimensions: Optional[int] = None) -> VectorCodec:
+    """
+    Returns: Codec for a vector storage name (see VECTOR_STORAGES)
+    """
+    if storage == "float32":
+        return VectorCodec(dimensions)
+    if storage == "matryoshka":
+        if not matryoshka_dimensions:
+            raise ValueError("Matryoshka storage needs the number of dimensions to keep")
+        return MatryoshkaCodec(dimensions, matryoshka_dimensions)
+    if storage == "int8":
+        return Int8Codec(dimensions)
+    if storage == "binary":
+        return BinaryCodec(dimensions)
+    raise ValueError(f"Unknown vector storage: {storage}")
@@ -1,33 +1,106 @@
 # ruff: noqa: I001
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_core.vectorstores import VectorStoreRetriever
+from typing import Callable, List, Optional, Tuple
 
-from app.rag.injestion import vector_database_path
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
+
+from app.rag.vector_backend import open_vector_database
+from app.rag.numpy_vectorstore import NumpyVectorStore
+from app.rag.injestion import get_embedding_model, vector_database_path
+from app.rag.keyword_index import KeywordIndex, load_keyword_index
 
 
 #--------------------------------------------------------------------------------------------------------------------------
 #Get Database->make retriever->
 
-def get_vector_database() -> Chroma:
+def get_vector_database(embedding_model: Optional[Embeddings] = None) -> VectorStore:
     """
-    Loads: the vector database created
+    Loads: the vector database created, with the RAG_VECTOR_BACKEND backend
+    (read-only: ingestion is its only writer), searching with embedding_model
+    (a new one from get_embedding_model when not given)
     Returns: Vector Database
     """
-    embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
-    vector_database = Chroma(
-        persist_directory=vector_database_path,
-        embedding_function=embedding_model,
-    )
+    embedding_model = embedding_model or get_embedding_model()
+    vector_database = open_vector_database(vector_database_path, embedding_model, read_only=True)
     return vector_database
 
 
-def retriever_database(top_k: int = 4) -> VectorStoreRetriever:
+def get_keyword_index(vector_database: Callable[[], VectorStore]) -> KeywordIndex:
+    """
+    Loads: the keyword index term table written next to the vector database, compiled
+    Returns: Keyword Index (empty until ingestion has built one); matched chunk
+    texts are read from the current vector_database() by id
+    """
+    def documents(ids: List[str]) -> List[Document]:
+        return vector_database().get_by_ids(ids)
+
+    return load_keyword_index(vector_database_path, documents) or KeywordIndex(documents)
+
+
+def similarity_search_with_vectors(
+    vector_database: VectorStore,
+    query_embedding: List[float],
+    k: int,
+    where: Optional[dict] = None,
+) -> Tuple[List[Document], List[List[float]]]:
+    """
+    Searches: Top k chunks for a query vector, optionally restricted by a `where` clause
+    Returns: Documents (best first) and their stored vectors, for MMR
+    """
+    return similarity_search_with_vectors_batch(vector_database, [query_embedding], k, where)[0]
+
+
+def similarity_search_with_vectors_batch(
+    vector_database: VectorStore,
+    query_embeddings: List[List[float]],
+    k: int,
+    where: Optional[dict] = None,
+) -> List[Tuple[List[Document], List[List[float]]]]:
+    """
+    Searches: Top k chunks for many query vectors at once (one Chroma query call)
+    Returns: Per query vector, Documents (best first) and their stored vectors
+    """
+    if isinstance(vector_database, NumpyVectorStore):
+        return [vector_database.similarity_search_with_vectors(embedding, k, where) for embedding in query_embeddings]
+    results = vector_database._collection.query(
+        query_embeddings=query_embeddings,
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "embeddings"],
+    )
+    return [
+        (
+            [
+                Document(id=chunk_id, page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(ids, texts, metadatas)
+            ],
+            list(embeddings),
+        )
+        for ids, texts, metadatas, embeddings in zip(
+            results["ids"], results["documents"], results["metadatas"], results["embeddings"]
+        )
+    ]
+
+
+def retriever_database(
+    top_k: int = 4,
+    mode: str = "similarity",
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+    where: Optional[dict] = None,
+) -> VectorStoreRetriever:
     """
     Calls Function:
         Loads: Existing Vector Database
-        Returns: Vector Store Retriever
+        Returns: Vector Store Retriever ("similarity" or "mmr", optionally
+        restricted by a Chroma `where` clause)
     """
     vector_database = get_vector_database()
-    retriever = vector_database.as_retriever(search_kwargs={"k": top_k})
+    search_kwargs = {"k": top_k}
+    if mode == "mmr":
+        search_kwargs.update(fetch_k=max(fetch_k, top_k), lambda_mult=lambda_mult)
+    if where:
+        search_kwargs["filter"] = where
+    retriever = vector_database.as_retriever(search_type=mode, search_kwargs=search_kwargs)
     return retriever
@@ -0,0 +1,98 @@
+"""
+Batch query API vs one question at a time.
+
+    python -m benchmarks.bench_batch_query --questions 100 --llm-latency 0.3
+
+Uses the offline harness of bench_suite (fake chat model and embeddings
+with artificial latency, synthetic corpus). Answers the same questions
+three ways and reports wall time, questions/s and the model calls made:
+  - sequential: arun per question, like an evaluation job posting to
+    /rag/query one request at a time
+  - batch:      arun_batch (/rag/query/batch)
+  - streamed:   astream_batch, also timing the first result
+The answer cache is off so every question does the full pipeline, and
+each path gets its own copy of the questions so the embedding cache
+never short-circuits one with another's vectors.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks.bench_suite import Harness, make_questions, scenario_ingestion
+from benchmarks.synthetic_pdfs import write_corpus
+
+
+def model_calls(harness: Harness) -> tuple[int, int]:
+    return harness.chat_model.calls, harness.fake_embeddings.calls
+
+
+def report(label: str, questions: int, elapsed: float, calls: tuple[int, int], note: str = "") -> None:
+    print(f"{label:<11} {elapsed:8.2f} s {questions / elapsed:8.1f} q/s {calls[0]:8} {calls[1]:8}  {note}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--embedding-latency", type=float, default=0.1)
+    args = parser.parse_args()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+    with tempfile.TemporaryDirectory(prefix="bench_batch_query_") as directory:
+        harness = Harness(argparse.Namespace(
+            dimensions=256, llm_latency=args.llm_latency, token_latency=0.0,
+            embedding_latency=args.embedding_latency, papers=args.papers, workers=1,
+        ), directory)
+        write_corpus(harness.papers_path, args.papers, args.pages)
+        scenario_ingestion(harness)
+        controller = harness.controller()
+        questions = make_questions(args.questions, seed=5)
+        sequential_questions = [f"{q} (sequential)" for q in questions]
+        batch_questions = [f"{q} (batch)" for q in questions]
+        streamed_questions = [f"{q} (streamed)" for q in questions]
+
+        print(f"{args.questions} questions, LLM {args.llm_latency * 1000:.0f} ms, embeddings {args.embedding_latency * 1000:.0f} ms, "
+              f"batch concurrency {args.concurrency}")
+        print(f"{'':<11} {'wall':>10} {'throughput':>12} {'LLM':>8} {'embed':>8}")
+
+        async def sequential():
+            for question in sequential_questions:
+                await controller.arun(question)
+
+        before = model_calls(harness)
+        start = time.perf_counter()
+        asyncio.run(sequential())
+        elapsed = time.perf_counter() - start
+        after = model_calls(harness)
+        report("sequential", args.questions, elapsed, (after[0] - before[0], after[1] - before[1]))
+
+        before = after
+        start = time.perf_counter()
+        results = asyncio.run(controller.arun_batch(batch_questions, max_concurrency=args.concurrency))
+        elapsed = time.perf_counter() - start
+        after = model_calls(harness)
+        errors = sum("error" in result for result in results)
+        report("batch", args.questions, elapsed, (after[0] - before[0], after[1] - before[1]), f"{errors} errors")
+
+        async def streamed():
+            first = None
+            async for _ in controller.astream_batch(streamed_questions, max_concurrency=args.concurrency):
+                first = first or time.perf_counter()
+            return first
+
+        before = after
+        start = time.perf_counter()
+        first = asyncio.run(streamed())
+        elapsed = time.perf_counter() - start
+        after = model_calls(harness)
+        report("streamed", args.questions, elapsed, (after[0] - before[0], after[1] - before[1]),
+               f"first result after {(first - start):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
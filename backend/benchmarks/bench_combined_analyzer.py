@@ -0,0 +1,97 @@
+"""
+Separate analyze + rewrite calls vs the combined JSON-mode analyzer call.
+
+    python -m benchmarks.bench_combined_analyzer --questions 40 --llm-latency 0.3
+
+Runs Phase 3 (AdaptiveRAGController._apreprocess_question) for the same
+questions with QueryAnalyzer(combined=False) and (combined=True), both
+in LLM mode so every question reaches the model. FakeChatModel charges
+a flat latency per call, so the numbers count round trips; the combined
+reply carries the rewrite's few extra output tokens on top in production.
+Reported separately for questions the analysis flags for rewriting (the
+path the combined call shortens) and the rest, plus a check that both
+modes produce the same analysis and retrieval query.
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+from benchmarks.fakes import FakeChatModel
+from benchmarks.bench_suite import make_questions
+
+
+def build_controller(chat_model: FakeChatModel, combined: bool):
+    from app.rag.models import ModelRouter
+    from app.rag.answer_cache import AnswerCache
+    from app.rag.query_rewriter import QueryRewriter
+    from app.rag.query_analyzer import QueryAnalyzer
+    from app.rag.controller import AdaptiveRAGController
+    from app.rag.context_packer import ContextPacker
+    from app.rag.reranker import Reranker
+
+    analyzer, rewriter = QueryAnalyzer(mode="llm", combined=combined), QueryRewriter()
+    analyzer.router = ModelRouter("analyzer", llm=chat_model)
+    rewriter.router = ModelRouter("rewriter", llm=chat_model)
+    return AdaptiveRAGController(
+        query_analyzer=analyzer,
+        query_rewriter=rewriter,
+        answer_cache=AnswerCache(enabled=False),
+        speculative_retrieval=False,
+        reranker=Reranker(),
+        context_packer=ContextPacker(),
+    )
+
+
+async def preprocess_all(controller, questions: list[str]) -> list[tuple[float, object]]:
+    from app.rag.query_context import QueryContext
+
+    results = []
+    for question in questions:
+        ctx = QueryContext(question=question)
+        start = time.perf_counter()
+        await controller._apreprocess_question(ctx)
+        results.append((time.perf_counter() - start, ctx))
+    return results
+
+
+def summary(seconds: list[float]) -> str:
+    if not seconds:
+        return "      -"
+    return f"{statistics.median(seconds) * 1000:7.1f} ms (n={len(seconds)})"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+    questions = make_questions(args.questions, seed=22)
+    runs = {}
+    for combined in (False, True):
+        chat_model = FakeChatModel(latency=args.llm_latency)
+        results = asyncio.run(preprocess_all(build_controller(chat_model, combined), questions))
+        runs[combined] = (results, chat_model.calls)
+
+    print(f"{args.questions} questions, LLM {args.llm_latency * 1000:.0f} ms per call, analyzer in LLM mode")
+    print(f"{'':<10} {'rewrite path':>22} {'no rewrite':>22} {'LLM calls':>10}")
+    for combined, label in ((False, "separate"), (True, "combined")):
+        results, calls = runs[combined]
+        flagged = [seconds for seconds, ctx in results if ctx.analysis["needs_rewrite"]]
+        plain = [seconds for seconds, ctx in results if not ctx.analysis["needs_rewrite"]]
+        print(f"{label:<10} {summary(flagged):>22} {summary(plain):>22} {calls:>10}")
+
+    same = sum(
+        separate.retrieval_question == combined.retrieval_question
+        and {k: separate.analysis[k] for k in ("intent", "complexity", "needs_rewrite")}
+        == {k: combined.analysis[k] for k in ("intent", "complexity", "needs_rewrite")}
+        for (_, separate), (_, combined) in zip(runs[False][0], runs[True][0])
+    )
+    print(f"\nsame analysis and retrieval query: {same}/{args.questions}")
+
+
+if __name__ == "__main__":
+    main()
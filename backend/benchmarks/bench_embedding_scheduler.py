@@ -0,0 +1,67 @@
+"""
+Embedding throughput: plain OpenAIEmbeddings vs the ScheduledEmbeddings
+wrapper, against the stub OpenAI server with an optional rate limit.
+
+    python -m benchmarks.bench_embedding_scheduler --texts 20000 --max-rps 20
+
+The stub charges a fixed latency per request plus a per-input latency,
+so batching and concurrency both show up in the numbers.
+"""
+import os
+import time
+import argparse
+
+from benchmarks.stub_openai_server import StubOpenAIProcess
+from benchmarks.synthetic_pdfs import page_lines
+
+
+def synthetic_chunks(count: int) -> list[str]:
+    return [" ".join(page_lines(i, 0, lines=6)) for i in range(count)]
+
+
+def timed(name: str, embed, texts: list[str], server: StubOpenAIProcess) -> None:
+    before = server.stats()
+    start = time.perf_counter()
+    vectors = embed(texts)
+    elapsed = time.perf_counter() - start
+    after = server.stats()
+    assert len(vectors) == len(texts)
+    print(f"{name:<28} {len(texts) / elapsed:9.0f} texts/s  "
+          f"requests={after['requests_served'] - before['requests_served']:<5} "
+          f"429s={after['rate_limited'] - before['rate_limited']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--per-input-latency", type=float, default=0.0005)
+    parser.add_argument("--max-rps", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--port", type=int, default=8769)
+    args = parser.parse_args()
+
+    stub_args = ["--per-input-latency", str(args.per_input_latency), "--max-rps", str(args.max_rps)]
+    with StubOpenAIProcess(port=args.port, latency=args.latency, extra_args=stub_args) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+
+        from langchain_openai import OpenAIEmbeddings
+        from app.rag.embedding_scheduler import ScheduledEmbeddings
+
+        texts = synthetic_chunks(args.texts)
+        baseline = OpenAIEmbeddings(model="text-embedding-3-small")
+        timed("OpenAIEmbeddings (default)", baseline.embed_documents, texts, server)
+
+        for concurrency in args.concurrency:
+            scheduled = ScheduledEmbeddings(
+                OpenAIEmbeddings(model="text-embedding-3-small", chunk_size=2048, max_retries=0),
+                max_concurrency=concurrency,
+            )
+            timed(f"Scheduled concurrency={concurrency}", scheduled.embed_documents, texts, server)
+            print(f"{'':<28} limiter settled at {scheduled.limiter.limit}, "
+                  f"throttled {scheduled.limiter.rate_limited} times")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+TCP connections opened against OpenAI per 1,000 questions.
+
+    python -m benchmarks.bench_http_pool --questions 1000 --concurrency 16 --latency 0.05
+
+Answers the questions through AdaptiveRAGController against the stub
+OpenAI server (benchmarks/stub_openai_server.py), which counts every
+connection it accepts. The questions run twice, through run on a
+thread pool (sync routes) and through arun with asyncio.gather (async
+routes).
+
+Each client setup runs in its own interpreter, with its own stub server:
+  - shared:  every ChatOpenAI / OpenAIEmbeddings on the process-wide
+             httpx clients of app/rag/http_clients.py
+  - default: clients built without http_client / http_async_client,
+             i.e. each falls back to the OpenAI SDK's own pools
+The answer and embedding caches are off so every question reaches the stub.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_openai_server import StubOpenAIProcess
+from benchmarks.load_test_async_query import seed_vector_database
+
+
+def run_mode(args) -> dict:
+    with StubOpenAIProcess(port=args.port, latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+        os.environ["RAG_EMBEDDING_CACHE_ENABLED"] = "false"
+
+        from app.rag import models, injestion, http_clients
+        if args.mode == "default":
+            models.get_http_client = models.get_async_http_client = lambda: None
+            injestion.get_http_client = injestion.get_async_http_client = lambda: None
+
+        from app.rag.answer_cache import AnswerCache
+        from app.rag.controller import AdaptiveRAGController
+
+        questions = [f"what does paper {i} say about retrieval?" for i in range(args.questions)]
+        result = {"mode": args.mode, "http2": http_clients.http2_enabled()}
+        with tempfile.TemporaryDirectory() as persist_directory:
+            seed_vector_database(persist_directory)
+            controller = AdaptiveRAGController(answer_cache=AnswerCache(enabled=False))
+
+            before = server.stats()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(controller.run, [f"{q} (sync)" for q in questions]))
+            result["sync"] = phase_stats(before, server.stats(), time.perf_counter() - start, args.questions)
+
+            async def answer_all():
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def answer(question):
+                    async with semaphore:
+                        await controller.arun(question)
+
+                await asyncio.gather(*(answer(f"{q} (async)") for q in questions))
+
+            before = server.stats()
+            start = time.perf_counter()
+            asyncio.run(answer_all())
+            result["async"] = phase_stats(before, server.stats(), time.perf_counter() - start, args.questions)
+        return result
+
+
+def phase_stats(before: dict, after: dict, elapsed: float, questions: int) -> dict:
+    connections = after["connections_opened"] - before["connections_opened"]
+    requests = after["requests_served"] - before["requests_served"]
+    return {
+        "connections": connections,
+        "requests": requests,
+        "connections_per_1000_questions": round(connections * 1000 / questions, 1),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--mode", choices=["shared", "default"], help="run one setup in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    print(f"{args.questions} questions per phase, concurrency {args.concurrency}, stub latency {args.latency * 1000:.0f} ms")
+    print(f"{'':<8} {'phase':<6} {'requests':>9} {'connections':>12} {'per 1000 q':>11} {'wall':>8}")
+    for mode in ("default", "shared"):
+        command = [sys.executable, "-m", "benchmarks.bench_http_pool", "--mode", mode,
+                   "--questions", str(args.questions), "--concurrency", str(args.concurrency),
+                   "--latency", str(args.latency), "--port", str(args.port)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for phase in ("sync", "async"):
+            stats = result[phase]
+            print(f"{mode:<8} {phase:<6} {stats['requests']:>9} {stats['connections']:>12} "
+                  f"{stats['connections_per_1000_questions']:>11} {stats['seconds']:>7.1f}s")
+    print(f"\nHTTP/2: {'on' if result['http2'] else 'off (h2 not installed)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Retrieval quality and latency: dense vs BM25 keyword vs hybrid (RRF).
+
+    python -m benchmarks.bench_hybrid_retrieval --distractors 20000
+
+Indexes benchmarks/fixtures/retrieval_corpus.jsonl plus random distractor
+chunks drawn from the same vocabulary, then answers the labelled queries
+in benchmarks/fixtures/retrieval_queries.jsonl. Dense search uses the
+offline FakeEmbeddings with few dimensions, so (like a real embedding
+model) it blurs rare identifiers. Reports recall@top_k and MRR per
+method (hybrid with the per-intent policy weights and with fixed
+keyword weights) and the keyword search / fusion latency.
+"""
+import json
+import time
+import random
+import argparse
+import statistics
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddings
+from app.rag.keyword_index import KeywordIndex
+from app.rag.retrieval_policy import determine_top_k
+from app.rag.hybrid_retrieval import (
+    RetrievalCandidates,
+    candidate_depth,
+    fuse_candidates,
+    reciprocal_rank_fusion,
+)
+
+FIXED_KEYWORD_WEIGHTS = (0.25, 0.5, 0.75)
+
+
+def load_jsonl(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def distractor_chunks(corpus: list[dict], count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    vocabulary = sorted({word for chunk in corpus for word in chunk["text"].split()})
+    return [
+        {"id": f"noise-{i}", "source": "noise.pdf", "text": " ".join(rng.choices(vocabulary, k=rng.randint(120, 170)))}
+        for i in range(count)
+    ]
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="benchmarks/fixtures/retrieval_corpus.jsonl")
+    parser.add_argument("--queries", default="benchmarks/fixtures/retrieval_queries.jsonl")
+    parser.add_argument("--distractors", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = load_jsonl(args.corpus)
+    chunks = corpus + distractor_chunks(corpus, args.distractors)
+    queries = load_jsonl(args.queries)
+    documents = [Document(id=c["id"], page_content=c["text"], metadata={"source": c["source"]}) for c in chunks]
+
+    embeddings = FakeEmbeddings(dimensions=args.dimensions)
+    matrix = np.array(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+
+    keyword_index = KeywordIndex()
+    start = time.perf_counter()
+    keyword_index.add([d.id for d in documents], documents)
+    keyword_index.search("warm up", 1)
+    print(f"corpus {len(documents)} chunks, keyword index built in {time.perf_counter() - start:.2f} s")
+
+    def dense_search(query: str, depth: int) -> list[Document]:
+        scores = matrix @ np.array(embeddings.embed_query(query), dtype=np.float32)
+        return [documents[i] for i in np.argsort(-scores)[:depth]]
+
+    results = {"dense": [], "keyword": [], "hybrid": [], **{f"rrf w={w}": [] for w in FIXED_KEYWORD_WEIGHTS}}
+    keyword_ms, fusion_ms = [], []
+    for query in queries:
+        top_k = determine_top_k(query["intent"], "medium")
+        depth = candidate_depth(top_k)
+        dense = dense_search(query["query"], depth)
+
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            keyword = [doc for doc, _ in keyword_index.search(query["query"], depth)]
+            keyword_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            hybrid = fuse_candidates(RetrievalCandidates(dense=dense, keyword=keyword), top_k, query["intent"])
+            fusion_ms.append((time.perf_counter() - start) * 1000)
+
+        rankings = {"dense": dense[:top_k], "keyword": keyword[:top_k], "hybrid": hybrid}
+        for weight in FIXED_KEYWORD_WEIGHTS:
+            rankings[f"rrf w={weight}"] = reciprocal_rank_fusion([(dense, 1 - weight), (keyword, weight)], top_k)
+
+        relevant = set(query["relevant"])
+        for name, ranking in rankings.items():
+            ids = [doc.id for doc in ranking]
+            recall = len(relevant & set(ids)) / len(relevant)
+            reciprocal_rank = next((1 / (rank + 1) for rank, i in enumerate(ids) if i in relevant), 0.0)
+            results[name].append((recall, reciprocal_rank))
+
+    print(f"\n{'method':<12} {'recall@k':>9} {'MRR':>6}")
+    for name, scores in results.items():
+        print(f"{name:<12} {statistics.mean(s[0] for s in scores):9.3f} {statistics.mean(s[1] for s in scores):6.3f}")
+
+    print(f"\nkeyword search  p50 {percentile(keyword_ms, 50):.3f} ms  p99 {percentile(keyword_ms, 99):.3f} ms")
+    print(f"RRF fusion      p50 {percentile(fusion_ms, 50):.3f} ms  p99 {percentile(fusion_ms, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
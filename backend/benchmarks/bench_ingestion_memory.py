@@ -0,0 +1,86 @@
+"""
+Peak-RSS benchmark for ingestion over synthetic PDF libraries.
+
+    python -m benchmarks.bench_ingestion_memory --papers 50 500 --pages 8
+
+Each run happens in a fresh child process with fake embeddings (no
+network), so ru_maxrss reflects only that ingestion. "eager" reproduces
+the old load-everything-then-embed flow for comparison.
+"""
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.synthetic_pdfs import write_corpus
+
+
+def ingest_streaming(papers_path: str, vector_database_path: str, batch_size: int) -> None:
+    from app.rag.injestion import ingestion_process
+
+    ingestion_process(
+        papers_path,
+        vector_database_path,
+        batch_size=batch_size,
+        embedding_model=FakeEmbeddings(),
+    )
+
+
+def ingest_eager(papers_path: str, vector_database_path: str, batch_size: int) -> None:
+    from langchain_chroma import Chroma
+    from langchain_community.document_loaders import PyPDFLoader
+    from app.rag.injestion import list_pdf_files, split_text_into_chunks
+
+    pages = []
+    for path in list_pdf_files(papers_path).values():
+        pages.extend(PyPDFLoader(path).load())
+    chunks = split_text_into_chunks(pages)
+    vector_database = Chroma(persist_directory=vector_database_path, embedding_function=FakeEmbeddings())
+    for start in range(0, len(chunks), 5000):
+        vector_database.add_documents(chunks[start:start + 5000])
+
+
+def child(mode: str, papers_path: str, batch_size: int) -> None:
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as vector_database_path:
+        (ingest_streaming if mode == "streaming" else ingest_eager)(papers_path, vector_database_path, batch_size)
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    print(json.dumps({"peak_rss_mb": peak_kb / 1024, "seconds": time.perf_counter() - start}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--modes", nargs="+", default=["streaming", "eager"])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PAPERS_PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.batch_size)
+        return
+
+    for papers in args.papers:
+        with tempfile.TemporaryDirectory() as papers_path:
+            write_corpus(papers_path, papers, args.pages)
+            for mode in args.modes:
+                output = subprocess.run(
+                    [sys.executable, "-W", "ignore", "-m", "benchmarks.bench_ingestion_memory",
+                     "--batch-size", str(args.batch_size), "--child", mode, papers_path],
+                    check=True, capture_output=True, text=True,
+                ).stdout.strip().splitlines()[-1]
+                result = json.loads(output)
+                print(f"{mode:<10} papers={papers:<6} peak_rss={result['peak_rss_mb']:8.1f} MB  "
+                      f"time={result['seconds']:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
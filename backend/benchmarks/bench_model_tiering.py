@@ -0,0 +1,108 @@
+"""
+Pre-retrieval latency with the large model everywhere vs a small model
+for analysis / rewriting that escalates bad replies to the large one.
+
+    python -m benchmarks.bench_model_tiering --questions 60 --small-latency 0.1 --large-latency 0.35 --invalid-rate 0.05
+
+Runs Phase 3 (AdaptiveRAGController._apreprocess_question, analyzer in
+LLM mode) for the same questions through ModelRouter set up two ways:
+  - large:  every analysis / rewrite on the large model (the old gpt-4o setup)
+  - tiered: the small model, with the large model as escalation target
+The small model is a FakeChatModel that answers a deterministic share
+(--invalid-rate) of prompts with prose instead of the expected reply,
+so the tiered run shows the cost of escalations as well as the saving.
+"""
+import os
+import time
+import zlib
+import asyncio
+import argparse
+import statistics
+from typing import List
+
+from langchain_core.messages import BaseMessage
+
+from app.rag import metrics
+from benchmarks.fakes import FakeChatModel
+from benchmarks.bench_suite import make_questions
+
+
+class FlakyChatModel(FakeChatModel):
+    """
+    FakeChatModel that replies with unusable prose to invalid_rate of prompts.
+    """
+
+    invalid_rate: float = 0.0
+
+    def reply(self, messages: List[BaseMessage]) -> str:
+        prompt = " ".join(str(message.content) for message in messages)
+        if zlib.crc32(prompt.encode("utf-8")) % 1000 < self.invalid_rate * 1000:
+            return "Sure! Here is what I think about this query."
+        return super().reply(messages)
+
+
+def build_controller(llm, escalation_llm=None):
+    from app.rag.models import ModelRouter
+    from app.rag.reranker import Reranker
+    from app.rag.answer_cache import AnswerCache
+    from app.rag.query_rewriter import QueryRewriter
+    from app.rag.query_analyzer import QueryAnalyzer
+    from app.rag.context_packer import ContextPacker
+    from app.rag.controller import AdaptiveRAGController
+
+    analyzer, rewriter = QueryAnalyzer(mode="llm"), QueryRewriter()
+    analyzer.router = ModelRouter("analyzer", llm=llm, escalation_llm=escalation_llm)
+    rewriter.router = ModelRouter("rewriter", llm=llm, escalation_llm=escalation_llm)
+    return AdaptiveRAGController(
+        query_analyzer=analyzer,
+        query_rewriter=rewriter,
+        answer_cache=AnswerCache(enabled=False),
+        speculative_retrieval=False,
+        reranker=Reranker(),
+        context_packer=ContextPacker(),
+    )
+
+
+async def preprocess_all(controller, questions: list[str]) -> list[float]:
+    from app.rag.query_context import QueryContext
+
+    latencies = []
+    for question in questions:
+        ctx = QueryContext(question=question)
+        start = time.perf_counter()
+        await controller._apreprocess_question(ctx)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def escalation_count() -> float:
+    return sum(metrics.model_escalations._values.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--small-latency", type=float, default=0.1)
+    parser.add_argument("--large-latency", type=float, default=0.35)
+    parser.add_argument("--invalid-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+    questions = make_questions(args.questions, seed=23)
+    print(f"{args.questions} questions, small {args.small_latency * 1000:.0f} ms, large {args.large_latency * 1000:.0f} ms, "
+          f"small model invalid rate {args.invalid_rate:.0%}")
+    print(f"{'':<8} {'p50':>9} {'p95':>9} {'mean':>9} {'small':>7} {'large':>7} {'escalated':>10}")
+
+    for label in ("large", "tiered"):
+        large = FakeChatModel(latency=args.large_latency)
+        small = FlakyChatModel(latency=args.small_latency, invalid_rate=args.invalid_rate)
+        controller = build_controller(large) if label == "large" else build_controller(small, escalation_llm=large)
+        escalated_before = escalation_count()
+        latencies = asyncio.run(preprocess_all(controller, questions))
+        p50, p95 = statistics.quantiles(latencies, n=20)[9], statistics.quantiles(latencies, n=20)[18]
+        print(f"{label:<8} {p50 * 1000:7.1f}ms {p95 * 1000:7.1f}ms {statistics.mean(latencies) * 1000:7.1f}ms "
+              f"{small.calls:>7} {large.calls:>7} {escalation_count() - escalated_before:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
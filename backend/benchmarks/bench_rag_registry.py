@@ -0,0 +1,72 @@
+"""
+Compares per-request RAG setup cost with and without the shared registry.
+
+    python -m benchmarks.bench_rag_registry --requests 200
+
+Cold: builds embeddings client + Chroma handle + document chain on every request.
+Warm: looks the vector database and document chain up in the process-wide registry.
+No OpenAI calls are made; only setup is timed.
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.rag import vectorstore
+from app.rag.registry import RAGRegistry
+from app.rag.llm_prompt import llm, prompt
+from app.rag.rag import context_documents_retrieval_chain
+
+
+def time_calls(fn, requests: int) -> list[float]:
+    """
+    Returns: Per-call latency in milliseconds
+    """
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<6} mean={statistics.mean(timings):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as persist_directory:
+        vectorstore.vector_database_path = persist_directory
+        registry = RAGRegistry(
+            vector_database_factory=vectorstore.get_vector_database,
+            document_chain_factory=lambda: context_documents_retrieval_chain(llm, prompt),
+        )
+        registry.warm()
+
+        def cold_setup():
+            vectorstore.get_vector_database()
+            context_documents_retrieval_chain(llm, prompt)
+
+        def warm_setup():
+            registry.vector_database()
+            registry.document_chain()
+
+        cold = time_calls(cold_setup, args.requests)
+        warm = time_calls(warm_setup, args.requests)
+
+    summarize("cold", cold)
+    summarize("warm", warm)
+    print(f"speedup x{statistics.mean(cold) / statistics.mean(warm):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Diversity of the chunks reaching the LLM: plain similarity vs MMR + per-paper caps,
+plus a check that metadata filters are pushed down into Chroma.
+
+    python -m benchmarks.bench_retrieval_diversity --papers 30 --queries 100
+
+Seeds a throwaway Chroma collection (offline FakeEmbeddings) with papers
+whose chunks share a paper-specific vocabulary, so plain similarity tends
+to return many chunks of one paper. Runs the real retrieval path
+(retrieve_documents -> reranker -> context packer) for exploratory
+questions with plain similarity, with MMR, and with MMR + the per-paper
+cap, and reports distinct papers per context and mean pairwise overlap
+between the chunks.
+"""
+import time
+import random
+import argparse
+import statistics
+import tempfile
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.synthetic_pdfs import WORDS
+from app.rag import rag, hybrid_retrieval
+from app.rag.reranker import LexicalReranker
+from app.rag.keyword_index import KeywordIndex
+from app.rag.context_packer import ContextPacker, jaccard, shingles
+from app.rag.retrieval_filter import RetrievalFilter
+from app.rag.retrieval_policy import determine_per_paper_cap, determine_retrieval_mode, determine_top_k
+
+
+def build_corpus(papers: int, chunks_per_paper: int, seed: int = 0) -> list[Document]:
+    rng = random.Random(seed)
+    documents = []
+    for paper in range(papers):
+        signature = [f"method{paper}", f"dataset{paper}", f"author{paper}"]
+        for chunk in range(chunks_per_paper):
+            words = rng.choices(WORDS, k=60) + rng.choices(signature, k=20)
+            rng.shuffle(words)
+            documents.append(Document(
+                id=f"p{paper}-c{chunk}",
+                page_content=" ".join(words),
+                metadata={"source": f"/papers/paper_{paper}.pdf", "filename": f"paper_{paper}.pdf", "page": chunk // 3},
+            ))
+    return documents
+
+
+def redundancy(documents: list[Document]) -> float:
+    sets = [shingles(d.page_content) for d in documents]
+    pairs = [jaccard(a, b) for i, a in enumerate(sets) for b in sets[i + 1:]]
+    return statistics.mean(pairs) if pairs else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=30)
+    parser.add_argument("--chunks-per-paper", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    documents = build_corpus(args.papers, args.chunks_per_paper)
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as persist_directory:
+        vector_database = Chroma(persist_directory=persist_directory, embedding_function=FakeEmbeddings())
+        vector_database.add_documents(documents, ids=[d.id for d in documents])
+        keyword_index = KeywordIndex()
+        keyword_index.add([d.id for d in documents], documents)
+        rag.rag_registry._vector_database = vector_database
+        rag.rag_registry._keyword_index = keyword_index
+
+        reranker, packer = LexicalReranker(fetch_factor=2, top_n=8), ContextPacker(token_budget=None)
+        questions = [
+            " ".join(rng.choices(WORDS, k=6) + [f"method{rng.randrange(args.papers)}"]) for _ in range(args.queries)
+        ]
+
+        intent = "exploratory"
+        top_k = determine_top_k(intent, "high")
+        policies = (
+            ("similarity", "similarity", None),
+            ("mmr", "mmr", None),
+            ("mmr + per-paper cap", determine_retrieval_mode(intent), determine_per_paper_cap(intent)),
+        )
+        print(f"exploratory questions, top_k {top_k}")
+        print(f"{'policy':<22} {'chunks':>6} {'papers':>7} {'overlap':>8} {'ms':>6}")
+        for label, mode, cap in policies:
+            hybrid_retrieval.determine_retrieval_mode = lambda _intent, mode=mode: mode
+            papers, overlaps, sizes, latencies = [], [], [], []
+            for question in questions:
+                start = time.perf_counter()
+                candidates = rag.retrieve_documents(question, reranker.fetch_depth(top_k, cap), intent=intent)
+                context = packer.pack(reranker.rerank(question, candidates, top_k, cap))
+                latencies.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(context))
+                papers.append(len({d.metadata["source"] for d in context}))
+                overlaps.append(redundancy(context))
+            print(
+                f"{label:<22} {statistics.mean(sizes):6.1f} {statistics.mean(papers):7.2f} "
+                f"{statistics.mean(overlaps):8.3f} {statistics.median(latencies):6.1f}"
+            )
+
+        hybrid_retrieval.determine_retrieval_mode = determine_retrieval_mode
+        retrieval_filter = RetrievalFilter(sources=("paper_3",), page_from=2, page_to=3)
+        filtered = rag.retrieve_documents(questions[0], 8, intent="exploratory", retrieval_filter=retrieval_filter)
+        outside = [
+            d.id for d in filtered
+            if d.metadata["source"] != "/papers/paper_3.pdf" or not 1 <= d.metadata["page"] <= 2
+        ]
+        print(f"\nfilter {retrieval_filter.to_chroma_where()}: {len(filtered)} chunks, {len(outside)} outside the filter")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Time to first token: blocking arun vs streaming astream.
+
+    python -m benchmarks.bench_streaming_ttft --questions 20 --latency 0.3 --token-latency 0.05
+
+Starts the stub OpenAI server in a child process with per-token delays,
+seeds a throwaway Chroma collection, then reports median time until the
+first answer text is available and until the answer is complete.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.stub_openai_server import StubOpenAIProcess
+from benchmarks.load_test_async_query import seed_vector_database
+
+
+async def time_blocking(controller, question: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    await controller.arun(question)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def time_streaming(controller, question: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    first_token = None
+    async for event in controller.astream(question):
+        if event["event"] == "token" and event["data"] and first_token is None:
+            first_token = time.perf_counter() - start
+    return first_token, time.perf_counter() - start
+
+
+def report(name: str, timings: list[tuple[float, float]]) -> None:
+    first = statistics.median(t[0] for t in timings)
+    total = statistics.median(t[1] for t in timings)
+    print(f"{name:<10} first token {first * 1000:7.0f} ms   complete {total * 1000:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    extra_args = ["--token-latency", str(args.token_latency)]
+    with StubOpenAIProcess(port=args.port, latency=args.latency, extra_args=extra_args) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+
+        from app.rag.answer_cache import AnswerCache
+        from app.rag.controller import AdaptiveRAGController
+
+        questions = [f"what does paper {i} say?" for i in range(args.questions)]
+        with tempfile.TemporaryDirectory() as persist_directory:
+            seed_vector_database(persist_directory)
+            controller = AdaptiveRAGController(answer_cache=AnswerCache(enabled=False))
+
+            async def measure():
+                # One event loop: the async OpenAI clients are bound to it
+                for name, timer in (("blocking", time_blocking), ("streaming", time_streaming)):
+                    report(name, [await timer(controller, question) for question in questions])
+
+            asyncio.run(measure())
+
+
+if __name__ == "__main__":
+    main()
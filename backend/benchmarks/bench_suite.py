@@ -0,0 +1,356 @@
+"""
+Offline benchmark suite for the RAG hot path, emitting JSON.
+
+    python -m benchmarks.bench_suite --out results.json
+    python -m benchmarks.bench_suite --baseline results.json --tolerance 0.25
+
+Everything runs in-process without network or API key: ChatOpenAI is
+replaced by benchmarks.fakes.FakeChatModel and OpenAIEmbeddings by
+FakeEmbeddings (wrapped in the production scheduler and disk cache),
+each with configurable artificial latency. A synthetic PDF corpus is
+written to a temporary directory and ingested into a throwaway vector
+database. Scenarios:
+  - ingestion:   full ingestion of the corpus, then an unchanged re-run
+  - cold_query:  first question after the registry (store, chains) was dropped
+  - warm_query:  sequential AdaptiveRAGController.run and answer_question
+  - concurrency: arun throughput and latency at several in-flight levels
+  - cache:       a Zipf-distributed workload with reworded repeats through
+                 the two-tier answer cache (hit rates, hit vs miss latency)
+Latencies are reported as *_ms percentiles and throughputs as *_per_s.
+With --baseline, any *_ms that grew or *_per_s that shrank by more than
+--tolerance is reported and the exit status is 1, so a CI job can gate on it.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+
+import numpy as np
+
+from benchmarks.synthetic_pdfs import WORDS, write_corpus
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+
+SCENARIOS = ("ingestion", "cold_query", "warm_query", "concurrency", "cache")
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    values = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+def make_questions(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    templates = (
+        "what is the role of {} in {} {}?",
+        "how does {} improve {} for {}?",
+        "explain {} {} and {}",
+        "compare {} with {} in {}",
+    )
+    return [rng.choice(templates).format(*rng.sample(WORDS, 3)) for _ in range(count)]
+
+
+def reworded(question: str) -> str:
+    """
+    Returns: The question re-asked with its terms in another order: it
+    misses the exact tier, while FakeEmbeddings (bag of words) puts it
+    next to the original, like a real embedding would a paraphrase
+    """
+    words = question.rstrip("?").split()
+    words[-1], words[-3] = words[-3], words[-1]
+    return " ".join(words) + "?"
+
+
+class Harness:
+    """
+    Wires the app to the fakes and a temporary data directory, and
+    builds controllers the way the API does.
+    """
+
+    def __init__(self, args, directory: str):
+        from app.rag import rag as rag_module
+        from app.rag import vectorstore
+        from app.rag.embedding_cache import CachedEmbeddings
+        from app.rag.embedding_scheduler import ScheduledEmbeddings
+
+        self.args = args
+        self.papers_path = os.path.join(directory, "papers")
+        self.vector_database_path = os.path.join(directory, "vector_database")
+        self.fake_embeddings = FakeEmbeddings(dimensions=args.dimensions, latency=args.embedding_latency)
+        self.embeddings = CachedEmbeddings(
+            ScheduledEmbeddings(self.fake_embeddings),
+            os.path.join(directory, "embedding_cache.sqlite3"),
+            model="fake-embeddings",
+        )
+        self.chat_model = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+
+        vectorstore.vector_database_path = self.vector_database_path
+        vectorstore.get_embedding_model = lambda: self.embeddings
+        # The registry builds its embedding model once and keeps it across reloads
+        rag_module.rag_registry._embedding_model_factory = lambda: self.embeddings
+        rag_module.rag_registry._embedding_model = None
+        rag_module.llm = self.chat_model
+        self.rag_module = rag_module
+
+    def drop_registry(self) -> None:
+        """
+        Forgets the shared store, keyword index and chains, like a fresh process.
+        """
+        from chromadb.api.client import SharedSystemClient
+
+        self.rag_module.rag_registry.reload()
+        SharedSystemClient.clear_system_cache()
+
+    def controller(self, cache_enabled: bool = False):
+        from app.rag.answer_cache import AnswerCache
+        from app.rag.query_rewriter import QueryRewriter
+        from app.rag.models import ModelRouter
+        from app.rag.query_analyzer import QueryAnalyzer
+        from app.rag.controller import AdaptiveRAGController
+
+        analyzer, rewriter = QueryAnalyzer(), QueryRewriter()
+        analyzer.router = ModelRouter("analyzer", llm=self.chat_model)
+        rewriter.router = ModelRouter("rewriter", llm=self.chat_model)
+        return AdaptiveRAGController(
+            query_analyzer=analyzer,
+            query_rewriter=rewriter,
+            answer_cache=AnswerCache(enabled=cache_enabled),
+        )
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Scenarios: each returns a JSON-serializable dict
+
+
+def scenario_ingestion(harness: Harness) -> dict:
+    from app.rag.injestion import ingestion_process
+
+    start = time.perf_counter()
+    vector_database = ingestion_process(
+        harness.papers_path, harness.vector_database_path, workers=harness.args.workers,
+        embedding_model=harness.embeddings,
+    )
+    elapsed = time.perf_counter() - start
+    chunks = len(vector_database.get(include=[])["ids"])
+
+    start = time.perf_counter()
+    ingestion_process(
+        harness.papers_path, harness.vector_database_path, workers=harness.args.workers,
+        embedding_model=harness.embeddings,
+    )
+    unchanged = time.perf_counter() - start
+    return {
+        "papers": harness.args.papers,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(chunks / elapsed, 1),
+        "embedding_calls": harness.fake_embeddings.calls,
+        "unchanged_rerun_ms": round(unchanged * 1000, 3),
+    }
+
+
+def scenario_cold_query(harness: Harness) -> dict:
+    latencies = []
+    for question in make_questions(harness.args.cold_repeats, seed=1):
+        harness.drop_registry()
+        controller = harness.controller()
+        start = time.perf_counter()
+        controller.run(question)
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def scenario_warm_query(harness: Harness) -> dict:
+    from app.rag.rag import answer_question
+
+    harness.rag_module.rag_registry.warm()
+    controller = harness.controller()
+    questions = make_questions(harness.args.questions, seed=2)
+    controller.run(questions[0])
+
+    run_latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        controller.run(question)
+        run_latencies.append(time.perf_counter() - start)
+
+    answer_latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        answer_question(question)
+        answer_latencies.append(time.perf_counter() - start)
+    return {"controller_run": latency_summary(run_latencies), "answer_question": latency_summary(answer_latencies)}
+
+
+def scenario_concurrency(harness: Harness) -> dict:
+    controller = harness.controller()
+    results = {}
+    for level in (int(level) for level in harness.args.concurrency.split(",")):
+        questions = make_questions(harness.args.questions, seed=100 + level)
+
+        async def answer_all():
+            semaphore = asyncio.Semaphore(level)
+            latencies = []
+
+            async def answer(question):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await controller.arun(question)
+                    latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(answer(q) for q in questions))
+            return latencies
+
+        start = time.perf_counter()
+        latencies = asyncio.run(answer_all())
+        elapsed = time.perf_counter() - start
+        results[f"in_flight_{level}"] = {
+            **latency_summary(latencies),
+            "questions_per_s": round(len(questions) / elapsed, 2),
+        }
+    return results
+
+
+def scenario_cache(harness: Harness) -> dict:
+    controller = harness.controller(cache_enabled=True)
+    distinct = make_questions(harness.args.cache_distinct, seed=3)
+    rng = random.Random(4)
+    weights = [1 / (rank + 1) for rank in range(len(distinct))]
+
+    hits, misses = [], []
+    for _ in range(harness.args.cache_requests):
+        question = rng.choices(distinct, weights)[0]
+        if rng.random() < harness.args.reworded_share:
+            question = reworded(question)
+        start = time.perf_counter()
+        controller.run(question)
+        elapsed = time.perf_counter() - start
+        stats = controller.answer_cache.stats()
+        hit = stats["exact_hits"] + stats["semantic_hits"] > len(hits)
+        (hits if hit else misses).append(elapsed)
+
+    stats = controller.answer_cache.stats()
+    return {
+        "requests": harness.args.cache_requests,
+        "hit_rate": round(stats["hit_rate"], 4),
+        "exact_hits": stats["exact_hits"],
+        "semantic_hits": stats["semantic_hits"],
+        "hit": latency_summary(hits) if hits else None,
+        "miss": latency_summary(misses) if misses else None,
+    }
+
+
+#--------------------------------------------------------------------------------------------------------------------------
+#Baseline comparison
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def regressions(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Returns: Metrics that got worse than the baseline by more than tolerance
+    """
+    found = []
+    now, before = flatten(current), flatten(baseline)
+    for key, old in before.items():
+        new = now.get(key)
+        if new is None or not old:
+            continue
+        if key.endswith("_ms") and new > old * (1 + tolerance):
+            found.append(f"{key}: {old} -> {new} ms")
+        elif key.endswith("_per_s") and new < old / (1 + tolerance):
+            found.append(f"{key}: {old} -> {new} /s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--papers", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.01)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--cold-repeats", type=int, default=3)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--cache-distinct", type=int, default=30)
+    parser.add_argument("--cache-requests", type=int, default=150)
+    parser.add_argument("--reworded-share", type=float, default=0.2)
+    parser.add_argument("--out", help="Write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    # ChatOpenAI / OpenAIEmbeddings are still constructed (never called) by app modules
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "baseline")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_suite_") as directory:
+        # Progress and the app's own prints go to stderr; stdout carries only the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            harness = Harness(args, directory)
+            write_corpus(harness.papers_path, args.papers, args.pages)
+            if "ingestion" not in scenarios:
+                # Query scenarios still need an index, just not its timings
+                scenario_ingestion(harness)
+            for name in SCENARIOS:
+                if name not in scenarios:
+                    continue
+                print(f"running {name}", file=sys.stderr)
+                start = time.perf_counter()
+                results["scenarios"][name] = globals()[f"scenario_{name}"](harness)
+                print(f"  done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = regressions(results["scenarios"], baseline.get("scenarios", {}), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
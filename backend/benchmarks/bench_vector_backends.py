@@ -0,0 +1,156 @@
+"""
+Recall@k and latency per query of the vector backends, at several collection sizes.
+
+    python -m benchmarks.bench_vector_backends --scales 100000,1000000 --chroma-max-rows 100000
+
+Generates a synthetic embedding corpus (unit vectors scattered around
+random topic centres, like chunks of many papers) and queries that are
+perturbed corpus vectors. Exact top-k from a brute-force pass is the
+ground truth. For each scale it measures:
+  - NumPy store, flat (exact, so recall is 1.0) and IVF over a sweep of
+    RAG_IVF_PROBES values (training time reported separately),
+  - Chroma HNSW over a sweep of RAG_HNSW_EF_SEARCH values (only up to
+    --chroma-max-rows: inserting millions of rows into Chroma takes long).
+Vectors are written straight into the stores, so no embedding model is
+called; --dimensions 1536 matches text-embedding-3-small but needs
+6 GB of disk and page cache at 1M chunks.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from benchmarks.fakes import FakeEmbeddings
+from app.rag.vector_backend import HNSW_EF_CONSTRUCTION, HNSW_M, open_chroma
+from app.rag.vector_quantization import normalize
+from app.rag.numpy_vectorstore import SCAN_BATCH_ROWS, NumpyVectorStore
+
+INSERT_BATCH_ROWS = 5_000
+
+
+def synthetic_vectors(rows: int, dimensions: int, topics: int, spread: float, seed: int = 0):
+    """
+    Yields: (first row, float32 batch) of unit vectors around `topics` random centres
+    """
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((topics, dimensions)).astype(np.float32))
+    for start in range(0, rows, INSERT_BATCH_ROWS):
+        count = min(INSERT_BATCH_ROWS, rows - start)
+        noise = rng.standard_normal((count, dimensions)).astype(np.float32) / np.sqrt(dimensions)
+        yield start, normalize(centres[rng.integers(topics, size=count)] + spread * noise)
+
+
+def exact_top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(matrix), SCAN_BATCH_ROWS):
+        scores = queries @ np.asarray(matrix[start:start + SCAN_BATCH_ROWS]).T
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)], axis=1)
+        keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        best_rows = np.take_along_axis(best_rows, keep, axis=1)
+    return best_rows
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def measure(search, queries: np.ndarray, truth: np.ndarray, k: int) -> tuple[float, float, float]:
+    """
+    Returns: recall@k, p50 and p95 latency (ms) of search(query, k) -> row numbers
+    """
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows = search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(set(rows) & set(expected.tolist())) / k)
+    return float(np.mean(recalls)), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def report(label: str, recall: float, p50: float, p95: float, note: str = "") -> None:
+    print(f"  {label:<26} {recall:7.3f} {p50:9.2f} {p95:9.2f}  {note}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="100000,1000000")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=2000)
+    # Noise norm relative to the topic centre: higher = less clustered, harder for IVF/HNSW
+    parser.add_argument("--spread", type=float, default=1.2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", default="4,8,16,32,64,128")
+    parser.add_argument("--ef-search", default="10,50,100,200")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--chroma-max-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    embeddings = FakeEmbeddings(dimensions=args.dimensions)
+    for scale in (int(s) for s in args.scales.split(",")):
+        directory = tempfile.mkdtemp(prefix="bench_vector_backends_")
+        try:
+            store = NumpyVectorStore(os.path.join(directory, "numpy"), embeddings)
+            start = time.perf_counter()
+            for first, batch in synthetic_vectors(scale, args.dimensions, args.topics, args.spread):
+                ids = [str(row) for row in range(first, first + len(batch))]
+                store.add_vectors(batch, [""] * len(batch), [{"source": f"paper_{row % 500}.pdf"} for row in range(first, first + len(batch))], ids)
+            numpy_build = time.perf_counter() - start
+            matrix = store._vectors_view()
+
+            rng = np.random.default_rng(1)
+            picked = matrix[np.sort(rng.choice(scale, args.queries, replace=False))]
+            queries = normalize(picked + 0.5 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(args.dimensions))
+            truth = exact_top_k(matrix, queries, args.k)
+
+            print(f"\n{scale:,} chunks x {args.dimensions} dims, {args.queries} queries, recall@{args.k}")
+            print(f"  {'backend':<26} {'recall':>7} {'p50 ms':>9} {'p95 ms':>9}")
+            store.index = "flat"
+            report("numpy flat", *measure(lambda q, k: store.search_rows(q, k)[0].tolist(), queries, truth, args.k),
+                   f"build {numpy_build:.1f}s, {directory_size(store.persist_directory) / 2**20:.0f} MiB")
+
+            start = time.perf_counter()
+            store.train_ivf()
+            training = time.perf_counter() - start
+            store.index = "ivf"
+            for probes in (int(p) for p in args.probes.split(",")):
+                store.ivf_probes = probes
+                report(f"numpy ivf probes={probes}", *measure(lambda q, k: store.search_rows(q, k)[0].tolist(), queries, truth, args.k),
+                       f"{len(store._centroids)} lists, trained in {training:.1f}s" if probes == int(args.probes.split(",")[0]) else "")
+
+            if scale > args.chroma_max_rows:
+                print(f"  chroma hnsw                skipped (> --chroma-max-rows {args.chroma_max_rows:,})")
+                continue
+            chroma_path = os.path.join(directory, "chroma")
+            hnsw_options = {"m": args.hnsw_m, "ef_construction": args.ef_construction}
+            chroma = open_chroma(chroma_path, embeddings, **hnsw_options)
+            start = time.perf_counter()
+            for first, batch in synthetic_vectors(scale, args.dimensions, args.topics, args.spread):
+                chroma._collection.add(ids=[str(row) for row in range(first, first + len(batch))], embeddings=batch)
+            chroma_build = time.perf_counter() - start
+
+            for ef_search in (int(e) for e in args.ef_search.split(",")):
+                # ef_search is read when the HNSW segment is loaded, so re-open like a fresh process
+                SharedSystemClient.clear_system_cache()
+                collection = open_chroma(chroma_path, embeddings, ef_search=ef_search, **hnsw_options)._collection
+
+                def chroma_search(query, k, collection=collection):
+                    ids = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+                    return [int(i) for i in ids]
+
+                report(f"chroma hnsw ef_search={ef_search}", *measure(chroma_search, queries, truth, args.k),
+                       f"build {chroma_build:.1f}s, {directory_size(chroma_path) / 2**20:.0f} MiB" if ef_search == int(args.ef_search.split(",")[0]) else "")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
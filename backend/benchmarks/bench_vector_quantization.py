@@ -0,0 +1,171 @@
+"""
+Index size, RSS and recall of the compact vector storages of the NumPy store.
+
+    python -m benchmarks.bench_vector_quantization --distractors 50000
+
+Embeds benchmarks/fixtures/retrieval_corpus.jsonl plus distractor chunks
+with the offline FakeEmbeddings. Those are sparse hashed bag-of-words
+vectors, so they are first rotated onto their principal axes (a rotation
+keeps every cosine, hence the exact ranking) to make them dense with the
+signal front-loaded, like text-embedding-3 vectors; otherwise sign bits
+and truncation would be meaningless. The fixture vocabulary (~500 words)
+bounds their rank, hence the default 512 dimensions: beyond that the
+extra axes would only hold rounding noise.
+
+One store is written per storage; each is then searched in a fresh
+process so the reported RSS is what serving that store costs (memory-
+mapped pages touched by the searches count). Reports the bytes scanned
+per search, the rescoring bytes kept on disk (float16 unless noted),
+recall@k against exact float32 search, context recall of the labelled
+fixture queries and the p50 latency.
+"""
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.bench_hybrid_retrieval import distractor_chunks, load_jsonl
+from app.rag.vector_quantization import normalize
+from app.rag.numpy_vectorstore import CODES_FILE_NAME, VECTORS_FILE_NAME, NumpyVectorStore
+
+# (label, store options, rescore factor)
+STORAGES = (
+    ("float32", {"storage": "float32"}, 1),
+    ("matryoshka 256", {"storage": "matryoshka", "matryoshka_dimensions": 256}, 4),
+    ("matryoshka 128", {"storage": "matryoshka", "matryoshka_dimensions": 128}, 4),
+    ("int8", {"storage": "int8"}, 4),
+    ("int8, f32 rescore", {"storage": "int8", "rescore_dtype": "float32"}, 4),
+    ("binary", {"storage": "binary"}, 4),
+    ("binary, rescore x16", {"storage": "binary"}, 16),
+    ("binary, no float32", {"storage": "binary", "keep_full_precision": False}, 16),
+)
+
+
+class PrincipalAxesEmbeddings(Embeddings):
+    """
+    FakeEmbeddings rotated onto principal axes fitted on a corpus sample.
+    """
+
+    def __init__(self, base: Embeddings, basis: np.ndarray):
+        self.base = base
+        self.basis = basis
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return (np.asarray(self.base.embed_documents(texts), dtype=np.float32) @ self.basis).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def principal_axes(vectors: np.ndarray, sample: int = 5000, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+    # Full orthonormal basis: principal axes first, the null space after
+    _, _, vt = np.linalg.svd(rows, full_matrices=True)
+    return vt.T.astype(np.float32)
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def serve(
+    directory: str, dimensions: int, basis: np.ndarray, queries: np.ndarray, k: int, rescore_factor: int, results) -> None:
+    """
+    Child process: opens one store, answers every query, reports ids, latency and RSS growth.
+    """
+    before = rss_bytes()
+    embeddings = PrincipalAxesEmbeddings(FakeEmbeddings(dimensions=dimensions), basis)
+    store = NumpyVectorStore(directory, embeddings, rescore_factor=rescore_factor, read_only=True)
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = store.search_rows(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([store._ids[row] for row in rows])
+    results.put((ids, statistics.median(latencies), rss_bytes() - before))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="benchmarks/fixtures/retrieval_corpus.jsonl")
+    parser.add_argument("--queries", default="benchmarks/fixtures/retrieval_queries.jsonl")
+    parser.add_argument("--distractors", type=int, default=50000)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--random-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    corpus = load_jsonl(args.corpus)
+    chunks = corpus + distractor_chunks(corpus, args.distractors)
+    labelled = load_jsonl(args.queries)
+    rng = random.Random(1)
+    questions = [q["query"] for q in labelled] + [
+        " ".join(rng.choice(chunks)["text"].split()[::5][:8]) for _ in range(args.random_queries)
+    ]
+
+    fake = FakeEmbeddings(dimensions=args.dimensions)
+    raw = normalize(np.asarray(fake.embed_documents([c["text"] for c in chunks]), dtype=np.float32))
+    basis = principal_axes(raw)
+    vectors = raw @ basis
+    queries = np.asarray(fake.embed_documents(questions), dtype=np.float32) @ basis
+
+    exact = normalize(vectors) @ normalize(queries).T
+    truth = [set(np.argsort(-exact[:, i])[:args.k].tolist()) for i in range(len(questions))]
+    ids = [c["id"] for c in chunks]
+
+    root = tempfile.mkdtemp(prefix="bench_vector_quantization_")
+    context = multiprocessing.get_context("spawn")
+    try:
+        print(f"{len(chunks):,} chunks x {args.dimensions} dims, {len(questions)} queries, recall@{args.k}")
+        print(f"{'storage':<20} {'scanned':>9} {'rescore':>9} {'RSS':>9} {'recall':>7} {'labelled':>9} {'p50 ms':>7}")
+        for label, options, rescore_factor in STORAGES:
+            directory = os.path.join(root, label.replace(" ", "_").replace(",", ""))
+            store = NumpyVectorStore(directory, fake, **options)
+            for start in range(0, len(chunks), 5000):
+                batch = chunks[start:start + 5000]
+                store.add_vectors(vectors[start:start + 5000], [c["text"] for c in batch], [{"source": c["source"]} for c in batch], [c["id"] for c in batch])
+            codes_path = os.path.join(directory, CODES_FILE_NAME)
+            vectors_path = os.path.join(directory, VECTORS_FILE_NAME)
+            scanned = os.path.getsize(codes_path) or os.path.getsize(vectors_path)
+            full = os.path.getsize(vectors_path)
+            del store
+
+            results = context.Queue()
+            child = context.Process(
+                target=serve,
+                args=(directory, args.dimensions, basis, queries, args.k, rescore_factor, results),
+            )
+            child.start()
+            found, latency, rss = results.get()
+            child.join()
+
+            position = {chunk_id: row for row, chunk_id in enumerate(ids)}
+            recall = statistics.mean(
+                len({position[i] for i in hits} & expected) / args.k for hits, expected in zip(found, truth)
+            )
+            context_recall = statistics.mean(
+                len(set(q["relevant"]) & set(hits)) / len(q["relevant"]) for q, hits in zip(labelled, found)
+            )
+            print(
+                f"{label:<20} {scanned / 2**20:7.1f}MB {full / 2**20:7.1f}MB {rss / 2**20:7.1f}MB "
+                f"{recall:7.3f} {context_recall:9.3f} {latency:7.2f}"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
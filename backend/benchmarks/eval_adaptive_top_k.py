@@ -0,0 +1,139 @@
+"""
+Fixed top_k vs the score-aware cutoff fitted by app.rag.top_k_tuner.
+
+    python -m benchmarks.eval_adaptive_top_k --distractors 5000 --target-recall 0.95
+
+Runs the labelled fixture queries through hybrid retrieval and the
+--reranker (none: retrieval order, cut off on the dense similarity
+fusion attaches; lexical: BM25 relevance) with tracing on, as the
+controller does, and collects the trace records. The fixture labels stand in for answer support (a
+relevant chunk has support 1). Thresholds are fitted with the tuner on
+one half of the queries and applied to the other half (2-fold). The
+held-out questions are then answered again by a reranker using the
+fitted thresholds, and by one using the configured defaults
+(RAG_TOP_K_MIN_SCORE / RAG_TOP_K_MAX_DROP). For them the script
+reports the chunks and packed context tokens sent to the LLM and the
+context recall of the labelled chunks, next to the fixed depth.
+"""
+import argparse
+import statistics
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.bench_hybrid_retrieval import distractor_chunks, load_jsonl
+from app.rag.tracing import Tracer
+from app.rag.keyword_index import KeywordIndex
+from app.rag.tokens import count_document_tokens
+from app.rag.context_packer import ContextPacker
+from app.rag.top_k_tuner import evaluate, fit, load_samples
+from app.rag.reranker import RERANK_FETCH_FACTOR, RERANK_TOP_N, LexicalReranker, Reranker
+from app.rag.hybrid_retrieval import RetrievalCandidates, candidate_depth, fuse_candidates
+from app.rag.retrieval_policy import (
+    TOP_K_MAX_DROP,
+    TOP_K_MIN_SCORE,
+    determine_min_top_k,
+    determine_per_paper_cap,
+    determine_top_k,
+)
+
+
+class MemorySink:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record: dict) -> bool:
+        self.records.append(record)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="benchmarks/fixtures/retrieval_corpus.jsonl")
+    parser.add_argument("--queries", default="benchmarks/fixtures/retrieval_queries.jsonl")
+    parser.add_argument("--distractors", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--top-n", type=int, default=RERANK_TOP_N)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--reranker", choices=("none", "lexical"), default="lexical")
+    args = parser.parse_args()
+
+    corpus = load_jsonl(args.corpus)
+    chunks = corpus + distractor_chunks(corpus, args.distractors)
+    documents = [Document(id=c["id"], page_content=c["text"], metadata={"source": c["source"]}) for c in chunks]
+    queries = load_jsonl(args.queries)
+
+    embeddings = FakeEmbeddings(dimensions=args.dimensions)
+    matrix = np.array(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+    keyword_index = KeywordIndex()
+    keyword_index.add([d.id for d in documents], documents)
+
+    def hybrid_search(query: dict, depth: int) -> list[Document]:
+        query_embedding = embeddings.embed_query(query["query"])
+        rows = np.argsort(-(matrix @ np.array(query_embedding, dtype=np.float32)))[:candidate_depth(depth)]
+        keyword = [doc for doc, _ in keyword_index.search(query["query"], candidate_depth(depth))]
+        candidates = RetrievalCandidates(
+            dense=[documents[i] for i in rows],
+            keyword=keyword,
+            query_embedding=query_embedding,
+            dense_embeddings=matrix[rows].tolist(),
+        )
+        return fuse_candidates(candidates, depth, query["intent"])
+
+    packer = ContextPacker()
+    top_n = None if args.reranker == "none" else args.top_n
+
+    def build(min_score: float = None, max_drop: float = None) -> Reranker:
+        if args.reranker == "none":
+            return Reranker(min_score=min_score, max_drop=max_drop)
+        return LexicalReranker(fetch_factor=RERANK_FETCH_FACTOR, top_n=top_n, min_score=min_score, max_drop=max_drop)
+
+    def answer(reranker: Reranker, query: dict) -> list[Document]:
+        top_k, cap = determine_top_k(query["intent"], "medium"), determine_per_paper_cap(query["intent"])
+        candidates = hybrid_search(query, reranker.fetch_depth(top_k, cap))
+        context = reranker.rerank(query["query"], candidates, top_k, cap, determine_min_top_k(query["intent"]))
+        return packer.pack(context)
+
+    # Traces as production would log them with RAG_ADAPTIVE_TOP_K=false
+    sink = MemorySink()
+    tracer = Tracer(sample_rate=1.0, sink=sink)
+    fixed = build()
+    for query in queries:
+        trace = tracer.start()
+        answer(fixed, query)
+        for chunk in trace.chunks:
+            chunk["support"] = 1.0 if chunk["id"] in query["relevant"] else 0.0
+        tracer.finish(trace, {"question": query["query"], "analysis": {"intent": query["intent"], "complexity": "medium"}})
+    tracer.start()
+    samples = load_samples(sink.records)
+
+    folds = [list(range(0, len(queries), 2)), list(range(1, len(queries), 2))]
+    current = build(TOP_K_MIN_SCORE, TOP_K_MAX_DROP)
+    results = {"fixed": ([], [], []), "current": ([], [], []), "fitted": ([], [], [])}
+    print(f"{len(queries)} labelled queries, {args.distractors} distractors, {args.reranker} reranker, top_n {top_n}\n")
+    for fold, (train, test) in enumerate((folds, folds[::-1])):
+        fitted = fit([samples[i] for i in train], top_n, args.target_recall)
+        replayed = evaluate([samples[i] for i in test], top_n, fitted.min_score, fitted.max_drop)
+        print(f"fold {fold}: fitted min_score={fitted.min_score} max_drop={fitted.max_drop} "
+              f"(train recall {fitted.recall:.3f}, held-out replay {replayed.chunks:.2f} chunks, recall {replayed.recall:.3f})")
+        adaptive = build(fitted.min_score, fitted.max_drop)
+        for name, reranker in (("fixed", fixed), ("current", current), ("fitted", adaptive)):
+            chunk_counts, token_counts, recalls = results[name]
+            for i in test:
+                context = answer(reranker, queries[i])
+                relevant = set(queries[i]["relevant"])
+                chunk_counts.append(len(context))
+                token_counts.append(sum(count_document_tokens(context)))
+                recalls.append(len(relevant & {doc.id for doc in context}) / len(relevant))
+
+    print(f"\n{'held-out':<10} {'chunks':>7} {'tokens':>7} {'recall':>7}")
+    baseline_tokens = statistics.mean(results["fixed"][1])
+    for name, (chunk_counts, token_counts, recalls) in results.items():
+        tokens = statistics.mean(token_counts)
+        print(f"{name:<10} {statistics.mean(chunk_counts):7.2f} {tokens:7.0f} {statistics.mean(recalls):7.3f}"
+              f"   ({(tokens / baseline_tokens - 1) * 100:+.0f}% tokens)")
+
+
+if __name__ == "__main__":
+    main()
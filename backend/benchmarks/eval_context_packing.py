@@ -0,0 +1,89 @@
+"""
+Input tokens saved by the context packer, and how much text it keeps.
+
+    python -m benchmarks.eval_context_packing --papers 40 --queries 200
+
+Builds pages with benchmarks.synthetic_pdfs.page_lines, republishes a
+share of the papers under a second file name with light edits (the
+preprint / camera-ready case), splits everything with the ingestion
+splitter (chunk_overlap=200) and retrieves top_k chunks per query with
+BM25. Reports prompt tokens before and after packing (merge + dedupe
+only, then also the token budget) and the share of distinct word
+trigrams of the unpacked context that survive packing.
+"""
+import random
+import argparse
+import statistics
+
+from langchain_core.documents import Document
+
+from benchmarks.synthetic_pdfs import page_lines
+from app.rag.injestion import split_text_into_chunks
+from app.rag.keyword_index import KeywordIndex
+from app.rag.tokens import count_document_tokens
+from app.rag.context_packer import CONTEXT_TOKEN_BUDGET, ContextPacker, shingles
+
+
+def build_chunks(papers: int, pages: int, republished: float, seed: int = 0) -> list[Document]:
+    rng = random.Random(seed)
+    documents = []
+    for paper in range(papers):
+        texts = ["\n".join(page_lines(paper, page)) for page in range(pages)]
+        documents += [Document(page_content=t, metadata={"source": f"paper_{paper}.pdf", "page": p}) for p, t in enumerate(texts)]
+        if rng.random() < republished:
+            for page, text in enumerate(texts):
+                lines = text.split("\n")
+                lines[rng.randrange(len(lines))] = "minor revision of this sentence in the camera ready version"
+                documents.append(Document(page_content="\n".join(lines), metadata={"source": f"paper_{paper}_v2.pdf", "page": page}))
+    chunks = split_text_into_chunks(documents)
+    for index, chunk in enumerate(chunks):
+        chunk.id = f"chunk-{index}"
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--republished", type=float, default=0.3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--token-budget", type=int, default=CONTEXT_TOKEN_BUDGET or 1000)
+    args = parser.parse_args()
+
+    chunks = build_chunks(args.papers, args.pages, args.republished)
+    keyword_index = KeywordIndex()
+    keyword_index.add([c.id for c in chunks], chunks)
+    rng = random.Random(1)
+
+    packers = {
+        "merge+dedupe": ContextPacker(enabled=True, token_budget=None),
+        f"+budget {args.token_budget}": ContextPacker(enabled=True, token_budget=args.token_budget),
+    }
+    before, after, kept, counts = [], {n: [] for n in packers}, {n: [] for n in packers}, {n: [] for n in packers}
+    for _ in range(args.queries):
+        words = rng.choice(chunks).page_content.split()
+        start = rng.randrange(max(1, len(words) - 12))
+        context = [doc for doc, _ in keyword_index.search(" ".join(words[start:start + 12]), args.top_k)]
+        before.append(sum(count_document_tokens(context)))
+        original = set().union(*(shingles(d.page_content) for d in context))
+        for name, packer in packers.items():
+            packed = packer.pack(context)
+            after[name].append(sum(count_document_tokens(packed)))
+            counts[name].append(len(packed))
+            surviving = set().union(*(shingles(d.page_content) for d in packed))
+            kept[name].append(len(original & surviving) / len(original))
+
+    print(f"{len(chunks)} chunks, top_k {args.top_k}, {args.queries} queries")
+    print(f"{'context':<14} {'chunks':>6} {'tokens':>7} {'text kept':>10}")
+    print(f"{'unpacked':<14} {args.top_k:6.1f} {statistics.mean(before):7.0f} {1.0:10.3f}")
+    for name in packers:
+        tokens = statistics.mean(after[name])
+        print(
+            f"{name:<14} {statistics.mean(counts[name]):6.1f} {tokens:7.0f} {statistics.mean(kept[name]):10.3f}"
+            f"   ({(tokens / statistics.mean(before) - 1) * 100:+.0f}% tokens)"
+        )
+
+
+if __name__ == "__main__":
+    main()
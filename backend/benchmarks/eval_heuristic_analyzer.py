@@ -0,0 +1,72 @@
+"""
+Offline evaluation of the heuristic QueryAnalyzer fast-path.
+
+    python -m benchmarks.eval_heuristic_analyzer --labels benchmarks/fixtures/analyzer_labels.jsonl
+
+The labels file is JSONL of logged LLM analyzer outputs:
+{"query": ..., "intent": ..., "complexity": ..., "needs_rewrite": ..., "llm_latency_ms": ...}
+Reports how many queries the heuristic answers on its own, how often it
+agrees with the LLM label on those, and the latency it saves.
+"""
+import json
+import time
+import argparse
+import statistics
+
+from app.rag.retrieval_policy import determine_top_k
+from app.rag.heuristic_analyzer import HeuristicQueryAnalyzer
+
+FIELDS = ("intent", "complexity", "needs_rewrite")
+
+
+def load_labels(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", default="benchmarks/fixtures/analyzer_labels.jsonl")
+    parser.add_argument("--llm-latency-ms", type=float, default=1000.0,
+                        help="used when a label has no llm_latency_ms")
+    parser.add_argument("--show-disagreements", action="store_true")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    analyzer = HeuristicQueryAnalyzer()
+
+    confident = 0
+    agreement = {field: 0 for field in FIELDS}
+    same_top_k = 0
+    heuristic_us = []
+    saved_ms = 0.0
+    for label in labels:
+        start = time.perf_counter()
+        predicted = analyzer.classify(label["query"])
+        heuristic_us.append((time.perf_counter() - start) * 1e6)
+        if predicted is None:
+            continue
+
+        confident += 1
+        saved_ms += label.get("llm_latency_ms", args.llm_latency_ms)
+        for field in FIELDS:
+            agreement[field] += predicted[field] == label[field]
+        same_top_k += (
+            determine_top_k(predicted["intent"], predicted["complexity"])
+            == determine_top_k(label["intent"], label["complexity"])
+        )
+        if args.show_disagreements and any(predicted[f] != label[f] for f in FIELDS):
+            print(f"  {label['query']!r}: heuristic={predicted} llm={ {f: label[f] for f in FIELDS} }")
+
+    total = len(labels)
+    print(f"queries:                 {total}")
+    print(f"heuristic covered:       {confident} ({confident / total:.0%}), rest falls back to the LLM")
+    for field in FIELDS:
+        print(f"{field + ' agreement:':<25}{agreement[field] / max(confident, 1):.0%} of covered")
+    print(f"{'top_k agreement:':<25}{same_top_k / max(confident, 1):.0%} of covered")
+    print(f"heuristic latency:       mean {statistics.mean(heuristic_us):.1f} us, max {max(heuristic_us):.1f} us")
+    print(f"latency saved:           {saved_ms / total:.0f} ms per query on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Prompt tokens vs retrieval quality with and without the context stages.
+
+    python -m benchmarks.eval_reranker_tokens --distractors 5000 --token-budget 1000
+
+Runs the labelled fixture queries through hybrid retrieval, then hands
+the chunks to each reranker exactly as the controller does (over-fetch
+top_k * fetch_factor, keep best top_n, pack with the configured token
+budget). The second row keeps retrieval order but applies the
+score-aware cutoff to the dense similarities fusion attaches, as the
+default configuration does. The last rows stack all three context stages on the lexical
+reranker: the score-aware cutoff (RAG_TOP_K_MIN_SCORE / MAX_DROP), then
+also a packer budget of --token-budget tokens. Reports the context
+tokens sent to the LLM and context recall / MRR of the labelled chunks;
+an answer cannot be grounded in a chunk that was not sent, so context
+recall is the quality bar the reduction must hold.
+"""
+import argparse
+import statistics
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.bench_hybrid_retrieval import distractor_chunks, load_jsonl
+from app.rag.keyword_index import KeywordIndex
+from app.rag.tokens import count_document_tokens
+from app.rag.retrieval_policy import (
+    TOP_K_MAX_DROP,
+    TOP_K_MIN_SCORE,
+    determine_min_top_k,
+    determine_per_paper_cap,
+    determine_top_k,
+)
+from app.rag.hybrid_retrieval import RetrievalCandidates, candidate_depth, fuse_candidates
+from app.rag.context_packer import CONTEXT_TOKEN_BUDGET, ContextPacker
+from app.rag.reranker import (
+    RERANK_FETCH_FACTOR,
+    RERANK_TOP_N,
+    EmbeddingReranker,
+    LexicalReranker,
+    Reranker,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="benchmarks/fixtures/retrieval_corpus.jsonl")
+    parser.add_argument("--queries", default="benchmarks/fixtures/retrieval_queries.jsonl")
+    parser.add_argument("--distractors", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--top-n", type=int, default=RERANK_TOP_N)
+    parser.add_argument("--token-budget", type=int, default=CONTEXT_TOKEN_BUDGET or 1000)
+    args = parser.parse_args()
+
+    corpus = load_jsonl(args.corpus)
+    chunks = corpus + distractor_chunks(corpus, args.distractors)
+    documents = [Document(id=c["id"], page_content=c["text"], metadata={"source": c["source"]}) for c in chunks]
+    queries = load_jsonl(args.queries)
+
+    embeddings = FakeEmbeddings(dimensions=args.dimensions)
+    matrix = np.array(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+    keyword_index = KeywordIndex()
+    keyword_index.add([d.id for d in documents], documents)
+
+    def hybrid_search(query: dict, depth: int) -> list[Document]:
+        query_embedding = embeddings.embed_query(query["query"])
+        rows = np.argsort(-(matrix @ np.array(query_embedding, dtype=np.float32)))[:candidate_depth(depth)]
+        keyword = [doc for doc, _ in keyword_index.search(query["query"], candidate_depth(depth))]
+        candidates = RetrievalCandidates(
+            dense=[documents[i] for i in rows],
+            keyword=keyword,
+            query_embedding=query_embedding,
+            dense_embeddings=matrix[rows].tolist(),
+        )
+        return fuse_candidates(candidates, depth, query["intent"])
+
+    options = {"fetch_factor": RERANK_FETCH_FACTOR, "top_n": args.top_n}
+    cutoff = {"min_score": TOP_K_MIN_SCORE, "max_drop": TOP_K_MAX_DROP}
+    packer = ContextPacker(enabled=True)
+    budgeted = ContextPacker(enabled=True, token_budget=args.token_budget)
+    pipelines = {
+        "baseline": (Reranker(), None),
+        "similarity cutoff": (Reranker(**cutoff), None),
+        "lexical": (LexicalReranker(**options), packer),
+        "embedding": (EmbeddingReranker(lambda: embeddings, **options), packer),
+        "+cutoff": (LexicalReranker(**options, **cutoff), packer),
+        f"+budget {args.token_budget}": (LexicalReranker(**options, **cutoff), budgeted),
+    }
+
+    print(f"top_n {args.top_n}, packer budget {CONTEXT_TOKEN_BUDGET or 'none'}\n")
+    print(f"{'pipeline':<17} {'chunks':>6} {'tokens':>7} {'recall':>7} {'MRR':>6}")
+    baseline_tokens = None
+    for name, (reranker, context_packer) in pipelines.items():
+        chunk_counts, token_counts, recalls, reciprocal_ranks = [], [], [], []
+        for query in queries:
+            top_k, cap = determine_top_k(query["intent"], "medium"), determine_per_paper_cap(query["intent"])
+            candidates = hybrid_search(query, reranker.fetch_depth(top_k, cap))
+            context = reranker.rerank(query["query"], candidates, top_k, cap, determine_min_top_k(query["intent"]))
+            if context_packer is not None:
+                context = context_packer.pack(context)
+
+            ids = [doc.id for doc in context]
+            relevant = set(query["relevant"])
+            chunk_counts.append(len(context))
+            token_counts.append(sum(count_document_tokens(context)))
+            recalls.append(len(relevant & set(ids)) / len(relevant))
+            reciprocal_ranks.append(next((1 / (rank + 1) for rank, i in enumerate(ids) if i in relevant), 0.0))
+
+        tokens = statistics.mean(token_counts)
+        baseline_tokens = baseline_tokens or tokens
+        print(
+            f"{name:<17} {statistics.mean(chunk_counts):6.1f} {tokens:7.0f} "
+            f"{statistics.mean(recalls):7.3f} {statistics.mean(reciprocal_ranks):6.3f}"
+            f"   ({(tokens / baseline_tokens - 1) * 100:+.0f}% tokens)"
+        )
+
+
+if __name__ == "__main__":
+    main()
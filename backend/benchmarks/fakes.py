@@ -0,0 +1,130 @@
+"""
+Deterministic local stand-ins for OpenAI models used by the benchmarks
+(OpenAIEmbeddings -> FakeEmbeddings, ChatOpenAI -> FakeChatModel).
+"""
+import re
+import json
+import time
+import zlib
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.language_models.chat_models import BaseChatModel
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+INTENTS = ("factual", "conceptual", "procedural", "exploratory")
+COMPLEXITIES = ("low", "medium", "high")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embeddings: texts sharing words get similar
+    vectors, so retrieval quality benchmarks stay meaningful offline.
+    """
+
+    def __init__(self, dimensions: int = 256, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            bucket = zlib.crc32(token.encode("utf-8"))
+            vector[bucket % self.dimensions] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    ChatOpenAI stand-in that answers in-process. Replies are a pure
+    function of the prompt: the analyzer prompt gets JSON derived from
+    the query hash (a JSON array for the batch prompt, plus the rewrite
+    for the combined prompt), the rewriter prompt a reworded query, anything else an answer quoting the last
+    words of the prompt. `latency` is paid per call (before the first
+    token when streaming), `token_latency` per streamed word.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def reply(self, messages: List[BaseMessage]) -> str:
+        prompt = " ".join(str(message.content) for message in messages)
+        query = prompt.rsplit("User query:", 1)[-1].strip()
+        if "query analysis engine" in prompt and "User queries:" in prompt:
+            numbered = prompt.rsplit("User queries:", 1)[-1].strip().splitlines()
+            return json.dumps([self.analysis(line.strip().split(". ", 1)[-1]) for line in numbered if line.strip()])
+        if "query analysis and rewriting engine" in prompt:
+            analysis = self.analysis(query)
+            analysis["rewritten_query"] = self.rewrite(query) if analysis["needs_rewrite"] else None
+            return json.dumps(analysis)
+        if "query analysis engine" in prompt:
+            return json.dumps(self.analysis(query))
+        if "query rewriting assistant" in prompt:
+            return self.rewrite(query)
+        words = TOKEN_PATTERN.findall(prompt.lower())
+        return "According to the provided documents, " + " ".join(words[-40:]) + "."
+
+    def rewrite(self, query: str) -> str:
+        return f"{query.rstrip('?')} in the research papers"
+
+    def analysis(self, query: str) -> dict:
+        bucket = zlib.crc32(query.encode("utf-8"))
+        return {
+            "intent": INTENTS[bucket % len(INTENTS)],
+            "complexity": COMPLEXITIES[(bucket >> 4) % len(COMPLEXITIES)],
+            "needs_rewrite": bool((bucket >> 8) % 2),
+        }
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for word in self.reply(messages).split(" "):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for word in self.reply(messages).split(" "):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
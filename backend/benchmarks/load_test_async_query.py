@@ -0,0 +1,83 @@
+"""
+Load test: sync controller on a Starlette-sized threadpool vs async arun.
+
+    python -m benchmarks.load_test_async_query --questions 400 --latency 0.5
+
+Starts the stub OpenAI server in a child process, seeds a throwaway Chroma
+collection, then answers the same batch of questions both ways and
+reports wall time and throughput.
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_openai_server import StubOpenAIProcess
+
+# Starlette/anyio default threadpool size used by sync `def` routes
+STARLETTE_THREADPOOL_SIZE = 40
+
+
+def seed_vector_database(persist_directory: str):
+    from langchain_core.documents import Document
+    from app.rag import vectorstore
+    from app.rag.injestion import get_embedding_model
+    from app.rag.vector_backend import open_vector_database
+
+    vectorstore.vector_database_path = persist_directory
+    # get_vector_database opens the store read-only, as the API does
+    vector_database = open_vector_database(persist_directory, get_embedding_model())
+    vector_database.add_documents(
+        [
+            Document(page_content=f"Stub research chunk {i}", metadata={"source": f"paper_{i % 5}.pdf", "page": i})
+            for i in range(40)
+        ]
+    )
+
+
+def run_sync(controller, questions: list[str]) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=STARLETTE_THREADPOOL_SIZE) as pool:
+        list(pool.map(controller.run, questions))
+    return time.perf_counter() - start
+
+
+def run_async(controller, questions: list[str]) -> float:
+    async def answer_all():
+        await asyncio.gather(*(controller.arun(q) for q in questions))
+
+    start = time.perf_counter()
+    asyncio.run(answer_all())
+    return time.perf_counter() - start
+
+
+def report(name: str, questions: int, elapsed: float) -> None:
+    print(f"{name:<6} {questions} questions in {elapsed:6.2f} s  -> {questions / elapsed:7.1f} q/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with StubOpenAIProcess(port=args.port, latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "sk-stub"
+
+        from app.rag.answer_cache import AnswerCache
+        from app.rag.controller import AdaptiveRAGController
+
+        questions = [f"what does paper {i} say?" for i in range(args.questions)]
+        with tempfile.TemporaryDirectory() as persist_directory:
+            seed_vector_database(persist_directory)
+            controller = AdaptiveRAGController(answer_cache=AnswerCache(enabled=False))
+            report("sync", args.questions, run_sync(controller, questions))
+            report("async", args.questions, run_async(controller, questions))
+
+
+if __name__ == "__main__":
+    main()
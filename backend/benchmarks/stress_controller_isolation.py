@@ -0,0 +1,131 @@
+"""
+Concurrency stress check for per-request controller state.
+
+    python -m benchmarks.stress_controller_isolation --questions 2000
+
+Runs one shared AdaptiveRAGController from many threads and many
+coroutines at once. The fake analyzer derives intent/complexity from
+the question and sleeps a random amount, so interleaving is heavy;
+every answer must still carry the retrieval depth (top_k, over-fetched
+under a per-paper cap) and intent computed from its own analysis.
+Exits non-zero on the first mismatch.
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+
+from app.rag import controller as controller_module
+from app.rag.reranker import Reranker
+from app.rag.answer_cache import AnswerCache
+from app.rag.controller import AdaptiveRAGController
+from app.rag.retrieval_policy import determine_per_paper_cap, determine_top_k
+
+INTENTS = ["factual", "conceptual", "procedural", "exploratory"]
+COMPLEXITIES = ["low", "medium", "high"]
+
+
+def analysis_for(question: str) -> dict:
+    index = int(question.split("#")[1])
+    return {
+        "intent": INTENTS[index % len(INTENTS)],
+        "complexity": COMPLEXITIES[index % len(COMPLEXITIES)],
+        "needs_rewrite": index % 2 == 0,
+    }
+
+
+def jitter() -> float:
+    return random.uniform(0, 0.002)
+
+
+class FakeAnalyzer:
+    def analyze(self, query):
+        time.sleep(jitter())
+        return analysis_for(query)
+
+    async def aanalyze(self, query):
+        await asyncio.sleep(jitter())
+        return analysis_for(query)
+
+
+class FakeRewriter:
+    def rewrite(self, query):
+        time.sleep(jitter())
+        return f"rewritten {query}"
+
+    async def arewrite(self, query):
+        await asyncio.sleep(jitter())
+        return f"rewritten {query}"
+
+
+def fake_retrieve_documents(question, top_k=8, intent="conceptual", **kwargs):
+    time.sleep(jitter())
+    return [Document(page_content=f"{question}|{top_k}|{intent}")]
+
+
+async def fake_aretrieve_documents(question, top_k=8, intent="conceptual", **kwargs):
+    await asyncio.sleep(jitter())
+    return [Document(page_content=f"{question}|{top_k}|{intent}")]
+
+
+def fake_generate_answer(question, docs):
+    time.sleep(jitter())
+    return docs[0].page_content, []
+
+
+async def fake_agenerate_answer(question, docs):
+    await asyncio.sleep(jitter())
+    return docs[0].page_content, []
+
+
+def expected_answer(question: str) -> str:
+    analysis = analysis_for(question)
+    retrieval_question = f"rewritten {question}" if analysis["needs_rewrite"] else question
+    top_k = determine_top_k(analysis["intent"], analysis["complexity"])
+    depth = Reranker().fetch_depth(top_k, determine_per_paper_cap(analysis["intent"]))
+    return f"{retrieval_question}|{depth}|{analysis['intent']}"
+
+
+def check(mode: str, questions: list[str], answers: list[str]) -> int:
+    mismatches = sum(answer != expected_answer(q) for q, answer in zip(questions, answers))
+    print(f"{mode:<7} {len(questions)} questions, {mismatches} mismatches")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    controller_module.retrieve_documents = fake_retrieve_documents
+    controller_module.aretrieve_documents = fake_aretrieve_documents
+    controller_module.generate_answer = fake_generate_answer
+    controller_module.agenerate_answer = fake_agenerate_answer
+    controller = AdaptiveRAGController(
+        query_analyzer=FakeAnalyzer(),
+        query_rewriter=FakeRewriter(),
+        answer_cache=AnswerCache(enabled=False),
+        speculative_retrieval=False,
+        reranker=Reranker(),
+    )
+    questions = [f"question #{i}" for i in range(args.questions)]
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        threaded = [answer for answer, _ in pool.map(controller.run, questions)]
+
+    async def answer_all():
+        return await asyncio.gather(*(controller.arun(q) for q in questions))
+
+    concurrent = [answer for answer, _ in asyncio.run(answer_all())]
+
+    failures = check("threads", questions, threaded) + check("asyncio", questions, concurrent)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Minimal local stand-in for the OpenAI HTTP API used by the benchmarks.
+
+    python -m benchmarks.stub_openai_server --port 8765 --latency 0.5
+
+Serves /v1/chat/completions (including stream=true) and /v1/embeddings
+with a fixed artificial latency, HTTP/1.1 keep-alive and deterministic
+responses. Point the app
+at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+"""
+import sys
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import argparse
+import threading
+import subprocess
+import urllib.request
+from collections import deque
+
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 1536
+
+STATUS_REASONS = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}
+
+ANALYSIS_RESPONSE = json.dumps(
+    {"intent": "conceptual", "complexity": "medium", "needs_rewrite": True}
+)
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """
+    Returns: Deterministic float32 unit vector derived from the text hash
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def chat_reply(body: dict) -> str:
+    """
+    Returns: Canned reply matched to the analyzer, rewriter or generator prompt
+    """
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if "query analysis engine" in prompt:
+        return ANALYSIS_RESPONSE
+    if "query rewriting assistant" in prompt:
+        return "Explain the main contribution of the referenced research paper"
+    return "Stub answer grounded in the provided context."
+
+
+class StubOpenAIServer:
+    """
+    Asyncio HTTP server answering OpenAI-style requests after `latency` seconds.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        latency: float = 0.5,
+        per_input_latency: float = 0.0,
+        max_rps: float = 0.0,
+        token_latency: float = 0.0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.per_input_latency = per_input_latency
+        self.max_rps = max_rps
+        self.token_latency = token_latency
+        self.connections_opened = 0
+        self.requests_served = 0
+        self.rate_limited = 0
+        self._recent_requests = deque()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def serve(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=4096)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> "StubOpenAIServer":
+        """
+        Runs the server on its own event loop in a daemon thread.
+        """
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.call_soon(ready.set)
+            try:
+                self._loop.run_until_complete(self.serve())
+            except asyncio.CancelledError:
+                pass
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    def stats(self) -> dict:
+        return {
+            "connections_opened": self.connections_opened,
+            "requests_served": self.requests_served,
+            "rate_limited": self.rate_limited,
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections_opened += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = await self._read_headers(reader)
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if path.endswith("/stats"):
+                    await self._write_response(writer, 200, self.stats())
+                    continue
+                if self._over_rate_limit():
+                    self.rate_limited += 1
+                    await self._write_response(
+                        writer, 429, {"error": {"message": "Rate limit reached", "code": "rate_limit_exceeded"}},
+                        extra_headers={"Retry-After": "0.2"},
+                    )
+                    continue
+                payload = json.loads(body or b"{}")
+                await asyncio.sleep(self.latency + self.per_input_latency * self._input_count(payload))
+                if path.endswith("/chat/completions") and payload.get("stream"):
+                    self.requests_served += 1
+                    await self._write_chat_stream(writer, payload)
+                    continue
+                if path.endswith("/chat/completions") and self.token_latency:
+                    # A blocking completion still waits for every token to be generated
+                    await asyncio.sleep(self.token_latency * (len(chat_reply(payload).split(" ")) - 1))
+                status, payload = self._route(path, payload)
+                self.requests_served += 1
+                await self._write_response(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> dict:
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                return headers
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    def _over_rate_limit(self) -> bool:
+        """
+        Sliding one-second window over accepted requests.
+        """
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        while self._recent_requests and now - self._recent_requests[0] > 1.0:
+            self._recent_requests.popleft()
+        if len(self._recent_requests) >= self.max_rps:
+            return True
+        self._recent_requests.append(now)
+        return False
+
+    @staticmethod
+    def _input_count(payload: dict) -> int:
+        inputs = payload.get("input")
+        if inputs is None:
+            return 1
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            return 1
+        return len(inputs)
+
+    async def _write_response(
+        self, writer: asyncio.StreamWriter, status: int, payload: dict, extra_headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (extra_headers or {}).items())
+        head = (
+            f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"{extra}"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def _write_chat_stream(self, writer: asyncio.StreamWriter, body: dict) -> None:
+        """
+        Sends the reply word by word as chat.completion.chunk events over
+        chunked transfer encoding, `token_latency` seconds apart.
+        """
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1"))
+        words = chat_reply(body).split(" ")
+        deltas = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": word if index == 0 else f" {word}"} for index, word in enumerate(words)]
+        for index, delta in enumerate(deltas):
+            if index > 1 and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            }
+            await self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+        await self._write_chunk(writer, "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, text: str) -> None:
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    def _route(self, path: str, body: dict) -> tuple[int, dict]:
+        if path.endswith("/chat/completions"):
+            return 200, self._chat_completion(body)
+        if path.endswith("/embeddings"):
+            return 200, self._embeddings(body)
+        return 404, {"error": {"message": f"unknown path {path}"}}
+
+    def _chat_completion(self, body: dict) -> dict:
+        content = chat_reply(body)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _embeddings(self, body: dict) -> dict:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS
+        data = []
+        for index, item in enumerate(inputs):
+            vector = fake_embedding(json.dumps(item), dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                vector = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+
+class StubOpenAIProcess:
+    """
+    Runs the stub server in a child process so it does not share
+    the benchmark's GIL.
+    """
+
+    def __init__(self, port: int = 8765, latency: float = 0.5, extra_args: list[str] | None = None):
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        self._command = [
+            sys.executable, "-m", "benchmarks.stub_openai_server",
+            "--port", str(port), "--latency", str(latency), *(extra_args or []),
+        ]
+        self._process = None
+
+    def __enter__(self) -> "StubOpenAIProcess":
+        self._process = subprocess.Popen(self._command)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                self.stats()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("stub OpenAI server did not start")
+
+    def __exit__(self, *exc) -> None:
+        self._process.terminate()
+        self._process.wait()
+
+    def stats(self) -> dict:
+        with urllib.request.urlopen(f"{self.base_url}/stats", timeout=1) as response:
+            return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--per-input-latency", type=float, default=0.0,
+                        help="extra seconds per embedding input")
+    parser.add_argument("--max-rps", type=float, default=0.0,
+                        help="answer 429 above this many requests per second (0 = unlimited)")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="seconds between streamed chat tokens")
+    args = parser.parse_args()
+    server = StubOpenAIServer(
+        args.host, args.port, args.latency, args.per_input_latency, args.max_rps, args.token_latency
+    )
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
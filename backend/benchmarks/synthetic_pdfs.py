@@ -0,0 +1,82 @@
+"""
+Writes small, valid, text-only PDFs for ingestion benchmarks.
+
+    python -m benchmarks.synthetic_pdfs --out /tmp/papers --papers 50 --pages 8
+
+No PDF library needed: each file is assembled from raw PDF objects.
+Text is deterministic per (paper, page) so re-runs produce identical files.
+"""
+import os
+import random
+import argparse
+
+WORDS = (
+    "attention transformer retrieval embedding corpus benchmark gradient encoder decoder "
+    "dataset ablation baseline latency throughput token context index vector query model "
+    "training inference evaluation recall precision layer normalization dropout sparse dense"
+).split()
+
+
+def page_lines(paper: int, page: int, lines: int = 40) -> list[str]:
+    rng = random.Random(paper * 100_003 + page)
+    return [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines)]
+
+
+def pdf_bytes(pages: list[list[str]]) -> bytes:
+    """
+    Returns: A PDF document with one Helvetica text page per entry in pages
+    """
+    objects = []
+    page_ids = [3 + 2 * i for i in range(len(pages))]
+    font_id = 3 + 2 * len(pages)
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    for page_id, lines in zip(page_ids, pages):
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td {text} ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def write_corpus(folder: str, papers: int, pages: int) -> list[str]:
+    """
+    Returns: Paths of the written PDFs
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for paper in range(papers):
+        path = os.path.join(folder, f"paper_{paper:05d}.pdf")
+        with open(path, "wb") as f:
+            f.write(pdf_bytes([page_lines(paper, page) for page in range(pages)]))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--papers", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=8)
+    args = parser.parse_args()
+    print(f"wrote {len(write_corpus(args.out, args.papers, args.pages))} PDFs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+
+# Clients are built at import time; no test talks to OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+# Prompt and model config paths are relative to backend/, where the API runs
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,99 @@
+import math
+
+from langchain_core.documents import Document
+
+from app.rag.reranker import build_reranker
+from app.rag.top_k_tuner import Sample, evaluate, fit, load_samples, replay
+from app.rag.hybrid_retrieval import SIMILARITY_KEY, RetrievalCandidates, fuse_candidates
+
+
+def doc(chunk_id: str, source: str = "paper.pdf") -> Document:
+    return Document(id=chunk_id, page_content=chunk_id, metadata={"source": source, "page": 0})
+
+
+def at_similarity(similarity: float) -> list[float]:
+    """
+    Returns: A unit vector whose cosine with [1, 0] is similarity
+    """
+    return [similarity, math.sqrt(1.0 - similarity ** 2)]
+
+
+def candidates(similarities: list[float], keyword: list[Document] = ()) -> RetrievalCandidates:
+    return RetrievalCandidates(
+        dense=[doc(f"d{i}", source=f"paper{i}.pdf") for i in range(len(similarities))],
+        keyword=list(keyword),
+        query_embedding=[1.0, 0.0],
+        dense_embeddings=[at_similarity(s) for s in similarities],
+    )
+
+
+def ids(documents) -> list[str]:
+    return [document.id for document in documents]
+
+
+def test_fusion_attaches_dense_similarity_without_touching_the_originals():
+    retrieved = candidates([0.9, 0.5])
+    fused = fuse_candidates(retrieved, top_k=2, intent="factual")
+    assert [round(d.metadata[SIMILARITY_KEY], 2) for d in fused] == [0.9, 0.5]
+    assert SIMILARITY_KEY not in retrieved.dense[0].metadata
+
+
+def test_confident_question_gets_a_shorter_context_on_the_default_reranker():
+    reranker = build_reranker()
+    confident = fuse_candidates(candidates([0.92, 0.41, 0.40, 0.38]), top_k=4, intent="factual")
+    ambiguous = fuse_candidates(candidates([0.62, 0.58, 0.55, 0.52]), top_k=4, intent="factual")
+
+    assert ids(reranker.rerank("q", confident, top_k=4, min_top_k=1)) == ["d0"]
+    assert len(reranker.rerank("q", ambiguous, top_k=4, min_top_k=1)) == 4
+
+
+def test_cutoff_never_goes_below_the_intent_floor():
+    reranker = build_reranker("none")
+    confident = fuse_candidates(candidates([0.92, 0.41, 0.05, 0.04]), top_k=4, intent="factual")
+    assert ids(reranker.rerank("q", confident, top_k=4, min_top_k=3)) == ["d0", "d1", "d2"]
+
+
+def test_keyword_only_hits_do_not_end_the_context():
+    fused = fuse_candidates(candidates([0.9], keyword=[doc("k"), doc("d0", source="paper0.pdf")]), top_k=2, intent="factual")
+    assert SIMILARITY_KEY not in fused[1].metadata
+    assert ids(build_reranker("none").rerank("q", fused, top_k=2, min_top_k=1)) == ["d0", "k"]
+
+
+def test_tuner_replay_skips_candidates_without_relevance():
+    sample = Sample(
+        intent="factual", top_k=4, min_top_k=1, scores=[0.9, None, 0.4, 0.3],
+        tokens=[10, 10, 10, 10], ids=["a", "b", "c", "d"], used={"a"},
+    )
+    assert replay(sample, None, 0.1, 0.3) == 2
+    assert replay(sample, None, None, None) == 4
+
+
+def trace(relevance: list, supports: dict, **fields) -> dict:
+    return {
+        "analysis": {"intent": "factual", "complexity": "medium"},
+        "candidates": [{"id": f"c{i}", "relevance": r, "tokens": 100} for i, r in enumerate(relevance)],
+        "chunks": [{"id": chunk_id, "support": support} for chunk_id, support in supports.items()],
+        **fields,
+    }
+
+
+def test_tuner_learns_only_from_answered_traces_with_relevance():
+    traces = [
+        trace([0.9, 0.3], {"c0": 0.5, "c1": 0.1}),
+        trace([0.9], {"c0": 0.5}, cache_hit=True),
+        trace([0.9], {"c0": 0.5}, error="boom"),
+        trace([None, None], {"c0": 0.5}),
+    ]
+    [sample] = load_samples(traces)
+    assert (sample.top_k, sample.min_top_k, sample.used) == (4, 1, {"c0"})
+
+
+def test_fit_sends_the_fewest_tokens_that_keep_the_used_chunks():
+    samples = load_samples([
+        trace([0.9, 0.4, 0.35, 0.3], {"c0": 0.6}),
+        trace([0.8, 0.75, 0.2, 0.1], {"c0": 0.4, "c1": 0.5}),
+    ])
+    fixed = evaluate(samples, None, None, None)
+    fitted = fit(samples, None, target_recall=1.0)
+    assert (fixed.chunks, fixed.recall) == (4.0, 1.0)
+    assert fitted.recall == 1.0 and fitted.chunks == 1.5 and fitted.tokens == 150
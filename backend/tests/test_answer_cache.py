@@ -0,0 +1,67 @@
+from langchain_core.documents import Document
+
+from app.rag import answer_cache as answer_cache_module
+from app.rag.answer_cache import AnswerCache, TTLLRUCache, normalize_question
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_question():
+    assert normalize_question("  What is   BERT?? ") == "what is bert"
+
+
+def test_ttl_lru_expires_and_evicts_least_recently_used(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", clock)
+    cache = TTLLRUCache(max_entries=2, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.items() == []
+
+
+def test_exact_and_semantic_hits():
+    cache = AnswerCache(similarity_threshold=0.9, enabled=True)
+    sources = [Document(page_content="chunk")]
+    cache.put("What is BERT?", "An encoder.", sources, embedding=[1.0, 0.0])
+
+    assert cache.get_exact("what is bert").answer == "An encoder."
+    assert cache.get_exact("What is GPT?") is None
+    assert cache.get_similar([0.99, 0.05]).documents == sources
+    assert cache.get_similar([0.0, 1.0]) is None
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["semantic_hits"] == 1
+
+
+def test_disabled_cache_never_stores():
+    cache = AnswerCache(enabled=False)
+    cache.put("q", "a", [], embedding=[1.0])
+    assert cache.get_exact("q") is None and cache.get_similar([1.0]) is None
+
+
+def test_corpus_version_change_drops_entries_and_stale_puts():
+    version = {"value": 1}
+    cache = AnswerCache(enabled=True, version=lambda: version["value"])
+    cache.put("q", "old", [], embedding=[1.0, 0.0], version=cache.current_version())
+    assert cache.get_exact("q").answer == "old"
+
+    version["value"] = 2
+    assert cache.get_exact("q") is None
+    assert cache.get_similar([1.0, 0.0]) is None
+
+    # Generated against version 1, finished after the bump: not cached
+    cache.put("q", "stale", [], version=1)
+    assert cache.get_exact("q") is None
+    cache.put("q", "new", [], version=2)
+    assert cache.get_exact("q").answer == "new"
@@ -0,0 +1,48 @@
+from langchain_core.documents import Document
+
+from app.rag.tokens import count_document_tokens
+from app.rag.context_packer import ContextPacker, overlap_length
+
+OVERLAP = "the encoder stack is followed by a decoder stack of six layers"
+
+
+def doc(chunk_id: str, text: str, source: str = "paper.pdf", page: int = 0) -> Document:
+    return Document(id=chunk_id, page_content=text, metadata={"source": source, "page": page})
+
+
+def test_overlap_is_only_counted_past_the_minimum():
+    assert overlap_length(f"intro {OVERLAP}", f"{OVERLAP} and more") == len(OVERLAP)
+    assert overlap_length("ends with layers", "layers begin here") == 0
+
+
+def test_splitter_neighbours_on_a_page_are_merged_at_the_better_rank():
+    first, second = doc("a", f"Section one. {OVERLAP}"), doc("b", f"{OVERLAP}. Section two.")
+    packed = ContextPacker(enabled=True, token_budget=None).pack([second, doc("c", "unrelated"), first])
+    assert [d.id for d in packed] == ["b", "c"]
+    assert packed[0].page_content == f"Section one. {OVERLAP}. Section two."
+    assert packed[0].metadata == second.metadata
+
+
+def test_overlapping_chunks_of_other_pages_are_kept_apart():
+    first = doc("a", f"Residual connections wrap every sublayer. {OVERLAP}", page=1)
+    second = doc("b", f"{OVERLAP}. Positional encodings are added to the embeddings.", page=2)
+    assert ContextPacker(enabled=True).pack([first, second]) == [first, second]
+
+
+def test_near_duplicates_from_another_source_are_dropped():
+    text = "attention weights are computed from scaled dot products of queries and keys"
+    packed = ContextPacker(enabled=True).pack([doc("a", text), doc("b", text + " too", source="preprint.pdf")])
+    assert [d.id for d in packed] == ["a"]
+
+
+def test_budget_keeps_rank_order_and_fills_the_remainder():
+    documents = [doc("a", "word " * 40, page=1), doc("b", "other " * 40, page=2), doc("c", "short", page=3)]
+    tokens = count_document_tokens(documents)
+    packer = ContextPacker(enabled=True, token_budget=tokens[0] + tokens[2])
+    assert [d.id for d in packer.pack(documents)] == ["a", "c"]
+    assert [d.id for d in ContextPacker(enabled=True, token_budget=1).pack(documents)] == ["a"]
+
+
+def test_disabled_packer_passes_chunks_through():
+    documents = [doc("a", OVERLAP), doc("b", OVERLAP)]
+    assert ContextPacker(enabled=False, token_budget=1).pack(documents) == documents
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.rag.embedding_cache import CachedEmbeddings, text_key
+from app.rag.embedding_scheduler import ScheduledEmbeddings
+from benchmarks.fakes import FakeEmbeddings
+
+
+def last_used(cache: CachedEmbeddings, text: str) -> float:
+    with sqlite3.connect(cache.cache_path) as connection:
+        return connection.execute(
+            "SELECT last_used FROM embeddings WHERE model = ? AND key = ?", (cache.model, text_key(text))
+        ).fetchone()[0]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embeddings.sqlite3")
+
+
+def test_miss_embeds_once_then_hits(cache_path):
+    wrapped = FakeEmbeddings(dimensions=8)
+    cache = CachedEmbeddings(wrapped, cache_path)
+    first = cache.embed_documents(["a", "b", "a"])
+    assert wrapped.texts_embedded == 2
+    assert cache.embed_documents(["b", "a"]) == [first[1], first[0]]
+    assert wrapped.texts_embedded == 2
+    assert cache.stats() == {"hits": 3, "misses": 2, "entries": 2}
+
+
+def test_async_path_shares_the_cache(cache_path):
+    wrapped = FakeEmbeddings(dimensions=8)
+    cache = CachedEmbeddings(wrapped, cache_path)
+    vectors = asyncio.run(cache.aembed_documents(["a"]))
+    assert asyncio.run(cache.aembed_query("a")) == vectors[0]
+    assert cache.embed_query("a") == vectors[0] and wrapped.texts_embedded == 1
+
+
+def test_hits_write_last_used_in_batches(cache_path):
+    cache = CachedEmbeddings(FakeEmbeddings(dimensions=8), cache_path, touch_batch=2, touch_seconds=3600)
+    cache.embed_documents(["a", "b"])
+    stored = last_used(cache, "a")
+    time.sleep(0.01)
+
+    cache.embed_query("a")
+    assert last_used(cache, "a") == stored
+    cache.embed_query("b")
+    assert last_used(cache, "a") > stored
+
+
+def test_flush_writes_pending_hits(cache_path):
+    cache = CachedEmbeddings(FakeEmbeddings(dimensions=8), cache_path, touch_seconds=3600)
+    cache.embed_query("a")
+    stored = last_used(cache, "a")
+    time.sleep(0.01)
+    cache.embed_query("a")
+    cache.flush()
+    assert last_used(cache, "a") > stored
+
+
+def test_least_recently_used_rows_are_evicted(cache_path):
+    cache = CachedEmbeddings(FakeEmbeddings(dimensions=8), cache_path, max_entries=10)
+    cache.embed_documents([str(i) for i in range(11)])
+    assert cache.stats()["entries"] == 9
+
+
+def test_query_miss_never_takes_the_document_limiter(cache_path):
+    scheduled = ScheduledEmbeddings(FakeEmbeddings(dimensions=8), max_concurrency=1, query_concurrency=4)
+    cache = CachedEmbeddings(scheduled, cache_path)
+
+    def unavailable(*args):
+        raise AssertionError("a question went through the ingestion limiter")
+
+    scheduled.limiter.acquire = unavailable
+    scheduled.limiter.aacquire = unavailable
+    assert len(cache.embed_query("question")) == 8
+    assert len(asyncio.run(cache.aembed_query("another question"))) == 8
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import httpx
+import openai
+import pytest
+
+from app.rag import embedding_scheduler
+from app.rag.embedding_scheduler import AdaptiveConcurrencyLimiter, ScheduledEmbeddings
+from benchmarks.fakes import FakeEmbeddings
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """
+    Raises the queued errors first, then embeds.
+    """
+
+    def __init__(self, errors):
+        super().__init__(dimensions=8)
+        self.errors = list(errors)
+
+    def embed_documents(self, texts):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(embedding_scheduler, "backoff_seconds", lambda attempt: 0.0)
+
+
+def connection_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+
+def test_transient_errors_are_retried_without_throttling():
+    embeddings = ScheduledEmbeddings(FlakyEmbeddings([connection_error(), connection_error()]), max_retries=3)
+    assert len(embeddings.embed_documents(["a", "b"])) == 2
+    assert embeddings.limiter.rate_limited == 0
+    assert embeddings.limiter.in_flight == 0
+
+
+def test_transient_errors_give_up_after_max_retries():
+    embeddings = ScheduledEmbeddings(FlakyEmbeddings([connection_error()] * 3), max_retries=1)
+    with pytest.raises(openai.APIConnectionError):
+        embeddings.embed_documents(["a"])
+    assert embeddings.limiter.in_flight == 0
+
+
+def test_query_embeddings_use_their_own_limiter():
+    embeddings = ScheduledEmbeddings(FlakyEmbeddings([]), max_concurrency=1, query_concurrency=4)
+    embeddings.limiter.acquire()
+    # Ingestion holds the only document slot; a question still goes through
+    assert len(asyncio.run(embeddings.aembed_query("question"))) == 8
+    assert embeddings.query_limiter.in_flight == 0 and embeddings.limiter.in_flight == 1
+
+
+def test_limiter_halves_on_rate_limit_and_grows_back():
+    limiter = AdaptiveConcurrencyLimiter(4)
+    limiter.on_rate_limit(0.0)
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(succeeded=True)
+    assert limiter.limit == 3
+
+
+def test_thread_waiter_wakes_when_a_slot_frees_up():
+    limiter = AdaptiveConcurrencyLimiter(1)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    limiter.release(succeeded=True)
+    assert acquired.wait(2)
+    thread.join()
+
+
+def test_coroutine_waiter_wakes_when_another_thread_releases():
+    limiter = AdaptiveConcurrencyLimiter(1)
+    limiter.acquire()
+
+    async def wait_for_slot():
+        task = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        threading.Thread(target=limiter.release, args=(True,)).start()
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(wait_for_slot())
+    assert limiter.in_flight == 1
+
+
+def test_offline_tokenizer_falls_back_to_characters(monkeypatch):
+    def offline(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(embedding_scheduler.tiktoken, "get_encoding", offline)
+    embedding_scheduler.load_encoding.cache_clear()
+    try:
+        scheduled = ScheduledEmbeddings(FakeEmbeddings(dimensions=8), max_batch_tokens=10)
+        assert embedding_scheduler.count_tokens(["a" * 9, "b" * 30]) == [3, 10]
+        assert scheduled.make_batches(["a" * 9, "b" * 9, "c" * 30]) == [["a" * 9, "b" * 9], ["c" * 30]]
+        assert len(scheduled.embed_documents(["x", "y"])) == 2
+    finally:
+        embedding_scheduler.load_encoding.cache_clear()
@@ -0,0 +1,45 @@
+import pytest
+
+from app.rag.query_analyzer import DEFAULT_ANALYSIS, QueryAnalyzer
+from app.rag.heuristic_analyzer import HeuristicQueryAnalyzer
+
+
+class UnavailableRouter:
+    def invoke(self, *args, **kwargs):
+        raise AssertionError("the LLM was asked")
+
+    async def ainvoke(self, *args, **kwargs):
+        raise AssertionError("the LLM was asked")
+
+
+@pytest.mark.parametrize("query, intent, complexity", [
+    ("What is BLEU?", "factual", "low"),
+    ("How do I train a ResNet on CIFAR?", "procedural", "medium"),
+    ("Why does layer normalization help?", "conceptual", "low"),
+    ("What is the difference between BERT and GPT?", "conceptual", "medium"),
+    ("Give me an overview of recent work on retrieval", "exploratory", "medium"),
+])
+def test_confident_queries_are_classified_locally(query, intent, complexity):
+    assert HeuristicQueryAnalyzer().classify(query) == {"intent": intent, "complexity": complexity, "needs_rewrite": False}
+
+
+@pytest.mark.parametrize("query", ["transformers", "tell me stuff", "attention and memory and scaling", "   "])
+def test_ambiguous_queries_are_left_to_the_llm(query):
+    assert HeuristicQueryAnalyzer().classify(query) is None
+
+
+def test_hybrid_mode_skips_the_llm_for_confident_queries():
+    analyzer = QueryAnalyzer(mode="hybrid")
+    analyzer.router = UnavailableRouter()
+    assert analyzer.analyze("What is BLEU?")["intent"] == "factual"
+    with pytest.raises(AssertionError):
+        analyzer.analyze("transformers")
+
+
+def test_heuristic_mode_never_asks_the_llm():
+    analyzer = QueryAnalyzer(mode="heuristic")
+    analyzer.router = UnavailableRouter()
+    assert analyzer.analyze_batch(["What is BLEU?", "transformers"]) == [
+        {"intent": "factual", "complexity": "low", "needs_rewrite": False},
+        DEFAULT_ANALYSIS,
+    ]
@@ -0,0 +1,80 @@
+from langchain_core.documents import Document
+
+from app.rag.keyword_index import KeywordIndex, KeywordIndexStore, load_keyword_index, keyword_index_path
+from app.rag.hybrid_retrieval import RetrievalCandidates, fuse_candidates, mmr_ranking, reciprocal_rank_fusion
+
+
+def doc(chunk_id: str, text: str = "", source: str = "paper.pdf") -> Document:
+    return Document(id=chunk_id, page_content=text or chunk_id, metadata={"source": source, "page": 0})
+
+
+def ids(documents) -> list[str]:
+    return [document.id for document in documents]
+
+
+def test_rrf_rewards_documents_in_both_rankings():
+    dense = [doc("a"), doc("b"), doc("c")]
+    keyword = [doc("c"), doc("d")]
+    assert ids(reciprocal_rank_fusion([(dense, 0.5), (keyword, 0.5)], top_k=4)) == ["c", "a", "b", "d"]
+
+
+def test_rrf_weights_truncation_and_ties():
+    dense, keyword = [doc("a"), doc("b")], [doc("x"), doc("y")]
+    assert ids(reciprocal_rank_fusion([(dense, 0.2), (keyword, 0.8)], top_k=2)) == ["x", "y"]
+    # Equal scores keep the order documents were first seen in
+    assert ids(reciprocal_rank_fusion([(dense, 0.5), (keyword, 0.5)], top_k=4)) == ["a", "x", "b", "y"]
+
+
+def test_rrf_merges_the_same_chunk_by_id():
+    fused = reciprocal_rank_fusion([([doc("a", "dense copy")], 0.5), ([doc("a", "keyword copy")], 0.5)], top_k=5)
+    assert len(fused) == 1 and fused[0].page_content == "dense copy"
+
+
+def test_mmr_demotes_near_duplicates():
+    candidates = RetrievalCandidates(
+        dense=[doc("a"), doc("a-copy"), doc("b")],
+        query_embedding=[1.0, 0.0],
+        dense_embeddings=[[0.9, 0.436], [0.9, 0.436], [0.8, -0.6]],
+    )
+    assert ids(mmr_ranking(candidates, lambda_mult=0.5)) == ["a", "b", "a-copy"]
+
+
+def test_mmr_keeps_dense_order_without_vectors():
+    candidates = RetrievalCandidates(dense=[doc("a"), doc("b")])
+    assert ids(mmr_ranking(candidates)) == ["a", "b"]
+
+
+def test_fuse_without_keyword_ranking_is_the_dense_prefix():
+    candidates = RetrievalCandidates(dense=[doc("a"), doc("b"), doc("c")])
+    assert ids(fuse_candidates(candidates, top_k=2, intent="factual")) == ["a", "b"]
+
+
+def test_keyword_index_ranks_by_bm25_and_splits_identifiers():
+    index = KeywordIndex()
+    documents = [
+        doc("1", "ResNet-50 reaches 76% top-1 accuracy on ImageNet"),
+        doc("2", "Transformers use self-attention"),
+        doc("3", "ResNet uses residual connections; resnet depth matters"),
+    ]
+    index.add(ids(documents), documents)
+    assert ids(d for d, _ in index.search("resnet-50 accuracy", k=3))[0] == "1"
+    assert set(ids(d for d, _ in index.search("resnet", k=3))) == {"1", "3"}
+    assert index.search("unrelated words", k=3) == []
+
+    index.delete(["1"])
+    assert ids(d for d, _ in index.search("resnet-50", k=3)) == ["3"]
+
+
+def test_keyword_index_store_round_trip_loads_text_by_id(tmp_path):
+    documents = [doc("1", "sparse retrieval with bm25"), doc("2", "dense retrieval with embeddings")]
+    store = KeywordIndexStore(keyword_index_path(str(tmp_path)))
+    store.upsert(ids(documents), documents)
+    store.delete(["2"])
+    store.commit()
+    store.close()
+
+    by_id = {document.id: document for document in documents}
+    index = load_keyword_index(str(tmp_path), documents=lambda chunk_ids: [by_id[i] for i in chunk_ids])
+    assert len(index) == 1
+    assert [(d.id, d.page_content) for d, _ in index.search("retrieval", k=5)] == [("1", "sparse retrieval with bm25")]
+    assert load_keyword_index(str(tmp_path / "missing")) is None
@@ -0,0 +1,92 @@
+import os
+import json
+import logging
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.synthetic_pdfs import write_corpus
+from app.rag.injestion import ingestion_process
+from app.rag.ingestion_manifest import (
+    MANIFEST_FILE_NAME,
+    chunk_id,
+    corpus_version,
+    bump_corpus_version,
+    entry_chunk_ids,
+    file_fingerprint,
+    load_manifest,
+    save_manifest,
+)
+
+
+def entry(sha256: str = "a" * 64, chunk_count: int = 3) -> dict:
+    return {"sha256": sha256, "size": 10, "mtime_ns": 1, "chunk_count": chunk_count}
+
+
+def test_chunk_ids_follow_content_hash_and_position():
+    assert chunk_id("ab" * 32, 7) == f"{'ab' * 16}-00007"
+    assert entry_chunk_ids(entry(chunk_count=3)) == [chunk_id("a" * 64, i) for i in range(3)]
+    assert entry_chunk_ids(entry(chunk_count=0)) == []
+
+
+def test_manifest_round_trip_and_v1_migration(tmp_path):
+    assert load_manifest(str(tmp_path)) == {}
+    save_manifest(str(tmp_path), {"b.pdf": entry(), "a.pdf": entry("b" * 64, 1)})
+    assert load_manifest(str(tmp_path)) == {"a.pdf": entry("b" * 64, 1), "b.pdf": entry()}
+
+    v1 = {k: v for k, v in entry().items() if k != "chunk_count"} | {"chunk_ids": ["x", "y"]}
+    (tmp_path / MANIFEST_FILE_NAME).write_text(json.dumps({"version": 1, "files": {"a.pdf": v1}}))
+    assert load_manifest(str(tmp_path)) == {"a.pdf": entry(chunk_count=2)}
+
+    (tmp_path / MANIFEST_FILE_NAME).write_text(json.dumps({"version": 99, "files": {"a.pdf": entry()}}))
+    assert load_manifest(str(tmp_path)) == {}
+
+
+def test_fingerprint_reuses_hash_only_when_size_and_mtime_match(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"first")
+    fresh = file_fingerprint(str(path), None)
+    assert fresh["chunk_count"] == 0
+
+    previous = {**fresh, "sha256": "cached"}
+    assert file_fingerprint(str(path), previous)["sha256"] == "cached"
+
+    path.write_bytes(b"second version")
+    assert file_fingerprint(str(path), previous)["sha256"] not in ("cached", fresh["sha256"])
+
+
+def test_corpus_version_changes_with_every_bump(tmp_path):
+    assert corpus_version(str(tmp_path)) is None
+    bump_corpus_version(str(tmp_path))
+    first = corpus_version(str(tmp_path))
+    bump_corpus_version(str(tmp_path))
+    assert first is not None and corpus_version(str(tmp_path)) != first
+
+
+def test_reingestion_only_touches_changed_and_removed_files(tmp_path, caplog):
+    papers, database = str(tmp_path / "papers"), str(tmp_path / "database")
+    first, second = write_corpus(papers, 2, 1)
+
+    def ingest():
+        with caplog.at_level(logging.INFO, logger="app.rag.injestion"):
+            caplog.clear()
+            store = ingestion_process(papers, database, workers=1, embedding_model=FakeEmbeddings(dimensions=32))
+        return store, caplog.messages[-1]
+
+    store, summary = ingest()
+    manifest = load_manifest(database)
+    assert summary == "Ingestion: 2 new/changed, 0 removed, 0 unchanged"
+    assert set(store.get()["ids"]) == {i for e in manifest.values() for i in entry_chunk_ids(e)}
+    version = corpus_version(database)
+
+    store, summary = ingest()
+    assert summary == "Ingestion: 0 new/changed, 0 removed, 2 unchanged"
+    assert load_manifest(database) == manifest
+    assert corpus_version(database) == version
+
+    os.remove(second)
+    write_corpus(papers, 1, 2)
+    store, summary = ingest()
+    changed = load_manifest(database)[os.path.basename(first)]
+    assert summary == "Ingestion: 1 new/changed, 1 removed, 0 unchanged"
+    assert changed["sha256"] != manifest[os.path.basename(first)]["sha256"]
+    assert set(store.get()["ids"]) == set(entry_chunk_ids(changed))
+    assert corpus_version(database) != version
@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rag.metrics import CONTENT_TYPE, MetricsRegistry, timed_stage
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = MetricsRegistry()
+    latency = registry.histogram("rag_test_seconds", "Test latency", (0.1, 1.0), ("stage",))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, stage="embed")
+
+    assert registry.render().splitlines() == [
+        "# HELP rag_test_seconds Test latency",
+        "# TYPE rag_test_seconds histogram",
+        'rag_test_seconds_bucket{stage="embed",le="0.1"} 1',
+        'rag_test_seconds_bucket{stage="embed",le="1"} 3',
+        'rag_test_seconds_bucket{stage="embed",le="+Inf"} 4',
+        'rag_test_seconds_sum{stage="embed"} 4.05',
+        'rag_test_seconds_count{stage="embed"} 4',
+    ]
+
+
+def test_counters_render_per_label_set():
+    registry = MetricsRegistry()
+    lookups = registry.counter("rag_test_lookups", "Test lookups", ("result",))
+    lookups.inc(result="miss")
+    lookups.inc(2, result="exact")
+    assert registry.render().splitlines()[2:] == ['rag_test_lookups_total{result="exact"} 2', 'rag_test_lookups_total{result="miss"} 1']
+
+
+def test_metrics_endpoint_serves_the_timed_stages():
+    with timed_stage("test_stage"):
+        pass
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200 and response.headers["content-type"] == CONTENT_TYPE
+    assert "# TYPE rag_stage_duration_seconds histogram" in response.text
+    assert 'rag_stage_duration_seconds_count{stage="test_stage"} 1' in response.text
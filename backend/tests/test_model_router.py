@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.rag.models import ModelRouter
+
+
+class FakeLLM:
+    """
+    Replies with replies[prompt] (raising it when it is an exception) and records the prompts asked.
+    """
+
+    def __init__(self, replies: dict, finish_reason: str = "stop"):
+        self.replies = replies
+        self.finish_reason = finish_reason
+        self.prompts = []
+        self.bound = {}
+
+    def bind(self, **kwargs):
+        self.bound = kwargs
+        return self
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        reply = self.replies[prompt]
+        if isinstance(reply, Exception):
+            raise reply
+        return AIMessage(content=reply, response_metadata={"finish_reason": self.finish_reason})
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self.invoke(prompt))
+            except Exception as error:
+                results.append(error)
+        return results
+
+    async def abatch(self, prompts, config=None, return_exceptions=False):
+        return self.batch(prompts, config, return_exceptions)
+
+
+def is_json(content: str) -> bool:
+    return content.startswith("{")
+
+
+def test_accepted_reply_stays_on_the_small_model():
+    small, large = FakeLLM({"q": "{}"}), FakeLLM({"q": "{large}"})
+    router = ModelRouter("analyzer", llm=small, escalation_llm=large)
+    assert router.invoke("q", validate=is_json, response_format={"type": "json_object"}).content == "{}"
+    assert large.prompts == [] and small.bound == {"response_format": {"type": "json_object"}}
+
+
+def test_invalid_truncated_or_failed_replies_escalate():
+    large = FakeLLM({"q": "{large}"})
+    assert ModelRouter("analyzer", llm=FakeLLM({"q": "not json"}), escalation_llm=large).invoke("q", is_json).content == "{large}"
+    assert ModelRouter("analyzer", llm=FakeLLM({"q": "{}"}, "length"), escalation_llm=large).invoke("q").content == "{large}"
+    assert ModelRouter("analyzer", llm=FakeLLM({"q": ValueError()}), escalation_llm=large).invoke("q").content == "{large}"
+    assert len(large.prompts) == 3
+
+
+def test_without_escalation_model_replies_and_errors_pass_through():
+    assert ModelRouter("analyzer", llm=FakeLLM({"q": "not json"})).invoke("q", is_json).content == "not json"
+    with pytest.raises(ValueError):
+        ModelRouter("analyzer", llm=FakeLLM({"q": ValueError()})).invoke("q")
+
+
+def test_async_invoke_escalates_like_invoke():
+    router = ModelRouter("analyzer", llm=FakeLLM({"q": "bad"}), escalation_llm=FakeLLM({"q": "{large}"}))
+    assert asyncio.run(router.ainvoke("q", validate=is_json)).content == "{large}"
+
+
+def test_batch_reasks_only_failed_prompts_in_one_call():
+    small = FakeLLM({"a": "{}", "b": "bad", "c": RuntimeError()})
+    large = FakeLLM({"b": "{b}", "c": "{c}"})
+    router = ModelRouter("analyzer", llm=small, escalation_llm=large)
+    for replies in (router.batch(["a", "b", "c"], is_json), asyncio.run(router.abatch(["a", "b", "c"], is_json))):
+        assert [reply.content for reply in replies] == ["{}", "{b}", "{c}"]
+    assert large.prompts == ["b", "c", "b", "c"]
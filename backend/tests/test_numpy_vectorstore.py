@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.rag import numpy_vectorstore
+from app.rag.numpy_vectorstore import STATE_FILE_NAME, NumpyVectorStore
+from benchmarks.fakes import FakeEmbeddings
+
+DIMENSIONS = 16
+
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIMENSIONS)).astype(np.float32)
+
+
+def fill(store: NumpyVectorStore, count: int, first: int = 0) -> np.ndarray:
+    matrix = vectors(count, seed=first)
+    store.add_vectors(
+        matrix,
+        [f"chunk {row}" for row in range(first, first + count)],
+        [{"source": f"/papers/paper_{row % 3}.pdf", "page": row % 5} for row in range(first, first + count)],
+        [str(row) for row in range(first, first + count)],
+    )
+    return matrix
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS))
+
+
+@pytest.fixture
+def small_ivf(monkeypatch):
+    monkeypatch.setattr(numpy_vectorstore, "IVF_MIN_ROWS", 50)
+
+
+def test_flat_search_is_exact(store):
+    matrix = fill(store, 40)
+    rows, scores = store.search_rows(matrix[7], 3)
+    assert rows[0] == 7 and scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_search_never_trains_or_writes_state(tmp_path, small_ivf):
+    store = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), index="ivf", ivf_lists=4)
+    matrix = fill(store, 100)
+    state = os.path.getmtime(os.path.join(str(tmp_path), STATE_FILE_NAME))
+
+    rows, _ = store.search_rows(matrix[3], 1)
+    assert rows.tolist() == [3] and store._centroids is None
+    assert os.path.getmtime(os.path.join(str(tmp_path), STATE_FILE_NAME)) == state
+
+
+def test_optimize_trains_the_lists_and_compacts(tmp_path, small_ivf):
+    store = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), index="ivf", ivf_lists=4, ivf_probes=4)
+    matrix = fill(store, 100)
+    store.delete([str(row) for row in range(30)])
+
+    store.optimize()
+    assert len(store) == 70 and store._row_count == 70 and store._ivf_ready()
+    rows, _ = store.search_rows(matrix[50], 1)
+    assert store._ids[rows[0]] == "50"
+
+
+def test_read_only_store_keeps_its_snapshot_and_never_writes(tmp_path):
+    writer = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS))
+    matrix = fill(writer, 20)
+    reader = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), read_only=True)
+    with pytest.raises(ValueError):
+        reader.delete(["1"])
+
+    writer.delete([str(row) for row in range(10)])
+    writer.optimize()
+    fill(writer, 5, first=100)
+    rows, _ = reader.search_rows(matrix[2], 1)
+    assert reader.get_by_ids(["2"])[0].page_content == "chunk 2" and reader._ids[rows[0]] == "2"
+    assert len(NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), read_only=True)) == 15
+
+
+def test_where_masks_read_stored_columns_not_chunks(store, monkeypatch):
+    matrix = fill(store, 30)
+
+    def unavailable(rows):
+        raise AssertionError("a metadata mask read the chunk file")
+
+    monkeypatch.setattr(store, "_documents", unavailable)
+    rows, _ = store.search_rows(matrix[4], 30, where={"$and": [{"source": "/papers/paper_1.pdf"}, {"page": {"$gte": 2}}]})
+    assert sorted(rows.tolist()) == [row for row in range(30) if row % 3 == 1 and row % 5 >= 2]
+
+
+def test_optimize_adds_columns_to_legacy_stores(store):
+    fill(store, 10)
+    store._stored_columns = False
+    store._save_state()
+    legacy = NumpyVectorStore(store.persist_directory, FakeEmbeddings(dimensions=DIMENSIONS))
+    assert not legacy._stored_columns
+
+    legacy.optimize()
+    assert legacy._stored_columns and legacy._column("source").isin(["/papers/paper_0.pdf"]).sum() == 4
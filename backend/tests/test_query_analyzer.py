@@ -0,0 +1,54 @@
+import json
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+from app.rag.query_analyzer import JSON_MODE, QueryAnalyzer
+
+
+class FakeRouter:
+    """
+    Replies with `reply` to every prompt and records each call's keyword arguments.
+    """
+
+    def __init__(self, reply: dict):
+        self.reply = json.dumps(reply)
+        self.calls = []
+
+    def invoke(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return AIMessage(content=self.reply)
+
+    async def ainvoke(self, prompt, **kwargs):
+        return self.invoke(prompt, **kwargs)
+
+
+def combined_analyzer(reply: dict) -> QueryAnalyzer:
+    analyzer = QueryAnalyzer(mode="llm", combined=True)
+    analyzer.router = FakeRouter(reply)
+    return analyzer
+
+
+def test_one_json_mode_call_returns_the_analysis_and_the_rewrite():
+    analyzer = combined_analyzer({
+        "intent": "conceptual", "complexity": "high", "needs_rewrite": True, "rewritten_query": " How does attention scale? ",
+    })
+    assert analyzer.analyze("attention scaling??") == {
+        "intent": "conceptual", "complexity": "high", "needs_rewrite": True, "rewritten_query": "How does attention scale?",
+    }
+    assert len(analyzer.router.calls) == 1 and analyzer.router.calls[0]["response_format"] == JSON_MODE
+    assert asyncio.run(analyzer.aanalyze("attention scaling??"))["rewritten_query"] == "How does attention scale?"
+
+
+def test_unknown_labels_fall_back_field_by_field():
+    analyzer = combined_analyzer({"intent": "philosophical", "complexity": "low", "needs_rewrite": False, "rewritten_query": "x"})
+    assert analyzer.analyze("q") == {"intent": "conceptual", "complexity": "low", "needs_rewrite": False, "rewritten_query": None}
+
+
+def test_flagged_rewrite_without_text_is_left_to_the_rewriter():
+    reply = {"intent": "factual", "complexity": "low", "needs_rewrite": True, "rewritten_query": "  "}
+    analyzer = combined_analyzer(reply)
+    assert analyzer.analyze("q")["rewritten_query"] is None
+    # ...and the router is told to escalate such a reply
+    assert not analyzer._valid_reply(json.dumps(reply))
+    assert analyzer._valid_reply(json.dumps({**reply, "rewritten_query": "What is BLEU?"}))
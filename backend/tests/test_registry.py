@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.rag import routes
+from app.rag.registry import RAGRegistry
+from app.auth.dependencies import require_admin_user
+from benchmarks.fakes import FakeEmbeddings
+
+
+class FakeVectorDatabase:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+
+def registry(opened: list, built: list) -> RAGRegistry:
+    def embedding_model():
+        built.append(FakeEmbeddings(dimensions=8))
+        return built[-1]
+
+    def vector_database(embeddings):
+        opened.append(FakeVectorDatabase(embeddings))
+        return opened[-1]
+
+    return RAGRegistry(vector_database, document_chain_factory=object, embedding_model_factory=embedding_model)
+
+
+def test_reload_reopens_the_database_with_the_same_embedding_model():
+    opened, built = [], []
+    rag_registry = registry(opened, built)
+    cleared = []
+    rag_registry.on_reload(lambda: cleared.append(True))
+
+    first = rag_registry.vector_database()
+    rag_registry.reload()
+    second = rag_registry.vector_database()
+
+    assert first is not second and cleared == [True]
+    assert len(built) == 1 and second.embeddings is first.embeddings is rag_registry.embeddings()
+
+
+def test_reload_endpoint(monkeypatch):
+    opened, built = [], []
+    rag_registry = registry(opened, built)
+    rag_registry.warm()
+    monkeypatch.setattr(routes, "rag_registry", rag_registry)
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[require_admin_user] = lambda: None
+
+    response = TestClient(app).post("/rag/reload")
+    assert response.json() == {"message": "RAG resources reloaded."}
+    rag_registry.vector_database()
+    assert len(opened) == 2 and len(built) == 1
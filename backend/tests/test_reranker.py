@@ -0,0 +1,57 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from app.rag.hybrid_retrieval import SIMILARITY_KEY
+from app.rag.reranker import EmbeddingReranker, LexicalReranker, Reranker, build_reranker
+from benchmarks.fakes import FakeEmbeddings
+
+
+def doc(chunk_id: str, text: str, source: str = "paper.pdf", similarity: float = None) -> Document:
+    metadata = {"source": source}
+    if similarity is not None:
+        metadata[SIMILARITY_KEY] = similarity
+    return Document(id=chunk_id, page_content=text, metadata=metadata)
+
+
+def ids(documents) -> list[str]:
+    return [document.id for document in documents]
+
+
+def test_default_reranker_rescores_an_over_fetch():
+    reranker = build_reranker()
+    assert isinstance(reranker, LexicalReranker)
+    assert reranker.fetch_depth(4) == 8 and reranker.top_n == 5
+
+
+def test_lexical_reranking_breaks_near_ties_without_overriding_retrieval():
+    documents = [
+        doc("a", "positional encodings in transformers"),
+        doc("b", "training schedule and warmup"),
+        doc("c", "layer normalization placement"),
+        doc("d", "learning rate warmup steps warmup"),
+    ]
+    context = LexicalReranker(retrieval_rank_weight=0.7).rerank("how long is the warmup", documents, top_k=3)
+    assert ids(context) == ["b", "a", "d"]
+
+
+def test_lexical_cutoff_reads_the_dense_similarity_when_fusion_attached_it():
+    reranker = LexicalReranker(min_score=0.1, max_drop=0.3)
+    documents = [doc("a", "attention heads", similarity=0.9), doc("b", "attention heads", similarity=0.2)]
+    assert reranker.relevance(documents, [0.5, 0.5]) == [0.9, 0.2]
+    assert ids(reranker.rerank("attention heads", documents, top_k=2)) == ["a"]
+    assert LexicalReranker().relevance([doc("a", "x")], [0.4]) == [0.4]
+
+
+def test_top_n_and_per_paper_cap_bound_the_context():
+    documents = [doc(str(i), "text", source="a.pdf" if i < 4 else f"{i}.pdf") for i in range(8)]
+    assert ids(Reranker(top_n=3).rerank("q", documents, top_k=6)) == ["0", "1", "2"]
+    assert ids(Reranker().rerank("q", documents, top_k=5, per_paper_cap=2)) == ["0", "1", "4", "5", "6"]
+
+
+def test_embedding_reranker_sync_and_async_agree():
+    embeddings = FakeEmbeddings(dimensions=64)
+    reranker = EmbeddingReranker(lambda: embeddings, retrieval_rank_weight=0.0)
+    documents = [doc("a", "gradient clipping norm"), doc("b", "beam search decoding width")]
+    assert ids(reranker.rerank("beam search width", documents, top_k=1)) == ["b"]
+    assert ids(asyncio.run(reranker.arerank("beam search width", documents, top_k=1))) == ["b"]
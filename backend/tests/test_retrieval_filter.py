@@ -0,0 +1,61 @@
+from langchain_core.documents import Document
+
+from app.rag.reranker import Reranker
+from app.rag.keyword_index import KeywordIndex
+from app.rag.injestion import backfill_filenames
+from app.rag.numpy_vectorstore import NumpyVectorStore
+from app.rag.retrieval_filter import RetrievalFilter
+from app.rag.retrieval_policy import determine_per_paper_cap, determine_top_k
+from benchmarks.fakes import FakeEmbeddings
+
+WINDOWS_SOURCE = r"C:\Users\dell\Desktop\papers\attention.pdf"
+
+
+def doc(chunk_id: str, source: str, text: str = "transformer attention", page: int = 0) -> Document:
+    return Document(id=chunk_id, page_content=f"{text} {chunk_id}", metadata={"source": source, "page": page})
+
+
+def test_filter_matches_file_names_not_paths():
+    retrieval_filter = RetrievalFilter(sources=("attention", "/elsewhere/bert.pdf"), page_from=2)
+    assert retrieval_filter.filenames() == ("attention.pdf", "bert.pdf")
+    assert retrieval_filter.to_chroma_where() == {
+        "$and": [{"filename": {"$in": ["attention.pdf", "bert.pdf"]}}, {"page": {"$gte": 1}}]
+    }
+
+
+def test_keyword_index_filters_windows_sources_by_name():
+    index = KeywordIndex()
+    documents = [doc("a", WINDOWS_SOURCE), doc("b", "/papers/bert.pdf")]
+    index.add([d.id for d in documents], documents)
+    hits = index.search("attention", 5, RetrievalFilter(sources=("attention.pdf",)))
+    assert [d.id for d, _ in hits] == ["a"]
+
+
+def test_backfilled_numpy_store_filters_by_name(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=16))
+    documents = [doc("a", WINDOWS_SOURCE), doc("b", "/papers/bert.pdf")]
+    store.add_documents(documents, ids=[d.id for d in documents])
+
+    assert backfill_filenames(store) == 2
+    assert backfill_filenames(store) == 0
+    where = RetrievalFilter(sources=("attention",)).to_chroma_where()
+    assert [d.id for d in store.similarity_search("attention", k=5, filter=where)] == ["a"]
+    assert store.get_by_ids(["b"])[0].metadata == {"source": "/papers/bert.pdf", "page": 0, "filename": "bert.pdf"}
+
+
+def test_per_paper_cap_slots_are_refilled_from_the_over_fetch():
+    reranker = Reranker()
+    top_k, cap = determine_top_k("conceptual", "medium"), determine_per_paper_cap("conceptual")
+    depth = reranker.fetch_depth(top_k, cap)
+    # The best eight chunks all come from one paper
+    ranked = [doc(f"a{i}", "a.pdf") for i in range(8)] + [doc(f"p{i}", f"p{i}.pdf") for i in range(depth - 8)]
+
+    context = reranker.rerank("q", ranked[:depth], top_k, cap)
+    assert len(context) == top_k
+    assert sum(d.metadata["source"] == "a.pdf" for d in context) == cap
+
+
+def test_single_source_filter_lifts_the_cap():
+    assert determine_per_paper_cap("exploratory", RetrievalFilter(sources=("attention", "attention.pdf"))) is None
+    assert determine_per_paper_cap("exploratory", RetrievalFilter(sources=("attention", "bert"))) == 2
+    assert determine_per_paper_cap("exploratory", RetrievalFilter(page_from=2)) == 2
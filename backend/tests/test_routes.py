@@ -0,0 +1,130 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from app.rag import routes
+from app.rag import controller as controller_module
+from app.rag.tracing import Tracer
+from app.rag.reranker import Reranker
+from app.rag.answer_cache import AnswerCache
+from app.rag.context_packer import ContextPacker
+from app.rag.controller import AdaptiveRAGController
+from app.auth.dependencies import require_active_user
+
+SOURCE = Document(id="c1", page_content="chunk text", metadata={"source": "paper.pdf", "page": 2})
+
+
+def parse_sse(body: str) -> list[tuple[str, object]]:
+    events = []
+    for frame in body.split("\n\n"):
+        if frame:
+            event, data = frame.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[require_active_user] = lambda: None
+    return TestClient(app)
+
+
+def test_sse_frame_keeps_multiline_data_on_one_line():
+    frame = routes.format_sse("token", "line one\nline two")
+    assert frame == 'event: token\ndata: "line one\\nline two"\n\n'
+    assert parse_sse(frame) == [("token", "line one\nline two")]
+
+
+class FakeController:
+    async def arun(self, question, retrieval_filter):
+        return f"answer to {question}", [SOURCE]
+
+    async def astream(self, question, retrieval_filter):
+        yield {"event": "sources", "data": [SOURCE]}
+        for token in ("Hello", " world"):
+            yield {"event": "token", "data": token}
+        yield {"event": "done", "data": {"sources_used": True}}
+
+
+def test_query_and_stream_endpoints(client, monkeypatch):
+    monkeypatch.setattr(routes, "adaptive_rag_controller", FakeController())
+    source = {"content": "chunk text", "metadata": {"source": "paper.pdf", "page": 2}}
+
+    response = client.post("/rag/query", json={"question": "q"})
+    assert response.json() == {"answer": "answer to q", "sources": [source]}
+
+    response = client.post("/rag/query/stream", json={"question": "q"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert parse_sse(response.text) == [
+        ("sources", [source]),
+        ("token", "Hello"),
+        ("token", " world"),
+        ("done", {"sources_used": True}),
+    ]
+
+
+class FakeAnalyzer:
+    async def aanalyze_batch(self, questions):
+        return [{"intent": "factual", "complexity": "low", "needs_rewrite": False} for _ in questions]
+
+
+@pytest.fixture
+def batch_controller(monkeypatch):
+    """
+    Real batch pipeline with retrieval and generation faked;
+    questions containing "fail" make their generation raise.
+    """
+    controller = AdaptiveRAGController(
+        query_analyzer=FakeAnalyzer(),
+        query_rewriter=object(),
+        answer_cache=AnswerCache(enabled=False),
+        reranker=Reranker(),
+        context_packer=ContextPacker(enabled=False),
+        tracer=Tracer(sample_rate=0),
+    )
+
+    async def embed(contexts, semantic):
+        for ctx in contexts:
+            ctx.retrieval_embedding = [1.0]
+
+    async def retrieve(contexts):
+        return [[SOURCE] for _ in contexts]
+
+    async def generate(items, max_concurrency):
+        # Completes last question first, like a real fan-out may
+        for index in reversed(range(len(items))):
+            question, documents = items[index]
+            if "fail" in question:
+                yield index, RuntimeError(f"LLM error for {question}")
+            else:
+                yield index, (f"answer to {question}", documents)
+
+    monkeypatch.setattr(controller, "_aembed_batch", embed)
+    monkeypatch.setattr(controller, "_aretrieve_batch", retrieve)
+    monkeypatch.setattr(controller_module, "agenerate_answers_as_completed", generate)
+    monkeypatch.setattr(routes, "adaptive_rag_controller", controller)
+    return controller
+
+
+def test_batch_reports_failed_questions_without_failing_the_others(client, batch_controller):
+    response = client.post("/rag/query/batch", json={"questions": ["first", "please fail", "third"]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["answer"] == "answer to first" and results[0]["sources"][0]["content"] == "chunk text"
+    assert results[1] == {"index": 1, "question": "please fail", "error": "LLM error for please fail"}
+    assert results[2]["answer"] == "answer to third"
+
+
+def test_streamed_batch_sends_every_result_then_done(client, batch_controller):
+    response = client.post("/rag/query/batch", json={"questions": ["first", "please fail", "third"], "stream": True})
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["result", "result", "result", "done"]
+    assert [data["index"] for _, data in events[:3]] == [2, 1, 0]
+    assert "error" in events[1][1] and "answer" in events[0][1]
+    assert events[3][1] == {"questions": 3}
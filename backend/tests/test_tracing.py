@@ -0,0 +1,73 @@
+import json
+import contextvars
+
+from app.rag.metrics import record_tokens, timed_stage
+from app.rag.tracing import JsonlTraceSink, RequestTrace, Tracer, current_trace, use_trace, use_traces
+
+
+def read_records(path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_unsampled_questions_are_not_traced():
+    tracer = Tracer(sample_rate=0, slow_ms=0)
+    assert not tracer.enabled and contextvars.copy_context().run(tracer.start) is None
+
+
+def test_sampled_trace_collects_stages_and_tokens_and_is_written(tmp_path):
+    sink = JsonlTraceSink(path=str(tmp_path / "traces.jsonl"))
+    tracer = Tracer(sample_rate=1.0, sink=sink)
+
+    def answer():
+        trace = tracer.start()
+        with timed_stage("retrieve"):
+            pass
+        with timed_stage("retrieve"):
+            pass
+        record_tokens("context", 120)
+        assert current_trace() is trace
+        return tracer.finish(trace, {"question": "q"})
+
+    assert contextvars.copy_context().run(answer)
+    sink.close()
+    [record] = read_records(tmp_path / "traces.jsonl")
+    assert record["question"] == "q" and record["kept"] == "sampled"
+    assert record["tokens"] == {"context": 120} and set(record["stages_ms"]) == {"retrieve"}
+
+
+def test_slow_threshold_keeps_only_slow_questions(tmp_path):
+    sink = JsonlTraceSink(path=str(tmp_path / "traces.jsonl"))
+    fast, slow = Tracer(slow_ms=60_000, sink=sink), Tracer(slow_ms=0.001, sink=sink)
+    assert not fast.finish(fast._new_trace(), {"question": "fast"})
+    assert slow.finish(slow._new_trace(), {"question": "slow"})
+    sink.close()
+    assert [(r["question"], r["kept"]) for r in read_records(tmp_path / "traces.jsonl")] == [("slow", "slow")]
+
+
+def test_shared_batch_stage_is_charged_to_every_traced_question():
+    traces = [RequestTrace(sampled=True), None, RequestTrace(sampled=True)]
+    with use_traces(traces):
+        record_tokens("question", 7)
+    with use_trace(traces[0]):
+        record_tokens("answer", 3)
+    assert traces[0].tokens == {"question": 7, "answer": 3} and traces[2].tokens == {"question": 7}
+    assert current_trace() is None
+
+
+def test_sink_rotates_at_max_bytes(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    sink = JsonlTraceSink(path=str(path), max_bytes=200, backups=2)
+    for index in range(12):
+        sink.submit({"index": index, "padding": "x" * 40})
+    sink.close()
+    assert sink.written == 12 and (tmp_path / "traces.jsonl.1").exists() and not (tmp_path / "traces.jsonl.3").exists()
+    assert read_records(path)[-1]["index"] == 11
+
+
+def test_answer_support_is_the_share_of_answer_words_in_each_chunk():
+    trace = RequestTrace(sampled=True)
+    trace.chunks = [{"id": "a"}, {"id": "b"}]
+    trace.chunk_texts = ["residual connections stabilise training", "unrelated text here"]
+    trace.add_answer_support("Residual connections help deep training")
+    assert trace.chunks == [{"id": "a", "support": 0.6}, {"id": "b", "support": 0.0}]
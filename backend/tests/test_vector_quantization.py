@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.rag.numpy_vectorstore import VECTORS_FILE_NAME, NumpyVectorStore
+from app.rag.vector_quantization import VECTOR_STORAGES, build_codec, normalize
+from benchmarks.fakes import FakeEmbeddings
+
+DIMENSIONS = 64
+
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    return normalize(np.random.default_rng(seed).standard_normal((count, DIMENSIONS)).astype(np.float32))
+
+
+@pytest.mark.parametrize("storage", VECTOR_STORAGES)
+def test_codes_rank_the_nearest_row_first(storage):
+    codec = build_codec(storage, DIMENSIONS, matryoshka_dimensions=48)
+    vectors = unit_vectors(200)
+    codes = codec.encode(vectors)
+    assert codes.dtype == codec.dtype and codes.shape == (200, codec.width)
+
+    query = normalize(vectors[17] + 0.05 * unit_vectors(1, seed=1)[0])
+    assert int(np.argmax(codec.score(codes, codec.project(query)))) == 17
+    assert codec.decode(codes).shape[1] == len(codec.project(query))
+
+
+def test_int8_scores_track_the_cosine():
+    codec = build_codec("int8", DIMENSIONS)
+    vectors, query = unit_vectors(50), unit_vectors(1, seed=2)[0]
+    assert np.allclose(codec.score(codec.encode(vectors), query), vectors @ query, atol=0.02)
+
+
+def test_matryoshka_needs_its_dimensions():
+    with pytest.raises(ValueError):
+        build_codec("matryoshka", DIMENSIONS)
+
+
+@pytest.mark.parametrize("storage", ("int8", "binary"))
+def test_compact_codes_are_rescored_from_float16_rows(tmp_path, storage):
+    store = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), storage=storage, rescore_factor=8)
+    vectors = unit_vectors(300)
+    store.add_vectors(vectors, [str(row) for row in range(300)])
+    assert os.path.getsize(os.path.join(str(tmp_path), VECTORS_FILE_NAME)) == 300 * DIMENSIONS * 2
+
+    rows, scores = store.search_rows(vectors[42], 5)
+    assert rows[0] == 42 and scores[0] == pytest.approx(1.0, abs=1e-3)
+    assert np.allclose(scores, vectors[rows] @ vectors[42], atol=1e-3)
+
+
+def test_rescore_dtype_is_kept_by_the_store(tmp_path):
+    NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), storage="int8").add_vectors(unit_vectors(3), ["a", "b", "c"])
+    reopened = NumpyVectorStore(str(tmp_path), FakeEmbeddings(dimensions=DIMENSIONS), rescore_dtype="float32")
+    assert reopened.rescore_dtype == "float16" and reopened.storage == "int8"